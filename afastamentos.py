@@ -1,53 +1,25 @@
 import requests
 import json
-import pandas as pd
 from datetime import datetime, timedelta
 import time
-import hashlib
 import base64
 import os
-import pytz
-import configparser
 import csv
 import io
 from config_reader import obter_headers_api
-from api_humanus import buscar_colaboradores_paginado, buscar_situacoes, formatar_data_iso_para_br
-
-def carregar_configuracoes():
-    """Funcao para carregar configuracoes do arquivo .config"""
-    config = configparser.ConfigParser(interpolation=None)
-    config.read('.config')
-    
-    if not config.has_section('APITARGET'):
-        print("Secao [APITARGET] nao encontrada no arquivo .config")
-        return None
-    
-    return {
-        'apitarget': {
-            'url': config.get('APITARGET', 'url'),
-            'integracao': config.get('APITARGET', 'integracao'),
-            'token_base': config.get('APITARGET', 'token_base')
-        }
-    }
+from auth_hevi import obter_token_target
+from envio_hevi import post_csv, registrar_csv_gerado
+from controle_envio import preparar_envio, registrar_envio_aceito
+from extracao_humanus import extrair_entidades
 
 def gerar_token_target():
-    """Gera o token para a API de destino usando a data atual"""
-    config = carregar_configuracoes()
-    if not config:
+    """Gera o token para a API de destino usando a data atual (token do dia, ver auth_hevi)"""
+    config_target, token_final = obter_token_target()
+    if not config_target:
         print("Erro ao carregar configuracoes")
         return None, None, None
     
-    url = config['apitarget']['url']
-    integracao = config['apitarget']['integracao']
-    token_base = config['apitarget']['token_base']
-    
-    tz_sao_paulo = pytz.timezone('America/Sao_Paulo')
-    data_atual = datetime.now(tz_sao_paulo).strftime('%d/%m/%Y')
-    
-    token_concatenado = token_base + data_atual
-    token_final = hashlib.sha256(token_concatenado.encode('utf-8')).hexdigest()
-    
-    return url, integracao, token_final
+    return config_target['url'], config_target['integracao'], token_final
 
 def converter_para_csv(dados, nome_arquivo="dados.csv"):
     """Funcao para converter dados em CSV com cabecalhos em lowercase"""
@@ -76,8 +48,7 @@ def converter_para_csv(dados, nome_arquivo="dados.csv"):
         csv_content = output.getvalue()
         output.close()
         
-        with open(nome_arquivo, 'w', encoding='utf-8', newline='') as f:
-            f.write(csv_content)
+        registrar_csv_gerado(nome_arquivo, csv_content)
         
         print(f"CSV gerado com sucesso: {nome_arquivo}")
         print(f"Total de registros: {len(dados)}")
@@ -90,7 +61,12 @@ def converter_para_csv(dados, nome_arquivo="dados.csv"):
 
 def importar_via_post_generico(nome_arquivo_csv, endpoint, nome_modulo):
     """Funcao para importar CSV via POST"""
-    if not os.path.exists(nome_arquivo_csv):
+    # CSV gerado em memoria (ou o arquivo em disco); pula o POST se nada mudou desde
+    # o ultimo envio aceito (ou envia so o delta)
+    envio = preparar_envio(endpoint, nome_arquivo_csv)
+    if envio is None:
+        return {'success': True, 'ok': 0, 'sem_alteracao': True}
+    if envio['conteudo'] is None:
         print(f"Arquivo {nome_arquivo_csv} NAO encontrado!")
         return None
     
@@ -105,9 +81,7 @@ def importar_via_post_generico(nome_arquivo_csv, endpoint, nome_modulo):
     data = {"pag": endpoint, "cmd": "importar_cad", "separador": ";"}
     
     try:
-        with open(nome_arquivo_csv, 'rb') as arquivo:
-            files = {'arquivo': (nome_arquivo_csv, arquivo, 'text/csv')}
-            response = requests.post(url, data=data, files=files, headers=headers, timeout=30)
+        response = post_csv(url, data, nome_arquivo_csv, envio['conteudo'], headers, timeout=30)
         
         if response.status_code == 200:
             try:
@@ -120,6 +94,7 @@ def importar_via_post_generico(nome_arquivo_csv, endpoint, nome_modulo):
                     cadastrados = resultado.get('ok', 0)
                     if cadastrados > 0:
                         print(f"{cadastrados} {nome_modulo} cadastrado(s)!")
+                    registrar_envio_aceito(envio)
                     return resultado
             except json.JSONDecodeError:
                 print(f"Resposta nao eh JSON valido: {response.text[:500]}...")
@@ -158,36 +133,6 @@ def processar_modulo_afastamentos(dados_afastamentos, nome_arquivo_csv, nome_mod
         print(f"\nNenhum dado de {nome_modulo} disponivel")
         return False
 
-def _extrair_afastamentos_situacao(colaboradores):
-    """
-    Extrai afastamentos de situacaoPessoa.
-    Ignora: sitCodSituacao 1 (ativo), 2 (férias), 3 (demissão)
-    """
-    afastamentos = []
-    mapa_situacoes = buscar_situacoes()
-    
-    for col in colaboradores:
-        situacoes = col.get('situacaoPessoa') or []
-        matricula = str(col.get('nroMatrExterno', '')).zfill(6)
-        
-        for sit in situacoes:
-            cod = str(sit.get('sitCodSituacao', '')).strip()
-            cod_normalizado = cod.lstrip('0') or '0'  # "01"->"1", "02"->"2", "03"->"3"
-            if cod_normalizado in ('1', '2', '3'):
-                continue  # Ignorar ativo, férias, demissão (têm arquivos exclusivos)
-            
-            obs = mapa_situacoes.get(cod, f'Afastamento {cod}')
-            afastamentos.append({
-                'id-afastamento': cod,
-                'dtinicio': formatar_data_iso_para_br(sit.get('sitDataInicio', '')),
-                'dtfim': formatar_data_iso_para_br(sit.get('sitDataFim', '')),
-                'obs': obs,
-                'campo_chave': 'matricula',
-                'matricula': matricula
-            })
-    
-    return afastamentos
-
 def extrair_datas_dos_campos_corretos(attributes):
     """
     FUNCAO CORRIGIDA: Extrai datas dos campos corretos identificados
@@ -238,8 +183,7 @@ def extrair_datas_dos_campos_corretos(attributes):
 
 def gerar_csv_afastamentos_humanus():
     """Gera CSV de afastamentos a partir da API Humanus (situacaoPessoa)"""
-    colaboradores = buscar_colaboradores_paginado()
-    return _extrair_afastamentos_situacao(colaboradores)
+    return extrair_entidades()['afastamentos']
 
 def mapear_afastamento_para_csv(funcionario_api):
     """
@@ -334,15 +278,10 @@ def processar_integracao_completa():
         print(f"\nINTEGRACAO FINAL CONCLUIDA!")
         print(f"CSV gerado: afastamentos_api.csv")
         
-        # Mostrar todos os registros gerados
-        try:
-            df = pd.read_csv('afastamentos_api.csv', sep=';')
-            print(f"\nREGISTROS GERADOS ({len(df)} total):")
-            for i, row in df.iterrows():
-                print(f"   {row['matricula']}: {row['dtinicio']} a {row['dtfim']} | {row['obs']}")
-                
-        except Exception as e:
-            print(f"Erro ao ler CSV: {e}")
+        # Mostrar todos os registros gerados (linhas em memória, sem reler o CSV)
+        print(f"\nREGISTROS GERADOS ({len(dados_afastamentos)} total):")
+        for row in dados_afastamentos:
+            print(f"   {row['matricula']}: {row['dtinicio']} a {row['dtfim']} | {row['obs']}")
         
         return True
     else:
@@ -368,15 +307,10 @@ if __name__ == "__main__":
                     print(f"\nCSV FINAL GERADO!")
                     print(f"Arquivo: afastamentos_api.csv")
                     
-                    # Mostrar todos os registros
-                    try:
-                        df = pd.read_csv('afastamentos_api.csv', sep=';')
-                        print(f"\nTODOS OS REGISTROS ({len(df)}):")
-                        for i, row in df.iterrows():
-                            print(f"   {row['matricula']}: {row['dtinicio']} a {row['dtfim']} | {row['obs']}")
-                            
-                    except Exception as e:
-                        print(f"Erro ao analisar CSV: {e}")
+                    # Mostrar todos os registros (linhas em memória)
+                    print(f"\nTODOS OS REGISTROS ({len(dados)}):")
+                    for row in dados:
+                        print(f"   {row['matricula']}: {row['dtinicio']} a {row['dtfim']} | {row['obs']}")
                     
         elif comando == "enviar":
             nome_arquivo = sys.argv[2] if len(sys.argv) > 2 else "afastamentos_api.csv"
@@ -4,83 +4,300 @@ Módulo central para buscar dados da API Humanus.
 Todas as informações (cargos, departamentos, funcionários, afastamentos, férias, demissões)
 são obtidas da mesma URL, alterando apenas o número da página.
 Usa cache (memória + SQLite) para evitar consultas repetidas.
+As páginas são lidas em streaming e, na leitura, cada colaborador é reduzido aos
+campos usados (PROJECAO_COLABORADOR), sem guardar o export completo da API.
 """
 
 import requests
+import codecs
 import json
 import time
 import os
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
 from config_reader import obter_config_api_humanus, obter_headers_api, obter_empresas_permitidas
+from auth_humanus import http_get_humanus
+from datas import iso_para_br
 
+# Serializa a busca de colaboradores quando módulos rodam em paralelo (main.py):
+# o primeiro busca e popula o cache, os demais reaproveitam
+_busca_lock = threading.RLock()
 
-def _buscar_colaboradores_da_api():
+
+# Campos do colaborador usados pela integração: funcionarios.mapear_colaborador_para_csv,
+# extracao_humanus (cargo, lotação e situacaoPessoa) e colunas indexadas do cache_db.
+# O restante do export (histCodGfip, histLotacao, pessoaFisFunc completo etc.) é descartado
+# na leitura. None = valor mantido inteiro; dict = objeto aninhado (em listas, vale para cada item).
+PROJECAO_COLABORADOR = {
+    'codEmpresa': None,
+    'nroMatrExterno': None,
+    'nomeExtenso': None,
+    'ultSituacao': None,
+    'dataUltimaAlteracao': None,
+    'pessoaFisica': {
+        'pfiCpfnumeroDigito': None,
+        'pfiPisnumeroDigito': None,
+        'pfiEstadoCivil': None,
+        'pfiDataNascim': None,
+        'pfiNomeMae': None,
+        'pfiNomePai': None,
+        'pfiMobilityEmailHome': None,
+    },
+    'pessoaFisFunc': {
+        'pffCodCargo': None,
+        'pffDescricaoCargo': None,
+        'pffValorSalario': None,
+    },
+    'pessoaFunc': {
+        'pfuDtInicioContrato': None,
+        'lotacao': {
+            'lotCodlotacao': None,
+            'lotDenominacao': None,
+        },
+    },
+    'situacaoPessoa': {
+        'sitCodSituacao': None,
+        'sitDataInicio': None,
+        'sitDataFim': None,
+    },
+}
+
+# Campos de cadastro da pessoa: a Humanus os envia na raiz ou dentro de um objeto filho
+# de nome variável (ver funcionarios._valor_campo_pessoa_api), então são mantidos onde vierem
+CAMPOS_PESSOA = (
+    'pesNomeExtenso', 'pesEmail', 'pesTelCelular', 'pesEndRua',
+    'pesEndBairro', 'pesEndCidade', 'pesEndEstado', 'pesEndCep',
+)
+
+
+def _projetar(valor, projecao):
+    """Aplica uma projeção de PROJECAO_COLABORADOR a um objeto (ou a cada item de uma lista)"""
+    if isinstance(valor, list):
+        return [_projetar(item, projecao) for item in valor]
+    if not isinstance(valor, dict):
+        return valor
+    return {
+        chave: valor[chave] if sub is None else _projetar(valor[chave], sub)
+        for chave, sub in projecao.items() if chave in valor
+    }
+
+
+def projetar_colaborador(col):
     """
-    Busca todos os colaboradores da API Humanus com paginação.
-    Incrementa NumeroPagina até receber 404 (sem mais resultados).
+    Reduz o colaborador do export aos campos de PROJECAO_COLABORADOR e CAMPOS_PESSOA,
+    preservando a ordem das chaves. Aplicado na leitura das páginas, antes do cache.
+    """
+    if not isinstance(col, dict):
+        return col
+    projetado = {}
+    for chave, valor in col.items():
+        if chave in PROJECAO_COLABORADOR:
+            sub = PROJECAO_COLABORADOR[chave]
+            projetado[chave] = valor if sub is None else _projetar(valor, sub)
+        elif chave in CAMPOS_PESSOA:
+            projetado[chave] = valor
+        
+        if isinstance(valor, dict):
+            pessoa = {campo: valor[campo] for campo in CAMPOS_PESSOA if campo in valor}
+            if pessoa:
+                projetado.setdefault(chave, {}).update(pessoa)
+    return projetado
+
+
+def _normalizar_pagina(dados):
+    """Normaliza o retorno de uma página: pode vir como lista ou objeto com lista."""
+    if isinstance(dados, list):
+        return dados
+    if isinstance(dados, dict):
+        colaboradores_pagina = dados.get('data', dados.get('colaboradores', [dados]))
+        if not isinstance(colaboradores_pagina, list):
+            colaboradores_pagina = [colaboradores_pagina] if colaboradores_pagina else []
+        return colaboradores_pagina
+    return []
+
+
+def _partes_texto(response, tamanho_bloco=65536):
+    """Corpo da resposta em blocos de texto (UTF-8, BOM removido), lidos sob demanda do socket"""
+    decodificador = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    for bloco in response.iter_content(chunk_size=tamanho_bloco):
+        texto = decodificador.decode(bloco)
+        if texto:
+            yield texto
+    texto = decodificador.decode(b'', final=True)
+    if texto:
+        yield texto
+
+
+def _iterar_colaboradores_json(partes):
+    """
+    Parser incremental de uma página do export: recebe o corpo em blocos de texto e
+    produz cada colaborador do array JSON assim que o objeto dele fica completo,
+    sem montar a página inteira em memória.
+    Objeto no nível superior (ex.: {"data": [...]}) ou vários objetos concatenados
+    são lidos inteiros (uma decodificação só, no fim do corpo) e normalizados como
+    em _normalizar_pagina.
+    
+    Raises:
+        ValueError: corpo não é JSON válido
+    """
+    decoder = json.JSONDecoder()
+    partes = iter(partes)
+    buffer = ''
+    pos = 0
+    
+    # Primeiro caractere do corpo: só um array é lido item a item
+    for parte in partes:
+        buffer += parte
+        pos = len(buffer) - len(buffer.lstrip())
+        if pos < len(buffer):
+            break
+    if buffer[pos:pos + 1] != '[':
+        yield from _objetos_json(decoder, buffer + ''.join(partes))
+        return
+    pos += 1
+    
+    while True:
+        # Espaços e vírgulas entre elementos do array
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buffer):
+            if buffer[pos] == ']':
+                return  # Fim do array: o restante do corpo é ignorado
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+                yield item
+                continue
+            except json.JSONDecodeError:
+                pass  # Objeto incompleto: lê o próximo bloco
+        
+        parte = next(partes, None)
+        if parte is None:
+            raise ValueError("JSON incompleto ou inválido")
+        buffer = buffer[pos:] + parte
+        pos = 0
+
+
+def _objetos_json(decoder, texto):
+    """Objeto(s) JSON do corpo inteiro, normalizados como em _normalizar_pagina"""
+    pos = 0
+    while True:
+        while pos < len(texto) and texto[pos] in ' \t\r\n':
+            pos += 1
+        if pos >= len(texto):
+            return
+        try:
+            item, pos = decoder.raw_decode(texto, pos)
+        except json.JSONDecodeError:
+            raise ValueError("JSON incompleto ou inválido")
+        yield from _normalizar_pagina(item)
+
+
+def _buscar_pagina(url_base, numero_pagina, tamanho_pagina, headers, filtros=None, projecao=None):
+    """
+    Busca uma única página do export de colaboradores, lendo a resposta em streaming
+    (cada colaborador é interpretado assim que chega, já com a projeção aplicada).
+    filtros: parâmetros extras da query (ex.: data de alteração no modo incremental).
+    projecao: função aplicada a cada colaborador (ver _exportar_colaboradores).
     
     Returns:
-        list: Lista de todos os colaboradores (objetos JSON)
+        tuple: (status, colaboradores_pagina, mensagem)
+            status 'ok'   -> página com dados
+            status 'fim'  -> 404, página vazia ou sem dados (fim da paginação)
+            status 'erro' -> erro HTTP, JSON inválido ou falha de requisição
     """
-    config = obter_config_api_humanus()
-    if not config:
-        print("❌ Configuração da API Humanus não encontrada")
-        return []
+    url = f"{url_base}?NumeroPagina={numero_pagina}&TamanhoPagina={tamanho_pagina}"
+    if filtros:
+        url += '&' + urlencode(filtros)
+    try:
+        response = http_get_humanus(url, headers, timeout=60, stream=True)
+    except requests.exceptions.RequestException as e:
+        return 'erro', [], f"❌ Erro na requisição: {e}"
     
-    headers = obter_headers_api()
-    if not headers:
-        print("❌ Não foi possível obter headers da API")
-        return []
+    try:
+        if response.status_code == 404:
+            return 'fim', [], "✅ Fim dos dados (404)"
+        
+        if response.status_code != 200:
+            return 'erro', [], f"❌ Erro {response.status_code}"
+        
+        # A API pode retornar array JSON, objeto com a lista ou objetos concatenados
+        colaboradores_pagina = []
+        try:
+            for col in _iterar_colaboradores_json(_partes_texto(response)):
+                colaboradores_pagina.append(projecao(col) if projecao else col)
+        except ValueError:
+            return 'erro', [], "❌ Resposta não é JSON válido"
+        except requests.exceptions.RequestException as e:
+            return 'erro', [], f"❌ Erro na leitura da resposta: {e}"
+    finally:
+        response.close()
     
-    url_base = config['url_base']
-    tamanho_pagina = config.get('tamanho_pagina', 50)
+    if not colaboradores_pagina:
+        return 'fim', [], "✅ Sem mais dados"
     
+    return 'ok', colaboradores_pagina, ""
+
+
+def _buscar_paginas_sequencial(url_base, tamanho_pagina, headers, filtros=None, projecao=None):
+    """
+    Busca as páginas uma a uma (modo original, workers_paginas = 1).
+    
+    Returns:
+        tuple: (lista de colaboradores, True se terminou sem erro)
+    """
     todos_colaboradores = []
     numero_pagina = 1
     
-    print("🔍 Buscando colaboradores na API Humanus...")
-    
     while True:
-        try:
-            url = f"{url_base}?NumeroPagina={numero_pagina}&TamanhoPagina={tamanho_pagina}"
+        print(f"  📄 Página {numero_pagina}... ", end="")
+        status, colaboradores_pagina, mensagem = _buscar_pagina(url_base, numero_pagina, tamanho_pagina, headers, filtros, projecao)
+        
+        if status != 'ok':
+            print(mensagem)
+            return todos_colaboradores, status == 'fim'
+        
+        todos_colaboradores.extend(colaboradores_pagina)
+        print(f"✅ {len(colaboradores_pagina)} colaboradores (Total: {len(todos_colaboradores)})")
+        
+        if len(colaboradores_pagina) < tamanho_pagina:
+            return todos_colaboradores, True
+        
+        numero_pagina += 1
+        time.sleep(0.3)  # Evitar sobrecarga
+
+
+def _buscar_paginas_concorrente(url_base, tamanho_pagina, headers, workers, filtros=None, projecao=None):
+    """
+    Mantém até `workers` páginas em andamento ao mesmo tempo.
+    As páginas são consumidas em ordem (1, 2, 3...): ao encontrar o terminador
+    (404, página vazia ou página menor que tamanho_pagina) para de agendar novas
+    páginas e descarta as que foram buscadas além do fim.
+    
+    Returns:
+        tuple: (lista de colaboradores, True se terminou sem erro)
+    """
+    todos_colaboradores = []
+    sucesso = True
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pendentes = {}
+        proxima_pagina = 1
+        for _ in range(workers):
+            pendentes[proxima_pagina] = executor.submit(
+                _buscar_pagina, url_base, proxima_pagina, tamanho_pagina, headers, filtros, projecao
+            )
+            proxima_pagina += 1
+        
+        numero_pagina = 1
+        while numero_pagina in pendentes:
+            status, colaboradores_pagina, mensagem = pendentes.pop(numero_pagina).result()
             print(f"  📄 Página {numero_pagina}... ", end="")
             
-            response = requests.get(url, headers=headers, timeout=60)
-            
-            if response.status_code == 404:
-                print("✅ Fim dos dados (404)")
-                break
-            
-            if response.status_code != 200:
-                print(f"❌ Erro {response.status_code}")
-                break
-            
-            # A API pode retornar JSON ou array JSON
-            try:
-                dados = response.json()
-            except json.JSONDecodeError:
-                # Pode ser que retorne texto com múltiplos objetos JSON
-                texto = response.text.strip()
-                if not texto:
-                    print("✅ Página vazia - fim")
-                    break
-                try:
-                    dados = json.loads(texto)
-                except json.JSONDecodeError:
-                    print("❌ Resposta não é JSON válido")
-                    break
-            
-            # Normalizar: pode vir como lista ou objeto com lista
-            if isinstance(dados, list):
-                colaboradores_pagina = dados
-            elif isinstance(dados, dict):
-                colaboradores_pagina = dados.get('data', dados.get('colaboradores', [dados]))
-                if not isinstance(colaboradores_pagina, list):
-                    colaboradores_pagina = [colaboradores_pagina] if colaboradores_pagina else []
-            else:
-                colaboradores_pagina = []
-            
-            if not colaboradores_pagina:
-                print("✅ Sem mais dados")
+            if status != 'ok':
+                print(mensagem)
+                sucesso = status == 'fim'
                 break
             
             todos_colaboradores.extend(colaboradores_pagina)
@@ -89,15 +306,65 @@ def _buscar_colaboradores_da_api():
             if len(colaboradores_pagina) < tamanho_pagina:
                 break
             
+            pendentes[proxima_pagina] = executor.submit(
+                _buscar_pagina, url_base, proxima_pagina, tamanho_pagina, headers, filtros, projecao
+            )
+            proxima_pagina += 1
             numero_pagina += 1
-            time.sleep(0.3)  # Evitar sobrecarga
-            
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Erro na requisição: {e}")
-            break
+        
+        # Páginas além do fim: cancela as que ainda não começaram, ignora o resultado das demais
+        for futuro in pendentes.values():
+            futuro.cancel()
+    
+    return todos_colaboradores, sucesso
+
+
+def _exportar_colaboradores(filtros=None, projecao=None):
+    """
+    Busca todos os colaboradores da API Humanus com paginação.
+    Incrementa NumeroPagina até receber 404 (sem mais resultados).
+    Com workers_paginas > 1 em [APISOURCE], mantém várias páginas em andamento
+    ao mesmo tempo, preservando a ordem das páginas no resultado.
+    filtros: parâmetros extras repassados em cada página (modo incremental).
+    projecao: função aplicada a cada colaborador ao ler a página (ex.: projetar_colaborador).
+    
+    Returns:
+        tuple: (lista de colaboradores, True se a paginação terminou sem erro)
+    """
+    config = obter_config_api_humanus()
+    if not config:
+        print("❌ Configuração da API Humanus não encontrada")
+        return [], False
+    
+    headers = obter_headers_api()
+    if not headers:
+        print("❌ Não foi possível obter headers da API")
+        return [], False
+    
+    url_base = config['url_base']
+    tamanho_pagina = config.get('tamanho_pagina', 50)
+    workers = max(1, config.get('workers_paginas', 1))
+    
+    if workers > 1:
+        print(f"🔍 Buscando colaboradores na API Humanus ({workers} páginas em paralelo)...")
+        todos_colaboradores, sucesso = _buscar_paginas_concorrente(url_base, tamanho_pagina, headers, workers, filtros, projecao)
+    else:
+        print("🔍 Buscando colaboradores na API Humanus...")
+        todos_colaboradores, sucesso = _buscar_paginas_sequencial(url_base, tamanho_pagina, headers, filtros, projecao)
     
     print(f"\n✅ Total de colaboradores coletados: {len(todos_colaboradores)}")
-    return todos_colaboradores
+    return todos_colaboradores, sucesso
+
+
+def _buscar_colaboradores_da_api(filtros=None):
+    """
+    Busca todos os colaboradores da API Humanus com paginação.
+    
+    Returns:
+        list: Lista de todos os colaboradores (objetos JSON)
+    """
+    colaboradores, _ = _exportar_colaboradores(filtros)
+    return colaboradores
 
 
 def _filtrar_por_empresas(colaboradores):
@@ -121,34 +388,126 @@ def _filtrar_por_empresas(colaboradores):
     return filtrados
 
 
+def _sincronizar_incremental():
+    """
+    Modo incremental ([CACHE] modo_incremental = sim): busca no export só os
+    colaboradores alterados desde o maior dataUltimaAlteracao já sincronizado
+    e grava só as linhas alteradas no cache em disco.
+    
+    Returns:
+        list: colaboradores atualizados, ou None quando é preciso um refresh completo
+              (modo desligado, sem snapshot/marcas, refresh agendado vencido ou erro no delta)
+    """
+    try:
+        from cache_db import (obter_config_incremental, get_estado_sincronizacao,
+                              get_colaboradores_cache, get_maior_data_alteracao,
+                              mesclar_colaboradores_cache, registrar_sincronizacao,
+                              set_colaboradores_memoria, renovar_cache_memoria)
+    except ImportError:
+        return None
+    
+    config_incremental = obter_config_incremental()
+    if not config_incremental['ativo']:
+        return None
+    
+    config = obter_config_api_humanus()
+    parametro = config.get('parametro_data_alteracao') if config else None
+    if not parametro:
+        print("⚠️ modo_incremental ativo, mas parametro_data_alteracao não configurado em [APISOURCE] - refresh completo")
+        return None
+    
+    estado = get_estado_sincronizacao()
+    if not estado or not estado.get('ultimo_refresh_completo'):
+        return None
+    try:
+        ultimo_refresh = datetime.fromisoformat(estado['ultimo_refresh_completo'])
+    except ValueError:
+        return None
+    if datetime.now() - ultimo_refresh > timedelta(hours=config_incremental['refresh_completo_horas']):
+        print(f"🔄 Refresh completo agendado (a cada {config_incremental['refresh_completo_horas']}h)")
+        return None
+    
+    desde = get_maior_data_alteracao()
+    if not desde:
+        return None
+    
+    print(f"🔁 Sincronização incremental: alterações desde {desde}")
+    delta, sucesso = _exportar_colaboradores(filtros={parametro: desde}, projecao=projetar_colaborador)
+    if not sucesso:
+        print("⚠️ Falha ao buscar o delta - refresh completo")
+        return None
+    
+    # Mescla renova a validade do cache mesmo sem alterações
+    alterados = mesclar_colaboradores_cache(delta)
+    print(f"🔁 Delta: {len(delta)} recebidos, {len(alterados)} alterados")
+    registrar_sincronizacao()
+    
+    # Sem alterações: o snapshot em memória (processo em modo daemon) continua valendo
+    if not alterados:
+        memoria = renovar_cache_memoria()
+        if memoria is not None:
+            return memoria
+    
+    colaboradores = get_colaboradores_cache(ignorar_validade=True, empresas=obter_empresas_permitidas())
+    if colaboradores is None:
+        return None
+    set_colaboradores_memoria(colaboradores, persistir=False)
+    return colaboradores
+
+
 def buscar_colaboradores_paginado(force_api=False):
     """
-    Busca colaboradores com cache. Ordem: memória -> disco -> API.
+    Busca colaboradores com cache. Ordem: memória -> disco -> delta incremental -> API.
     Filtra por empresas_permitidas do .config.
     """
+    with _busca_lock:
+        return _buscar_colaboradores(force_api)
+
+
+def _buscar_colaboradores(force_api):
+    """Corpo de buscar_colaboradores_paginado (executado sob _busca_lock)"""
     if not force_api:
         try:
-            from cache_db import get_colaboradores, set_colaboradores_memoria
-            cached = get_colaboradores()
+            from cache_db import get_colaboradores
+            cached = get_colaboradores(empresas=obter_empresas_permitidas())
             if cached is not None:
                 return _filtrar_por_empresas(cached)
         except ImportError:
             pass
+        
+        sincronizados = _sincronizar_incremental()
+        if sincronizados is not None:
+            return _filtrar_por_empresas(sincronizados)
     
-    # Buscar da API
-    colaboradores = _buscar_colaboradores_da_api()
+    # Buscar da API (export completo), já reduzido aos campos usados
+    colaboradores, sucesso = _exportar_colaboradores(projecao=projetar_colaborador)
     
-    # Salvar no cache (dados brutos, filtro na leitura)
+    # Salvar no cache (dados brutos, uma linha por colaborador; filtro na leitura)
     if colaboradores:
         try:
-            from cache_db import set_colaboradores_memoria
+            from cache_db import set_colaboradores_memoria, registrar_sincronizacao
             set_colaboradores_memoria(colaboradores)
+            if sucesso:
+                registrar_sincronizacao(refresh_completo=True)
         except ImportError:
             pass
     
     return _filtrar_por_empresas(colaboradores)
 
 
+def buscar_registros_colaboradores(force_api=False):
+    """
+    Ingestão para os módulos de integração: colaboradores (já filtrados por empresa)
+    convertidos em registros compactos colaborador.Colaborador.
+    """
+    from colaborador import Colaborador, reiniciar_resolvedor_pessoa, resumo_resolvedor_pessoa
+    colaboradores = buscar_colaboradores_paginado(force_api=force_api) or []
+    reiniciar_resolvedor_pessoa()
+    registros = [Colaborador.de_api(col) for col in colaboradores]
+    print(resumo_resolvedor_pessoa())
+    return registros
+
+
 def buscar_situacoes():
     """
     Busca o mapeamento de situações (códigos para descrições).
@@ -174,7 +533,7 @@ def buscar_situacoes():
         headers = obter_headers_api()
         if headers:
             try:
-                response = requests.get(url_situacao, headers=headers, timeout=30)
+                response = http_get_humanus(url_situacao, headers, timeout=30)
                 if response.status_code == 200:
                     dados = response.json()
                     # Salvar no arquivo para próxima vez
@@ -211,15 +570,5 @@ def _mapear_situacoes(dados):
 
 
 def formatar_data_iso_para_br(data_iso):
-    """Converte data ISO (2025-02-18T00:00:00) para DD/MM/YYYY"""
-    if not data_iso:
-        return ""
-    try:
-        data_str = str(data_iso).replace('Z', '').split('T')[0]
-        if len(data_str) >= 10:
-            from datetime import datetime
-            dt = datetime.strptime(data_str[:10], '%Y-%m-%d')
-            return dt.strftime('%d/%m/%Y')
-    except Exception:
-        pass
-    return ""
+    """Converte data ISO (2025-02-18T00:00:00) para DD/MM/YYYY (conversão em cache, ver datas.py)"""
+    return iso_para_br(data_iso)
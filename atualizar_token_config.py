@@ -15,6 +15,8 @@ import sys
 import json
 import configparser
 import requests
+from config_reader import ler_config
+from http_client import http_post
 
 # Corrige encoding no Windows
 if sys.platform == 'win32':
@@ -31,10 +33,9 @@ def obter_credenciais(silencioso=False):
             print("❌ Arquivo .config não encontrado")
         return None
     
-    config = configparser.ConfigParser()
-    config.read('.config', encoding='utf-8')
+    config = ler_config()
     
-    if 'APISOURCE' not in config:
+    if not config or 'APISOURCE' not in config:
         if not silencioso:
             print("❌ Seção [APISOURCE] não encontrada no .config")
         return None
@@ -80,7 +81,7 @@ def gerar_token(credenciais):
         url = credenciais['url_token']
         print(f"🔑 Obtendo token da API Humanus...")
         print(f"   URL: {url[:60]}..." if len(url) > 60 else f"   URL: {url}")
-        response = requests.post(
+        response = http_post(
             url,
             json=payload,
             headers=headers,
@@ -154,7 +155,9 @@ def gravar_token_no_config(token):
 def atualizar_token_se_credenciais(silencioso=False):
     """
     Se o .config tiver credenciais (url_token, alias_name, user_name, password),
-    obtém token da API e grava no .config.
+    garante um token válido e grava no .config quando ele mudar.
+    O token só é pedido à API quando o atual estiver perto de expirar
+    (ver auth_humanus.obter_token_humanus).
     Retorna True se OK (atualizado ou sem credenciais), False se falhou.
     Usado no início de cada execução da integração.
     """
@@ -162,10 +165,14 @@ def atualizar_token_se_credenciais(silencioso=False):
     if not credenciais:
         return True  # Sem credenciais, usa token fixo se existir
     
-    token = gerar_token(credenciais)
+    from auth_humanus import obter_token_humanus
+    token = obter_token_humanus()
     if not token:
         return False
     
+    token_config = (ler_config() or {}).get('APISOURCE', {}).get('token', '').strip('"').strip()
+    if token == token_config:
+        return True
     return gravar_token_no_config(token)
 
 
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Token da API de destino (Hevi).
+O token é o SHA-256 de [APITARGET] token_base + a data de hoje em São Paulo (DD/MM/AAAA):
+muda só à meia-noite de São Paulo. É calculado uma vez por dia e guardado em memória,
+compartilhado pelos módulos de envio; no modo daemon a virada do dia gera o novo token
+na primeira chamada depois da meia-noite.
+"""
+
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+from config_reader import obter_config_target
+
+TZ_SAO_PAULO = pytz.timezone('America/Sao_Paulo')
+
+# (token_base, data DD/MM/AAAA, token, epoch da próxima meia-noite em São Paulo)
+_token_dia = None
+_token_lock = threading.Lock()
+
+
+def data_atual_sao_paulo():
+    """Data de hoje em São Paulo no formato do token (DD/MM/AAAA)"""
+    return datetime.now(TZ_SAO_PAULO).strftime('%d/%m/%Y')
+
+
+def _proxima_meia_noite(agora):
+    """Epoch da próxima meia-noite de São Paulo a partir de `agora` (datetime com fuso)"""
+    amanha = datetime.combine(agora.date() + timedelta(days=1), datetime.min.time())
+    return TZ_SAO_PAULO.localize(amanha).timestamp()
+
+
+def token_do_dia(token_base):
+    """
+    Token da API de destino para hoje: sha256(token_base + DD/MM/AAAA de São Paulo).
+    Recalculado só na virada do dia ou se o token_base do .config mudar.
+    """
+    global _token_dia
+    memo = _token_dia
+    if memo and memo[0] == token_base and time.time() < memo[3]:
+        return memo[2]
+    
+    with _token_lock:
+        memo = _token_dia
+        if memo and memo[0] == token_base and time.time() < memo[3]:
+            return memo[2]
+        
+        agora = datetime.now(TZ_SAO_PAULO)
+        data_atual = agora.strftime('%d/%m/%Y')
+        token = hashlib.sha256((token_base + data_atual).encode('utf-8')).hexdigest()
+        _token_dia = (token_base, data_atual, token, _proxima_meia_noite(agora))
+        
+        print(f"🔑 Token da API de destino gerado para {data_atual}: {token[:32]}...")
+        return token
+
+
+def obter_token_target():
+    """
+    Configurações de [APITARGET] e o token do dia da API de destino.
+    
+    Returns:
+        tuple: (config_target, token) - (None, None) sem a seção [APITARGET]
+    """
+    config_target = obter_config_target()
+    if not config_target:
+        return None, None
+    return config_target, token_do_dia(config_target['token_base'])
@@ -3,15 +3,60 @@
 Geração de token para a API Humanus.
 Envia POST para o endpoint de autenticação com aliasName, userName e password.
 O token gerado é usado no header Authorization: Bearer <token>.
+
+O token é um JWT: obter_token_humanus lê o exp localmente e reutiliza o token (memória,
+.config ou .token_humanus) até [APISOURCE] margem_renovacao_token segundos antes de
+expirar; só então pede outro, uma vez só mesmo com várias threads pedindo ao mesmo tempo.
+http_get_humanus repete a requisição uma vez com token novo se a API responder 401.
 """
 
 import requests
+from http_client import http_get, http_post
+from config_reader import obter_config_api_humanus
+import base64
 import json
 import os
+import threading
+import time
+from datetime import datetime
 
 # Cache em arquivo para evitar requisições repetidas (token costuma ser estável)
 _TOKEN_CACHE_FILE = '.token_humanus'
 
+_token_atual = None  # Último token obtido ou validado nesta execução
+_token_lock = threading.Lock()
+
+
+def validade_token(token):
+    """
+    Lê os claims nbf/exp do JWT (sem validar a assinatura - só para saber quando renovar).
+    
+    Returns:
+        tuple: (nbf, exp) em segundos epoch (None se ausentes); (None, None) se não for JWT
+    """
+    try:
+        payload = token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        nbf, exp = claims.get('nbf'), claims.get('exp')
+        return (float(nbf) if nbf is not None else None,
+                float(exp) if exp is not None else None)
+    except Exception:
+        return None, None
+
+
+def _token_expirando(token, margem_segundos):
+    """True se o token expira dentro da margem. Sem exp legível não dá para saber: reutiliza"""
+    _, exp = validade_token(token)
+    return exp is not None and exp - margem_segundos <= time.time()
+
+
+def _descrever_validade(token):
+    nbf, exp = validade_token(token)
+    if exp is None:
+        return "sem data de expiração"
+    inicio = f"de {datetime.fromtimestamp(nbf).strftime('%H:%M:%S')} " if nbf else ""
+    return f"válido {inicio}até {datetime.fromtimestamp(exp).strftime('%d/%m/%Y %H:%M:%S')}"
+
 
 def _ler_token_cache():
     """Lê token do cache em disco, se existir."""
@@ -53,7 +98,7 @@ def gerar_token(url_token, alias_name, user_name, password, usar_cache=True):
     
     if usar_cache:
         cached = _ler_token_cache()
-        if cached:
+        if cached and not _token_expirando(cached, 0):
             return cached
     
     headers = {
@@ -68,7 +113,7 @@ def gerar_token(url_token, alias_name, user_name, password, usar_cache=True):
     
     try:
         print("🔑 Gerando token da API Humanus...")
-        response = requests.post(url_token, json=payload, headers=headers, timeout=30)
+        response = http_post(url_token, json=payload, headers=headers, timeout=30)
         
         texto = response.text.strip()
         
@@ -99,7 +144,7 @@ def gerar_token(url_token, alias_name, user_name, password, usar_cache=True):
         
         if token:
             _salvar_token_cache(token)
-            print("✅ Token gerado com sucesso")
+            print(f"✅ Token gerado com sucesso ({_descrever_validade(token)})")
             return token
         
         print("❌ Resposta da API não contém token")
@@ -108,3 +153,89 @@ def gerar_token(url_token, alias_name, user_name, password, usar_cache=True):
     except requests.exceptions.RequestException as e:
         print(f"❌ Erro na requisição de token: {e}")
         return None
+
+
+def _token_reutilizavel(config, margem_segundos, token_rejeitado=None):
+    """
+    Token ainda fora da margem de renovação: o desta execução, o do .config ou o do
+    .token_humanus. Depois de um 401 só vale um token diferente do rejeitado já obtido
+    por outra thread (não adianta tentar de novo os gravados).
+    """
+    global _token_atual
+    if token_rejeitado:
+        return _token_atual if _token_atual and _token_atual != token_rejeitado else None
+    
+    for candidato in (_token_atual, config.get('token'), _ler_token_cache()):
+        if candidato and not _token_expirando(candidato, margem_segundos):
+            _token_atual = candidato
+            return candidato
+    return None
+
+
+def obter_token_humanus(token_rejeitado=None):
+    """
+    Token da API Humanus para o header Authorization.
+    Com credenciais em [APISOURCE] reutiliza o token enquanto faltar mais que
+    margem_renovacao_token para o exp do JWT e só então gera outro; sem credenciais
+    usa o token fixo do .config.
+    
+    Args:
+        token_rejeitado: token que recebeu 401 - força a renovação (uma vez, mesmo
+            com várias threads rejeitadas ao mesmo tempo)
+    
+    Returns:
+        str: token, ou None se não houver token utilizável
+    """
+    global _token_atual
+    config = obter_config_api_humanus() or {}
+    credenciais = (config.get('url_token'), config.get('alias_name'),
+                   config.get('user_name'), config.get('password'))
+    if not all(credenciais):
+        return config.get('token')
+    
+    margem = config.get('margem_renovacao_token', 300)
+    token = _token_reutilizavel(config, margem, token_rejeitado)
+    if token:
+        return token
+    
+    with _token_lock:
+        # Outra thread pode ter renovado enquanto esta esperava o lock
+        token = _token_reutilizavel(config, margem, token_rejeitado)
+        if token:
+            return token
+        
+        if token_rejeitado:
+            print("🔑 Token da API Humanus rejeitado (401) - gerando outro...")
+        else:
+            print("🔑 Token da API Humanus ausente ou perto de expirar - gerando outro...")
+        novo = gerar_token(*credenciais, usar_cache=False)
+        if novo:
+            _token_atual = novo
+            return novo
+        
+        # Falha ao renovar: segue com o token atual enquanto ele não tiver expirado de fato
+        if _token_atual and _token_atual != token_rejeitado and not _token_expirando(_token_atual, 0):
+            print("⚠️ Mantendo o token atual até a expiração")
+            return _token_atual
+        return None
+
+
+def http_get_humanus(url, headers, **kwargs):
+    """
+    GET na API Humanus (http_get) que, ao receber 401, renova o token e repete a
+    requisição uma vez. O header Authorization de `headers` é atualizado no lugar:
+    as próximas requisições com o mesmo dict (ex.: demais páginas do export) já saem
+    com o token novo.
+    """
+    response = http_get(url, headers=headers, **kwargs)
+    if response.status_code != 401:
+        return response
+    
+    rejeitado = headers.get('Authorization', '').replace('Bearer ', '', 1)
+    novo = obter_token_humanus(token_rejeitado=rejeitado)
+    if not novo or novo == rejeitado:
+        return response
+    
+    response.close()
+    headers['Authorization'] = f'Bearer {novo}'
+    return http_get(url, headers=headers, **kwargs)
@@ -2,12 +2,18 @@
 """
 Módulo de cache e histórico para a integração.
 Usa SQLite para persistir dados entre execuções e evitar consultas repetidas à API.
+Conexão reutilizada por thread, em WAL; custo das operações em estatisticas_cache_db.
 """
 
 import sqlite3
 import json
 import os
+import hashlib
+import threading
+import time
 from datetime import datetime, timedelta
+from functools import wraps
+from config_reader import obter_config_cache
 
 # Arquivo do banco na pasta do projeto
 DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'integracao_cache.db')
@@ -15,23 +21,184 @@ DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'integracao_c
 # Cache em memória para a execução atual (evita múltiplas consultas à API no mesmo run)
 _cache_colaboradores = None
 _cache_timestamp = None
+_cache_versao = 0  # Incrementa a cada troca de snapshot (ver get_versao_cache_memoria)
 
 
-def _get_conn():
-    """Retorna conexão com o banco SQLite"""
-    conn = sqlite3.connect(DB_PATH)
+# ==================== CONEXÃO ====================
+# Uma conexão por thread, aberta na primeira operação da thread e reutilizada pelas
+# seguintes (os módulos rodam em paralelo; sqlite3 não compartilha conexão entre threads
+# com segurança). O schema é criado uma vez por processo. WAL deixa leituras de uma
+# thread correrem junto com a escrita de outra; busy_timeout espera o lock em vez de
+# falhar com "database is locked".
+
+PRAGMAS_CONEXAO = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",  # Seguro com WAL; fsync só nos checkpoints
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+)
+
+_local = threading.local()
+_conexoes = []  # (thread, conexão) de todas as threads, para fechar_conexoes
+_conexoes_lock = threading.Lock()
+_geracao = 0  # Incrementa em fechar_conexoes: conexões de threads ainda vivas são reabertas
+_schema_pronto = False
+_schema_lock = threading.Lock()
+VERSAO_SCHEMA = 1  # PRAGMA user_version após as migrações de _migrar_schema
+
+# Custo das operações: nome -> {'chamadas', 'segundos'}
+_estatisticas = {}
+_estatisticas_lock = threading.Lock()
+_conexoes_abertas = 0
+
+
+def _abrir_conexao():
+    """Abre a conexão da thread atual com os PRAGMAs da integração"""
+    global _conexoes_abertas
+    # check_same_thread=False só para fechar_conexoes poder fechar no encerramento;
+    # no uso normal cada conexão fica na thread que a abriu
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS_CONEXAO:
+        conn.execute(pragma)
+    
+    with _conexoes_lock:
+        # Threads de pools já encerrados (ciclos anteriores do daemon) não voltam: fecha
+        for thread, antiga in [c for c in _conexoes if not c[0].is_alive()]:
+            antiga.close()
+            _conexoes.remove((thread, antiga))
+        _conexoes.append((threading.current_thread(), conn))
+        _conexoes_abertas += 1
     return conn
 
 
-def _init_db():
-    """Inicializa as tabelas do banco se não existirem"""
-    conn = _get_conn()
-    try:
+def _get_conn():
+    """Retorna a conexão da thread atual (abre na primeira chamada e garante o schema)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.geracao != _geracao:
+        conn = _local.conn = _abrir_conexao()
+        _local.geracao = _geracao
+    if not _schema_pronto:
+        _init_db(conn)
+    return conn
+
+
+def _liberar_conn(conn):
+    """Fim da operação: desfaz transação deixada aberta por erro (a conexão segue reutilizada)"""
+    if conn.in_transaction:
+        conn.rollback()
+
+
+def _operacao_cache(funcao):
+    """Registra chamadas e tempo da operação em _estatisticas (ver estatisticas_cache_db)"""
+    @wraps(funcao)
+    def executar(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            duracao = time.perf_counter() - inicio
+            with _estatisticas_lock:
+                estat = _estatisticas.setdefault(funcao.__name__, {'chamadas': 0, 'segundos': 0.0})
+                estat['chamadas'] += 1
+                estat['segundos'] += duracao
+    return executar
+
+
+def estatisticas_cache_db():
+    """
+    Custo das operações do cache desde a última reinicialização: por operação,
+    chamadas, tempo total e médio; e quantas conexões foram abertas.
+    """
+    with _estatisticas_lock:
+        operacoes = {
+            nome: {
+                'chamadas': e['chamadas'],
+                'segundos': round(e['segundos'], 4),
+                'media_ms': round(e['segundos'] * 1000 / e['chamadas'], 3) if e['chamadas'] else 0.0,
+            }
+            for nome, e in sorted(_estatisticas.items(), key=lambda item: -item[1]['segundos'])
+        }
+    return {'conexoes_abertas': _conexoes_abertas, 'operacoes': operacoes}
+
+
+def resumo_cache_db():
+    """Linha de resumo das estatísticas (para log)"""
+    estat = estatisticas_cache_db()
+    operacoes = estat['operacoes']
+    chamadas = sum(e['chamadas'] for e in operacoes.values())
+    segundos = sum(e['segundos'] for e in operacoes.values())
+    resumo = (f"🗄️ Cache SQLite: {chamadas} operações em {segundos:.2f}s, "
+              f"{estat['conexoes_abertas']} conexão(ões) aberta(s)")
+    if operacoes:
+        nome, maior = next(iter(operacoes.items()))
+        resumo += f" - mais custosa: {nome} ({maior['chamadas']}x, {maior['segundos']:.2f}s)"
+    return resumo
+
+
+def reiniciar_estatisticas_cache_db():
+    """Zera as estatísticas (cada ciclo do daemon reporta só o próprio custo)"""
+    global _conexoes_abertas
+    with _estatisticas_lock:
+        _estatisticas.clear()
+    with _conexoes_lock:
+        _conexoes_abertas = 0
+
+
+def fechar_conexoes():
+    """Fecha as conexões de todas as threads (fim do processo / daemon encerrado)"""
+    global _geracao
+    with _conexoes_lock:
+        _geracao += 1
+        for _, conn in _conexoes:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        _conexoes.clear()
+
+
+def _migrar_schema(conn):
+    """
+    Migrações do banco, controladas por PRAGMA user_version (roda só o que falta).
+    1: remove a tabela cache_colaboradores (JSON do export inteiro numa linha),
+       substituída pela tabela colaboradores.
+    """
+    versao = conn.execute("PRAGMA user_version").fetchone()[0]
+    if versao < 1:
+        conn.execute("DROP TABLE IF EXISTS cache_colaboradores")
+    if versao < VERSAO_SCHEMA:
+        conn.execute(f"PRAGMA user_version = {VERSAO_SCHEMA}")
+
+
+def _init_db(conn):
+    """Inicializa as tabelas do banco se não existirem (uma vez por processo)"""
+    global _schema_pronto
+    with _schema_lock:
+        if _schema_pronto:
+            return
+        _migrar_schema(conn)
         conn.executescript("""
-            CREATE TABLE IF NOT EXISTS cache_colaboradores (
-                id INTEGER PRIMARY KEY CHECK (id = 1),
+            CREATE TABLE IF NOT EXISTS colaboradores (
+                cod_empresa TEXT NOT NULL,
+                matricula TEXT NOT NULL,
+                cpf TEXT,
+                ult_situacao TEXT,
+                cod_lotacao TEXT,
+                data_ultima_alteracao TEXT,
+                hash_conteudo TEXT NOT NULL,
+                ordem INTEGER NOT NULL,
                 dados_json TEXT NOT NULL,
+                atualizado_em TEXT NOT NULL,
+                PRIMARY KEY (cod_empresa, matricula)
+            );
+            
+            CREATE INDEX IF NOT EXISTS idx_colaboradores_cpf ON colaboradores(cpf);
+            CREATE INDEX IF NOT EXISTS idx_colaboradores_situacao ON colaboradores(ult_situacao);
+            CREATE INDEX IF NOT EXISTS idx_colaboradores_lotacao ON colaboradores(cod_lotacao);
+            
+            CREATE TABLE IF NOT EXISTS cache_colaboradores_meta (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
                 total_registros INTEGER,
                 atualizado_em TEXT NOT NULL
             );
@@ -47,44 +214,133 @@ def _init_db():
             
             CREATE INDEX IF NOT EXISTS idx_demissoes_matricula_data 
             ON demissoes_enviadas(matricula, data_demissao);
+            
+            CREATE TABLE IF NOT EXISTS envios_target (
+                chave TEXT PRIMARY KEY,
+                hash_conteudo TEXT NOT NULL,
+                enviado_em TEXT NOT NULL
+            );
+            
+            CREATE TABLE IF NOT EXISTS linhas_enviadas (
+                chave TEXT NOT NULL,
+                chave_linha TEXT NOT NULL,
+                hash_linha TEXT NOT NULL,
+                PRIMARY KEY (chave, chave_linha)
+            );
+            
+            CREATE TABLE IF NOT EXISTS sync_estado (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                ultimo_refresh_completo TEXT,
+                ultima_sincronizacao TEXT
+            );
         """)
         conn.commit()
-    finally:
-        conn.close()
+        _schema_pronto = True
 
 
 def obter_cache_validade_minutos():
     """Lê da config quantos minutos o cache é válido (0 = sempre usar cache até próxima execução)"""
-    try:
-        import configparser
-        config = configparser.ConfigParser()
-        config.read('.config', encoding='utf-8')
-        if 'CACHE' in config:
-            val = config['CACHE'].get('validade_minutos', '60').strip()
-            return int(val) if val.isdigit() else 60
-    except Exception:
-        pass
-    return 60  # Default: 1 hora
+    return obter_config_cache()['validade_minutos']
 
 
-def get_colaboradores_cache():
+def obter_config_incremental():
+    """
+    Lê da config o modo incremental ([CACHE] modo_incremental = sim/nao)
+    e de quantas em quantas horas forçar um refresh completo do export.
     """
-    Retorna colaboradores do cache em disco (SQLite).
+    config_cache = obter_config_cache()
+    return {
+        'ativo': config_cache['modo_incremental'],
+        'refresh_completo_horas': config_cache['refresh_completo_horas']
+    }
+
+
+def chave_colaborador(col):
+    """Chave única do colaborador no export: (codEmpresa, nroMatrExterno)"""
+    return (str(col.get('codEmpresa', '')).strip(), str(col.get('nroMatrExterno', '')).strip())
+
+
+def _chaves_linhas(colaboradores):
+    """
+    Chave da linha de cada colaborador do export: chave_colaborador, ou, quando ela vem
+    vazia (sem codEmpresa/nroMatrExterno) ou repetida, a matrícula seguida de "#ordem"
+    (posição no export). A primeira ocorrência de uma chave repetida fica com a chave
+    original, que é a que o delta do modo incremental atualiza.
+    
+    Returns:
+        tuple: (lista de chaves na ordem do export, total de colaboradores com chave própria)
+    """
+    chaves = []
+    vistas = set()
+    por_ordem = 0
+    for ordem, col in enumerate(colaboradores):
+        chave = chave_colaborador(col)
+        if not all(chave) or chave in vistas:
+            chave = (chave[0], f"{chave[1]}#{ordem}")
+            por_ordem += 1
+        vistas.add(chave)
+        chaves.append(chave)
+    return chaves, por_ordem
+
+
+def _colunas_indexadas(col):
+    """Extrai CPF, ultSituacao e código de lotação para as colunas indexadas"""
+    pfi = col.get('pessoaFisica') or {}
+    pfu = col.get('pessoaFunc') or {}
+    lotacao = pfu.get('lotacao') or {}
+    return (
+        str(pfi.get('pfiCpfnumeroDigito') or '').strip(),
+        str(col.get('ultSituacao') or '').strip(),
+        str(lotacao.get('lotCodlotacao') or '').strip(),
+    )
+
+
+def _serializar_colaborador(col):
+    """Retorna (dados_json, hash_conteudo) de um colaborador"""
+    dados_json = json.dumps(col, ensure_ascii=False)
+    return dados_json, hashlib.sha1(dados_json.encode('utf-8')).hexdigest()
+
+
+def _normalizar_empresa_sql():
+    """Expressão SQL equivalente a cod.lstrip('0') or '0' (ver api_humanus._filtrar_por_empresas)"""
+    return "CASE WHEN ltrim(cod_empresa, '0') = '' THEN '0' ELSE ltrim(cod_empresa, '0') END"
+
+
+def _gravar_meta_cache(conn):
+    """Atualiza total de registros e data de atualização do cache de colaboradores"""
+    total = conn.execute("SELECT COUNT(*) FROM colaboradores").fetchone()[0]
+    atualizado_em = datetime.now().isoformat()
+    conn.execute("""
+        INSERT OR REPLACE INTO cache_colaboradores_meta (id, total_registros, atualizado_em)
+        VALUES (1, ?, ?)
+    """, (total, atualizado_em))
+    return total
+
+
+@_operacao_cache
+def get_colaboradores_cache(ignorar_validade=False, empresas=None, ult_situacao=None,
+                            cpf=None, cod_lotacao=None):
+    """
+    Retorna colaboradores do cache em disco (SQLite), na ordem do export.
     Retorna None se cache não existir ou estiver expirado.
+    Com ignorar_validade=True retorna o último snapshot mesmo expirado.
+    
+    Filtros opcionais (leitura parcial pelas colunas indexadas):
+        empresas: set de códigos normalizados ("4", "1") como em obter_empresas_permitidas
+        ult_situacao, cpf, cod_lotacao: valor exato ou lista de valores
     """
-    _init_db()
-    validade_min = obter_cache_validade_minutos()
+    validade_min = 0 if ignorar_validade else obter_cache_validade_minutos()
     
     conn = _get_conn()
     try:
-        row = conn.execute(
-            "SELECT dados_json, total_registros, atualizado_em FROM cache_colaboradores WHERE id = 1"
+        meta = conn.execute(
+            "SELECT total_registros, atualizado_em FROM cache_colaboradores_meta WHERE id = 1"
         ).fetchone()
         
-        if not row:
+        if not meta:
             return None
         
-        dados_json, total, atualizado_em = row[0], row[1], row[2]
+        total, atualizado_em = meta[0], meta[1]
         
         # Verificar validade
         if validade_min > 0:
@@ -95,65 +351,267 @@ def get_colaboradores_cache():
             except Exception:
                 pass
         
-        colaboradores = json.loads(dados_json)
-        print(f"📂 Cache carregado: {total} colaboradores (atualizado em {atualizado_em})")
+        condicoes = []
+        parametros = []
+        for coluna, valor in (
+            (_normalizar_empresa_sql(), empresas),
+            ('ult_situacao', ult_situacao),
+            ('cpf', cpf),
+            ('cod_lotacao', cod_lotacao),
+        ):
+            if not valor:
+                continue  # None ou vazio = sem filtro
+            valores = [valor] if isinstance(valor, str) else list(valor)
+            condicoes.append(f"{coluna} IN ({','.join('?' * len(valores))})")
+            parametros.extend(valores)
+        
+        sql = "SELECT dados_json FROM colaboradores"
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        sql += " ORDER BY ordem"
+        
+        colaboradores = [json.loads(r[0]) for r in conn.execute(sql, parametros)]
+        if condicoes:
+            print(f"📂 Cache carregado: {len(colaboradores)}/{total} colaboradores (atualizado em {atualizado_em})")
+        else:
+            print(f"📂 Cache carregado: {total} colaboradores (atualizado em {atualizado_em})")
         return colaboradores
         
     except Exception as e:
         print(f"⚠️ Erro ao ler cache: {e}")
         return None
     finally:
-        conn.close()
+        _liberar_conn(conn)
 
 
+@_operacao_cache
 def set_colaboradores_cache(colaboradores):
-    """Salva colaboradores no cache em disco"""
-    _init_db()
+    """
+    Salva o export completo no cache em disco, uma linha por colaborador.
+    Só grava as linhas cujo hash de conteúdo mudou e remove quem saiu do export.
+    """
     conn = _get_conn()
     try:
-        dados_json = json.dumps(colaboradores, ensure_ascii=False)
+        existentes = {
+            (r[0], r[1]): (r[2], r[3])
+            for r in conn.execute("SELECT cod_empresa, matricula, hash_conteudo, ordem FROM colaboradores")
+        }
         atualizado_em = datetime.now().isoformat()
-        conn.execute("""
-            INSERT OR REPLACE INTO cache_colaboradores (id, dados_json, total_registros, atualizado_em)
-            VALUES (1, ?, ?, ?)
-        """, (dados_json, len(colaboradores), atualizado_em))
+        
+        chaves, por_ordem = _chaves_linhas(colaboradores)
+        if por_ordem:
+            print(f"⚠️ Cache: {por_ordem} colaboradores com codEmpresa/nroMatrExterno vazio ou "
+                  f"repetido - gravados pela posição no export")
+        
+        upserts = []
+        reordenar = []
+        chaves_export = set(chaves)
+        for ordem, (col, chave) in enumerate(zip(colaboradores, chaves)):
+            dados_json, hash_conteudo = _serializar_colaborador(col)
+            atual = existentes.get(chave)
+            if atual and atual[0] == hash_conteudo:
+                if atual[1] != ordem:
+                    reordenar.append((ordem,) + chave)
+                continue
+            upserts.append(chave + _colunas_indexadas(col) + (
+                str(col.get('dataUltimaAlteracao') or ''), hash_conteudo, ordem, dados_json, atualizado_em
+            ))
+        
+        removidos = [chave for chave in existentes if chave not in chaves_export]
+        
+        conn.executemany("""
+            INSERT INTO colaboradores (cod_empresa, matricula, cpf, ult_situacao, cod_lotacao,
+                                       data_ultima_alteracao, hash_conteudo, ordem, dados_json, atualizado_em)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(cod_empresa, matricula) DO UPDATE SET
+                cpf = excluded.cpf,
+                ult_situacao = excluded.ult_situacao,
+                cod_lotacao = excluded.cod_lotacao,
+                data_ultima_alteracao = excluded.data_ultima_alteracao,
+                hash_conteudo = excluded.hash_conteudo,
+                ordem = excluded.ordem,
+                dados_json = excluded.dados_json,
+                atualizado_em = excluded.atualizado_em
+        """, upserts)
+        conn.executemany(
+            "UPDATE colaboradores SET ordem = ? WHERE cod_empresa = ? AND matricula = ?", reordenar
+        )
+        conn.executemany(
+            "DELETE FROM colaboradores WHERE cod_empresa = ? AND matricula = ?", removidos
+        )
+        _gravar_meta_cache(conn)
         conn.commit()
-        print(f"💾 Cache salvo: {len(colaboradores)} colaboradores")
+        print(f"💾 Cache salvo: {len(colaboradores)} colaboradores "
+              f"({len(upserts)} gravados, {len(removidos)} removidos)")
     except Exception as e:
         print(f"⚠️ Erro ao salvar cache: {e}")
+        return
     finally:
-        conn.close()
+        _liberar_conn(conn)
+    
+    # Reescrita de boa parte das linhas (ex.: mudança em PROJECAO_COLABORADOR):
+    # devolve ao disco o espaço liberado pelos payloads antigos. O cache já está salvo:
+    # falha aqui só deixa o arquivo maior
+    if existentes and len(upserts) + len(removidos) >= len(existentes) // 2:
+        try:
+            conn.execute("VACUUM")
+        except Exception as e:
+            print(f"⚠️ Erro ao compactar o cache (VACUUM): {e}")
+
 
+# dataUltimaAlteracao que a Humanus envia quando não tem a data (não serve como marca)
+DATA_ALTERACAO_SENTINELA = '0001-01-01T00:00:00'
 
-def get_colaboradores():
+
+def _data_alteracao_valida(data_alteracao):
+    """False para data ausente ou sentinela (0001-01-01...)"""
+    return bool(data_alteracao) and not data_alteracao.startswith(DATA_ALTERACAO_SENTINELA[:10])
+
+
+def _linhas_existentes(conn, chaves):
+    """
+    {(cod_empresa, matricula): (data_ultima_alteracao, hash_conteudo, ordem)} das chaves
+    já gravadas, numa consulta só (chaves numa tabela temporária da conexão).
+    """
+    conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS colaboradores_delta (
+            cod_empresa TEXT NOT NULL,
+            matricula TEXT NOT NULL
+        )
+    """)
+    conn.execute("DELETE FROM colaboradores_delta")
+    conn.executemany("INSERT INTO colaboradores_delta (cod_empresa, matricula) VALUES (?, ?)", set(chaves))
+    existentes = {
+        (r[0], r[1]): (r[2], r[3], r[4])
+        for r in conn.execute("""
+            SELECT c.cod_empresa, c.matricula, c.data_ultima_alteracao, c.hash_conteudo, c.ordem
+            FROM colaboradores_delta d
+            JOIN colaboradores c ON c.cod_empresa = d.cod_empresa AND c.matricula = d.matricula
+        """)
+    }
+    conn.execute("DELETE FROM colaboradores_delta")
+    return existentes
+
+
+@_operacao_cache
+def mesclar_colaboradores_cache(delta):
+    """
+    Grava no cache apenas os colaboradores do delta cujo conteúdo mudou (hash_conteudo)
+    ou que ainda não existiam. Quando a linha gravada e o delta têm dataUltimaAlteracao
+    de verdade (nem ausente nem a sentinela 0001-01-01), um delta mais antigo que a
+    linha é ignorado. Renova a data de atualização do cache mesmo sem alterações.
+    
+    Returns:
+        list: colaboradores efetivamente alterados
+    """
+    conn = _get_conn()
+    try:
+        atualizado_em = datetime.now().isoformat()
+        proxima_ordem = conn.execute("SELECT COALESCE(MAX(ordem), -1) + 1 FROM colaboradores").fetchone()[0]
+        existentes = _linhas_existentes(conn, [chave_colaborador(col) for col in delta])
+        
+        alterados = []
+        gravacoes = []
+        for col in delta:
+            chave = chave_colaborador(col)
+            data_alteracao = str(col.get('dataUltimaAlteracao') or '')
+            dados_json, hash_conteudo = _serializar_colaborador(col)
+            atual = existentes.get(chave)
+            if atual:
+                data_gravada, hash_gravado, ordem = atual
+                if hash_conteudo == hash_gravado:
+                    continue
+                if (_data_alteracao_valida(data_alteracao) and _data_alteracao_valida(data_gravada)
+                        and data_alteracao < data_gravada):
+                    continue
+            else:
+                ordem = proxima_ordem
+                proxima_ordem += 1
+            
+            existentes[chave] = (data_alteracao, hash_conteudo, ordem)
+            gravacoes.append(chave + _colunas_indexadas(col) + (
+                data_alteracao, hash_conteudo, ordem, dados_json, atualizado_em
+            ))
+            alterados.append(col)
+        
+        conn.executemany("""
+            INSERT OR REPLACE INTO colaboradores (cod_empresa, matricula, cpf, ult_situacao, cod_lotacao,
+                                                  data_ultima_alteracao, hash_conteudo, ordem, dados_json, atualizado_em)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, gravacoes)
+        _gravar_meta_cache(conn)
+        conn.commit()
+        return alterados
+    except Exception as e:
+        print(f"⚠️ Erro ao mesclar delta no cache: {e}")
+        return []
+    finally:
+        _liberar_conn(conn)
+
+
+def get_colaboradores(empresas=None):
     """
     Retorna colaboradores do cache: primeiro memória, depois disco.
+    empresas: filtro opcional aplicado na leitura do disco (só as linhas necessárias).
     Retorna None se não houver cache válido (sinal para buscar da API).
     """
-    global _cache_colaboradores, _cache_timestamp
-    
-    # 1. Cache em memória (mesma execução - evita 6 chamadas à API)
+    # 1. Cache em memória (mesma execução - evita 6 chamadas à API).
+    # No modo daemon o processo atravessa vários ciclos: vale a mesma validade do disco.
     if _cache_colaboradores is not None:
-        print(f"📂 Usando cache em memória: {len(_cache_colaboradores)} colaboradores")
-        return _cache_colaboradores
+        if not cache_memoria_valido():
+            print("⏰ Cache em memória expirado")  # Mantido para renovar_cache_memoria
+        else:
+            print(f"📂 Usando cache em memória: {len(_cache_colaboradores)} colaboradores")
+            return _cache_colaboradores
     
     # 2. Cache em disco (execução anterior)
-    cached = get_colaboradores_cache()
+    cached = get_colaboradores_cache(empresas=empresas)
     if cached:
-        _cache_colaboradores = cached
-        _cache_timestamp = datetime.now()
+        set_colaboradores_memoria(cached, persistir=False)
         return cached
     
     # 3. Sem cache - retorna None para api_humanus buscar da API
     return None
 
 
-def set_colaboradores_memoria(colaboradores):
-    """Armazena colaboradores no cache em memória e disco"""
-    global _cache_colaboradores, _cache_timestamp
+def set_colaboradores_memoria(colaboradores, persistir=True):
+    """
+    Armazena colaboradores no cache em memória e disco.
+    persistir=False só atualiza a memória (dados já gravados, ex.: após mesclar delta).
+    """
+    global _cache_colaboradores, _cache_timestamp, _cache_versao
     _cache_colaboradores = colaboradores
     _cache_timestamp = datetime.now()
-    set_colaboradores_cache(colaboradores)
+    _cache_versao += 1
+    if persistir:
+        set_colaboradores_cache(colaboradores)
+
+
+def renovar_cache_memoria():
+    """
+    Renova a validade do snapshot em memória sem trocá-lo (sincronização sem alterações).
+    Retorna o snapshot, ou None se não houver.
+    """
+    global _cache_timestamp
+    if _cache_colaboradores is not None:
+        _cache_timestamp = datetime.now()
+    return _cache_colaboradores
+
+
+def cache_expirado(timestamp):
+    """True se timestamp (datetime) já passou de [CACHE] validade_minutos (0 = nunca expira)"""
+    validade_min = obter_cache_validade_minutos()
+    return validade_min > 0 and datetime.now() - timestamp > timedelta(minutes=validade_min)
+
+
+def cache_memoria_valido():
+    """True se há snapshot em memória dentro da validade (mesma regra do cache em disco)"""
+    return _cache_colaboradores is not None and not cache_expirado(_cache_timestamp)
+
+
+def get_versao_cache_memoria():
+    """Versão do snapshot em memória (muda a cada troca de snapshot); None se não houver"""
+    return _cache_versao if _cache_colaboradores is not None else None
 
 
 def limpar_cache_memoria():
@@ -163,14 +621,82 @@ def limpar_cache_memoria():
     _cache_timestamp = None
 
 
+# ==================== SINCRONIZAÇÃO INCREMENTAL ====================
+
+@_operacao_cache
+def get_maior_data_alteracao():
+    """Retorna o maior dataUltimaAlteracao gravado no cache (high-water mark global)"""
+    conn = _get_conn()
+    try:
+        row = conn.execute("SELECT MAX(data_ultima_alteracao) FROM colaboradores").fetchone()
+        return row[0] if row else None
+    except Exception as e:
+        print(f"⚠️ Erro ao ler marcas de alteração: {e}")
+        return None
+    finally:
+        _liberar_conn(conn)
+
+
+@_operacao_cache
+def registrar_sincronizacao(refresh_completo=False):
+    """Grava a data da sincronização (e do último refresh completo, se for o caso)"""
+    conn = _get_conn()
+    try:
+        agora = datetime.now().isoformat()
+        if refresh_completo:
+            conn.execute("""
+                INSERT OR REPLACE INTO sync_estado (id, ultimo_refresh_completo, ultima_sincronizacao)
+                VALUES (1, ?, ?)
+            """, (agora, agora))
+        else:
+            conn.execute("""
+                INSERT INTO sync_estado (id, ultimo_refresh_completo, ultima_sincronizacao)
+                VALUES (1, NULL, ?)
+                ON CONFLICT(id) DO UPDATE SET ultima_sincronizacao = excluded.ultima_sincronizacao
+            """, (agora,))
+        conn.commit()
+    except Exception as e:
+        print(f"⚠️ Erro ao registrar sincronização: {e}")
+    finally:
+        _liberar_conn(conn)
+
+
+@_operacao_cache
+def get_estado_sincronizacao():
+    """Retorna dict com ultimo_refresh_completo e ultima_sincronizacao (ou None)"""
+    conn = _get_conn()
+    try:
+        row = conn.execute(
+            "SELECT ultimo_refresh_completo, ultima_sincronizacao FROM sync_estado WHERE id = 1"
+        ).fetchone()
+        return dict(row) if row else None
+    except Exception:
+        return None
+    finally:
+        _liberar_conn(conn)
+
+
 # ==================== DEMISSÕES ENVIADAS ====================
 
+# Demissões acumuladas por gravação em RegistroDemissoes
+DEMISSOES_POR_GRAVACAO = 100
+
+# data_demissao (DD/MM/YYYY) como AAAAMMDD, comparável como texto
+_DATA_DEMISSAO_ORDENAVEL = "substr(data_demissao, 7, 4) || substr(data_demissao, 4, 2) || substr(data_demissao, 1, 2)"
+
+
+def obter_retencao_demissoes_dias():
+    """Lê da config por quantos dias o histórico de demissões é mantido (0 = sem limite)"""
+    return obter_config_cache()['retencao_demissoes_dias']
+
+
+@_operacao_cache
 def get_demissoes_ja_enviadas():
     """
-    Retorna set de (matricula, data_demissao) já enviadas.
+    Retorna set de (matricula, data_demissao) já enviadas (histórico inteiro).
     data_demissao em formato DD/MM/YYYY para comparação.
+    Para filtrar as demissões de uma execução use get_demissoes_ja_enviadas_entre.
     """
-    _init_db()
     conn = _get_conn()
     try:
         rows = conn.execute(
@@ -181,12 +707,70 @@ def get_demissoes_ja_enviadas():
         print(f"⚠️ Erro ao ler histórico de demissões: {e}")
         return set()
     finally:
-        conn.close()
+        _liberar_conn(conn)
+
+
+@_operacao_cache
+def get_demissoes_ja_enviadas_entre(chaves):
+    """
+    Das chaves (matricula, data_demissao) candidatas, retorna o set das que já foram enviadas.
+    As candidatas vão para uma tabela temporária (da conexão) cruzada com demissoes_enviadas
+    pela chave única - o custo acompanha as demissões do export, não o histórico inteiro.
+    """
+    chaves = set(chaves)
+    if not chaves:
+        return set()
+    conn = _get_conn()
+    try:
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS demissoes_candidatas (
+                matricula TEXT NOT NULL,
+                data_demissao TEXT NOT NULL
+            )
+        """)
+        conn.execute("DELETE FROM demissoes_candidatas")
+        conn.executemany("INSERT INTO demissoes_candidatas (matricula, data_demissao) VALUES (?, ?)", chaves)
+        rows = conn.execute("""
+            SELECT e.matricula, e.data_demissao
+            FROM demissoes_candidatas c
+            JOIN demissoes_enviadas e ON e.matricula = c.matricula AND e.data_demissao = c.data_demissao
+        """).fetchall()
+        conn.execute("DELETE FROM demissoes_candidatas")
+        conn.commit()
+        return {(r[0], r[1]) for r in rows}
+    except Exception as e:
+        print(f"⚠️ Erro ao consultar histórico de demissões: {e}")
+        return set()
+    finally:
+        _liberar_conn(conn)
+
+
+@_operacao_cache
+def expurgar_demissoes_antigas(dias):
+    """
+    Retenção do histórico: apaga as demissões com data_demissao anterior a `dias` atrás.
+    Retorna quantas foram apagadas (0 com dias <= 0, sem limite).
+    """
+    if not dias or dias <= 0:
+        return 0
+    limite = (datetime.now() - timedelta(days=dias)).strftime('%Y%m%d')
+    conn = _get_conn()
+    try:
+        cursor = conn.execute(
+            f"DELETE FROM demissoes_enviadas WHERE {_DATA_DEMISSAO_ORDENAVEL} < ?", (limite,)
+        )
+        conn.commit()
+        return cursor.rowcount
+    except Exception as e:
+        print(f"⚠️ Erro ao aplicar retenção do histórico de demissões: {e}")
+        return 0
+    finally:
+        _liberar_conn(conn)
 
 
+@_operacao_cache
 def registrar_demissao_enviada(matricula, data_demissao, nome=''):
     """Registra uma demissão como já enviada"""
-    _init_db()
     conn = _get_conn()
     try:
         conn.execute("""
@@ -197,12 +781,87 @@ def registrar_demissao_enviada(matricula, data_demissao, nome=''):
     except Exception as e:
         print(f"⚠️ Erro ao registrar demissão: {e}")
     finally:
-        conn.close()
+        _liberar_conn(conn)
+
+
+@_operacao_cache
+def registrar_demissoes_enviadas(demissoes):
+    """
+    Registra várias demissões como já enviadas numa única transação.
+    Demissão já registrada (mesma matrícula e data) é ignorada, como em registrar_demissao_enviada.
+    
+    Args:
+        demissoes: iterável de (matricula, data_demissao, nome)
+    
+    Returns:
+        int: demissões efetivamente gravadas (novas); None se a gravação falhou
+    """
+    enviado_em = datetime.now().isoformat()
+    linhas = [(matricula, data_demissao, nome or '', enviado_em) for matricula, data_demissao, nome in demissoes]
+    if not linhas:
+        return 0
+    conn = _get_conn()
+    try:
+        antes = conn.total_changes
+        conn.executemany("""
+            INSERT OR IGNORE INTO demissoes_enviadas (matricula, data_demissao, nome, enviado_em)
+            VALUES (?, ?, ?, ?)
+        """, linhas)
+        conn.commit()
+        return conn.total_changes - antes
+    except Exception as e:
+        print(f"⚠️ Erro ao registrar {len(linhas)} demissões: {e}")
+        return None
+    finally:
+        _liberar_conn(conn)
+
+
+class RegistroDemissoes:
+    """
+    Acumula as demissões aceitas pelo SOAP e grava em lote (registrar_demissoes_enviadas)
+    a cada `por_gravacao` itens e na saída do bloco with - também quando o envio é
+    interrompido por exceção, para não reenviar no próximo ciclo o que já foi aceito.
+
+        with RegistroDemissoes() as registro:
+            registro.adicionar(matricula, data_demissao, nome)
+    """
+
+    def __init__(self, por_gravacao=DEMISSOES_POR_GRAVACAO):
+        self.por_gravacao = max(1, por_gravacao)
+        self.pendentes = []
+        self.gravadas = 0
+        self.gravacoes = 0
+
+    def adicionar(self, matricula, data_demissao, nome=''):
+        """Acumula uma demissão aceita; grava o lote ao atingir por_gravacao"""
+        self.pendentes.append((matricula, data_demissao, nome))
+        if len(self.pendentes) >= self.por_gravacao:
+            self.gravar()
 
+    def gravar(self):
+        """Grava as pendentes; se a gravação falhar elas continuam pendentes para a próxima"""
+        if not self.pendentes:
+            return
+        gravadas = registrar_demissoes_enviadas(self.pendentes)
+        if gravadas is None:
+            return
+        self.gravadas += gravadas
+        self.gravacoes += 1
+        self.pendentes = []
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traceback):
+        self.gravar()
+        if self.pendentes:
+            print(f"⚠️ {len(self.pendentes)} demissões enviadas não foram registradas no histórico")
+        return False
+
+
+@_operacao_cache
 def get_historico_demissoes():
     """Retorna lista de demissões já enviadas para relatório"""
-    _init_db()
     conn = _get_conn()
     try:
         rows = conn.execute("""
@@ -214,19 +873,90 @@ def get_historico_demissoes():
     except Exception:
         return []
     finally:
-        conn.close()
+        _liberar_conn(conn)
+
+
+# ==================== CONTROLE DE ENVIOS (HEVI) ====================
+
+@_operacao_cache
+def get_hash_envio(chave):
+    """Retorna o hash do último CSV aceito para a chave (endpoint:arquivo), ou None"""
+    conn = _get_conn()
+    try:
+        row = conn.execute(
+            "SELECT hash_conteudo FROM envios_target WHERE chave = ?", (chave,)
+        ).fetchone()
+        return row[0] if row else None
+    except Exception as e:
+        print(f"⚠️ Erro ao ler controle de envios: {e}")
+        return None
+    finally:
+        _liberar_conn(conn)
+
+
+@_operacao_cache
+def registrar_hash_envio(chave, hash_conteudo):
+    """Grava o hash do CSV aceito pela API de destino"""
+    conn = _get_conn()
+    try:
+        conn.execute("""
+            INSERT OR REPLACE INTO envios_target (chave, hash_conteudo, enviado_em)
+            VALUES (?, ?, ?)
+        """, (chave, hash_conteudo, datetime.now().isoformat()))
+        conn.commit()
+    except Exception as e:
+        print(f"⚠️ Erro ao registrar envio: {e}")
+    finally:
+        _liberar_conn(conn)
+
+
+@_operacao_cache
+def get_linhas_enviadas(chave):
+    """Retorna {chave_linha: hash_linha} do último envio aceito em modo delta"""
+    conn = _get_conn()
+    try:
+        rows = conn.execute(
+            "SELECT chave_linha, hash_linha FROM linhas_enviadas WHERE chave = ?", (chave,)
+        ).fetchall()
+        return {r[0]: r[1] for r in rows}
+    except Exception as e:
+        print(f"⚠️ Erro ao ler linhas enviadas: {e}")
+        return {}
+    finally:
+        _liberar_conn(conn)
+
+
+@_operacao_cache
+def registrar_linhas_enviadas(chave, linhas):
+    """Substitui o estado das linhas enviadas da chave pelo conjunto atual {chave_linha: hash_linha}"""
+    conn = _get_conn()
+    try:
+        conn.execute("DELETE FROM linhas_enviadas WHERE chave = ?", (chave,))
+        conn.executemany(
+            "INSERT INTO linhas_enviadas (chave, chave_linha, hash_linha) VALUES (?, ?, ?)",
+            [(chave, chave_linha, hash_linha) for chave_linha, hash_linha in linhas.items()]
+        )
+        conn.commit()
+    except Exception as e:
+        print(f"⚠️ Erro ao registrar linhas enviadas: {e}")
+    finally:
+        _liberar_conn(conn)
 
 
+@_operacao_cache
 def limpar_cache_completo():
-    """Remove cache de colaboradores (força nova consulta à API na próxima execução)"""
-    _init_db()
+    """Remove cache de colaboradores e controle de envios (força nova consulta à API e reenvio dos CSVs)"""
     conn = _get_conn()
     try:
-        conn.execute("DELETE FROM cache_colaboradores")
+        conn.execute("DELETE FROM colaboradores")
+        conn.execute("DELETE FROM cache_colaboradores_meta")
+        conn.execute("DELETE FROM sync_estado")
+        conn.execute("DELETE FROM envios_target")
+        conn.execute("DELETE FROM linhas_enviadas")
         conn.commit()
         limpar_cache_memoria()
         print("🗑️ Cache de colaboradores limpo")
     except Exception as e:
         print(f"⚠️ Erro ao limpar cache: {e}")
     finally:
-        conn.close()
+        _liberar_conn(conn)
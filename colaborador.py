@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Registro compacto do colaborador da API Humanus.
+Na ingestão (api_humanus.buscar_registros_colaboradores) cada colaborador do export
+vira um Colaborador com __slots__, com CPF, matrícula, datas e códigos normalizados
+uma única vez; cada item de situacaoPessoa vira uma tupla SituacaoColaborador.
+Os módulos de integração leem atributos em vez de navegar os dicts aninhados do JSON.
+"""
+
+from collections import namedtuple
+
+from datas import iso_para_br
+
+# Item de situacaoPessoa: código (como veio da API), início ISO e datas em DD/MM/AAAA
+SituacaoColaborador = namedtuple('SituacaoColaborador', ('codigo', 'inicio_iso', 'inicio', 'fim'))
+
+
+def formatar_cpf_11_digitos(cpf):
+    """
+    Formata CPF para garantir 11 dígitos com zeros à esquerda
+    """
+    if not cpf:
+        return ""
+
+    # Converter para string e remover caracteres não numéricos
+    cpf_str = str(cpf).replace('.', '').replace('-', '').replace('/', '').strip()
+
+    # Se não for numérico ou estiver vazio, retornar vazio
+    if not cpf_str.isdigit():
+        return ""
+
+    # Completar com zeros à esquerda para 11 dígitos
+    cpf_formatado = cpf_str.zfill(11)
+
+    # Validar se tem exatamente 11 dígitos
+    if len(cpf_formatado) == 11:
+        return cpf_formatado
+
+    return ""
+
+
+# ==================== CAMPOS pes* (RESOLVEDOR APRENDIDO) ====================
+# A Humanus envia os pes* na raiz ou dentro de um objeto filho de nome variável.
+# Nos primeiros colaboradores de cada ingestão o caminho de cada campo é aprendido pela
+# varredura completa; depois o campo é lido direto do caminho aprendido, e a varredura
+# só roda quando o caminho aprendido não tem o valor.
+
+# Colaboradores varridos por completo antes de fixar os caminhos
+AMOSTRA_APRENDIZADO = 50
+
+# Objetos comuns onde a Humanus agrupa cadastro da pessoa
+_WRAPPERS_PESSOA = (
+    'pessoa', 'Pessoa', 'pessoaCadastro', 'cadastroPessoa',
+    'dadosPessoa', 'pessoaBasica', 'PessoaBasica'
+)
+_RAIZ = '<raiz>'
+
+_caminhos_pessoa = {}    # campo -> objeto filho onde o campo vem (_RAIZ = raiz do colaborador)
+_amostra_caminhos = {}   # campo -> {caminho: ocorrências} durante o aprendizado
+_colaboradores_amostrados = 0
+_estatisticas_pessoa = {}
+
+
+def _normalizar_valor_pessoa(valor):
+    """Valor do campo como texto sem espaços nas pontas ("" se ausente)"""
+    if valor is None:
+        return ""
+    return str(valor).strip()
+
+
+def _varrer_campo_pessoa(col, nome_campo):
+    """
+    Varredura completa: raiz, wrappers conhecidos e depois qualquer dict filho direto.
+    
+    Returns:
+        tuple: (valor, caminho) - caminho None se o campo não foi encontrado
+    """
+    v = _normalizar_valor_pessoa(col.get(nome_campo))
+    if v:
+        return v, _RAIZ
+
+    for chave in _WRAPPERS_PESSOA:
+        obj = col.get(chave)
+        if isinstance(obj, dict):
+            v = _normalizar_valor_pessoa(obj.get(nome_campo))
+            if v:
+                return v, chave
+
+    # Qualquer filho dict no primeiro nível que tenha o campo (API varia o nome do wrapper)
+    for chave, valor in col.items():
+        if isinstance(valor, dict) and nome_campo in valor:
+            v = _normalizar_valor_pessoa(valor.get(nome_campo))
+            if v:
+                return v, chave
+
+    return "", None
+
+
+def _estatistica_campo(nome_campo):
+    estat = _estatisticas_pessoa.get(nome_campo)
+    if estat is None:
+        estat = _estatisticas_pessoa[nome_campo] = {
+            'caminho': None, 'acertos': 0, 'varreduras': 0, 'ausentes': 0, 'caminhos_varredura': {}
+        }
+    return estat
+
+
+def _fixar_caminhos_pessoa():
+    """Fim do aprendizado: cada campo passa a ser lido do caminho mais frequente na amostra"""
+    for nome_campo, contagem in _amostra_caminhos.items():
+        caminho = max(contagem, key=contagem.get)
+        _caminhos_pessoa[nome_campo] = caminho
+        _estatistica_campo(nome_campo)['caminho'] = caminho
+
+
+def _valor_campo_pessoa_api(col, nome_campo):
+    """
+    pesEmail, pesTelCelular e demais pes* costumam vir na raiz do colaborador
+    ou dentro de um objeto aninhado (ex.: pessoa com pesNomeExtenso, pesEmail).
+    Lê direto do caminho aprendido; se ele não tiver o valor, varre a raiz e os
+    dicts filhos diretos até encontrar o campo.
+    """
+    if not col or not nome_campo:
+        return ""
+
+    estat = _estatistica_campo(nome_campo)
+    caminho = _caminhos_pessoa.get(nome_campo)
+    if caminho is not None:
+        obj = col if caminho == _RAIZ else col.get(caminho)
+        if isinstance(obj, dict):
+            v = _normalizar_valor_pessoa(obj.get(nome_campo))
+            if v:
+                estat['acertos'] += 1
+                return v
+
+    valor, encontrado_em = _varrer_campo_pessoa(col, nome_campo)
+    if encontrado_em is None:
+        estat['ausentes'] += 1
+    elif caminho is None:
+        # Ainda aprendendo: registra onde o campo veio
+        amostra = _amostra_caminhos.setdefault(nome_campo, {})
+        amostra[encontrado_em] = amostra.get(encontrado_em, 0) + 1
+    else:
+        estat['varreduras'] += 1
+        por_caminho = estat['caminhos_varredura']
+        por_caminho[encontrado_em] = por_caminho.get(encontrado_em, 0) + 1
+    return valor
+
+
+def _registrar_colaborador_amostrado():
+    """Conta um colaborador na amostra; ao completar AMOSTRA_APRENDIZADO fixa os caminhos"""
+    global _colaboradores_amostrados
+    if _colaboradores_amostrados < AMOSTRA_APRENDIZADO:
+        _colaboradores_amostrados += 1
+        if _colaboradores_amostrados == AMOSTRA_APRENDIZADO:
+            _fixar_caminhos_pessoa()
+
+
+def reiniciar_resolvedor_pessoa():
+    """Descarta caminhos aprendidos e estatísticas (nova ingestão aprende de novo)"""
+    global _colaboradores_amostrados
+    _caminhos_pessoa.clear()
+    _amostra_caminhos.clear()
+    _estatisticas_pessoa.clear()
+    _colaboradores_amostrados = 0
+
+
+def estatisticas_resolvedor_pessoa():
+    """
+    Estatísticas da resolução dos campos pes* desde a última reinicialização:
+    por campo, o caminho aprendido, leituras diretas (acertos), varreduras após o
+    aprendizado (com o caminho onde o valor foi achado) e ausentes.
+    Varreduras frequentes indicam que a Humanus mudou onde envia o campo.
+    """
+    return {
+        'amostra': _colaboradores_amostrados,
+        'campos': {campo: dict(estat, caminhos_varredura=dict(estat['caminhos_varredura']))
+                   for campo, estat in _estatisticas_pessoa.items()},
+    }
+
+
+def resumo_resolvedor_pessoa():
+    """Linha de resumo das estatísticas (para log)"""
+    campos = _estatisticas_pessoa.values()
+    acertos = sum(e['acertos'] for e in campos)
+    varreduras = sum(e['varreduras'] for e in campos)
+    ausentes = sum(e['ausentes'] for e in campos)
+    mudou = [c for c, e in _estatisticas_pessoa.items() if e['varreduras']]
+    resumo = (f"🧭 Campos pes*: {acertos} leituras diretas, {varreduras} varreduras, "
+              f"{ausentes} ausentes (amostra de {_colaboradores_amostrados})")
+    if mudou:
+        resumo += f" - fora do caminho aprendido: {', '.join(sorted(mudou))}"
+    return resumo
+
+
+class Colaborador:
+    """
+    Colaborador do export já normalizado (ver Colaborador.de_api).
+    Textos ausentes ficam como vieram da API ("" quando a chave não existe);
+    datas de admissão/nascimento e das situações já em DD/MM/AAAA.
+    """
+
+    __slots__ = (
+        'cod_empresa', 'matricula', 'nome', 'cpf', 'pis', 'estado_civil',
+        'data_nascimento', 'nome_mae', 'nome_pai', 'email', 'celular',
+        'endereco', 'bairro', 'cidade', 'uf', 'cep', 'data_admissao', 'salario',
+        'cod_cargo', 'nome_cargo', 'cod_lotacao', 'nome_lotacao', 'situacoes',
+    )
+
+    @classmethod
+    def de_api(cls, col):
+        """Converte um colaborador do export (dict) no registro compacto"""
+        pfi = col.get('pessoaFisica') or {}
+        pff = col.get('pessoaFisFunc') or {}
+        pfu = col.get('pessoaFunc') or {}
+        lotacao = pfu.get('lotacao') or {}
+
+        c = cls.__new__(cls)
+        c.cod_empresa = col.get('codEmpresa', '')
+        c.matricula = str(col.get('nroMatrExterno', '')).zfill(6)
+        c.nome = col.get('nomeExtenso') or _valor_campo_pessoa_api(col, 'pesNomeExtenso')
+        c.cpf = formatar_cpf_11_digitos(pfi.get('pfiCpfnumeroDigito', ''))
+        c.pis = pfi.get('pfiPisnumeroDigito', '') or c.cpf
+        c.estado_civil = pfi.get('pfiEstadoCivil', '')
+        c.data_nascimento = iso_para_br(pfi.get('pfiDataNascim', ''))
+        c.nome_mae = pfi.get('pfiNomeMae', '')
+        c.nome_pai = pfi.get('pfiNomePai', '')
+
+        # pes* - raiz, pessoa aninhada ou outro dict (ver _valor_campo_pessoa_api)
+        c.email = _valor_campo_pessoa_api(col, 'pesEmail') or (pfi.get('pfiMobilityEmailHome') or '').strip()
+        c.celular = _valor_campo_pessoa_api(col, 'pesTelCelular')
+        c.endereco = _valor_campo_pessoa_api(col, 'pesEndRua')
+        c.bairro = _valor_campo_pessoa_api(col, 'pesEndBairro')
+        c.cidade = _valor_campo_pessoa_api(col, 'pesEndCidade')
+        c.uf = _valor_campo_pessoa_api(col, 'pesEndEstado')
+        c.cep = _valor_campo_pessoa_api(col, 'pesEndCep')
+        _registrar_colaborador_amostrado()
+
+        c.data_admissao = iso_para_br(pfu.get('pfuDtInicioContrato', ''))
+        c.salario = str(pff.get('pffValorSalario', ''))
+        c.cod_cargo = pff.get('pffCodCargo', '')
+        c.nome_cargo = pff.get('pffDescricaoCargo', '')
+        c.cod_lotacao = lotacao.get('lotCodlotacao', '')
+        c.nome_lotacao = lotacao.get('lotDenominacao', '')
+
+        c.situacoes = tuple(
+            SituacaoColaborador(
+                str(sit.get('sitCodSituacao', '')),
+                sit.get('sitDataInicio', ''),
+                iso_para_br(sit.get('sitDataInicio', '')),
+                iso_para_br(sit.get('sitDataFim', '')),
+            )
+            for sit in col.get('situacaoPessoa') or []
+        )
+        return c
+
+    def __repr__(self):
+        return f"Colaborador(empresa={self.cod_empresa!r}, matricula={self.matricula!r}, nome={self.nome!r})"
@@ -1,29 +1,80 @@
 import configparser
 import os
+import threading
+
+# Arquivo de configuração (relativo à pasta de execução, como nos demais módulos)
+ARQUIVO_CONFIG = '.config'
+
+# Config já lida nesta execução; só é relida quando o arquivo muda (mtime/tamanho)
+_config_cache = None
+_config_assinatura = None
+_config_lock = threading.Lock()
+
+
+def _assinatura_config():
+    """Identifica a versão do .config em disco: (caminho absoluto, mtime em ns, tamanho)"""
+    st = os.stat(ARQUIVO_CONFIG)
+    return (os.path.abspath(ARQUIVO_CONFIG), st.st_mtime_ns, st.st_size)
 
 def ler_config():
     """
-    Lê o arquivo .config e retorna um dicionário com todas as seções
+    Lê o arquivo .config e retorna um dicionário com todas as seções.
+    O parse acontece uma vez por processo e só é refeito se o arquivo mudar.
+    O dicionário retornado é compartilhado: use apenas para leitura.
     """
+    global _config_cache, _config_assinatura
     try:
-        if not os.path.exists('.config'):
+        if not os.path.exists(ARQUIVO_CONFIG):
             print("❌ Arquivo .config não encontrado")
             return None
         
-        config = configparser.ConfigParser()
-        config.read('.config', encoding='utf-8')
-        
-        # Converter para dicionário para facilitar o uso
-        config_dict = {}
-        for secao in config.sections():
-            config_dict[secao] = dict(config[secao])
+        assinatura = _assinatura_config()
+        if _config_cache is not None and assinatura == _config_assinatura:
+            return _config_cache
         
-        return config_dict
+        with _config_lock:
+            if _config_cache is not None and assinatura == _config_assinatura:
+                return _config_cache
+            
+            # Sem interpolação: tokens e senhas podem conter '%'
+            config = configparser.ConfigParser(interpolation=None)
+            config.read(ARQUIVO_CONFIG, encoding='utf-8')
+            
+            # Converter para dicionário para facilitar o uso
+            config_dict = {}
+            for secao in config.sections():
+                config_dict[secao] = dict(config[secao])
+            
+            _config_cache = config_dict
+            _config_assinatura = assinatura
+            return config_dict
         
     except Exception as e:
         print(f"❌ Erro ao ler arquivo .config: {e}")
         return None
 
+def limpar_cache_config():
+    """Força a releitura do .config na próxima chamada"""
+    global _config_cache, _config_assinatura
+    _config_cache = None
+    _config_assinatura = None
+
+def _valor_inteiro(valor, padrao):
+    """Converte valor da config para int, usando o padrão se vazio ou inválido"""
+    valor = str(valor).strip()
+    return int(valor) if valor.isdigit() else padrao
+
+def _valor_decimal(valor, padrao):
+    """Converte valor da config para float (aceita vírgula), usando o padrão se inválido"""
+    try:
+        return float(str(valor).strip().replace(',', '.'))
+    except ValueError:
+        return padrao
+
+def _valor_booleano(valor):
+    """sim/s/true/1 = True"""
+    return str(valor).strip().lower() in ('sim', 's', 'true', '1')
+
 def ler_token_config():
     """
     Lê especificamente o token da seção APISOURCE (API Humanus)
@@ -60,7 +111,11 @@ def obter_config_api_humanus():
                 'alias_name': apisource.get('alias_name', '').strip(),
                 'user_name': apisource.get('user_name', '').strip(),
                 'password': apisource.get('password', '').strip(),
+                'margem_renovacao_token': _valor_inteiro(apisource.get('margem_renovacao_token', '300'), 300),
                 'tamanho_pagina': int(apisource.get('tamanho_pagina', 50)),
+                'workers_paginas': int(apisource.get('workers_paginas', 1)),
+                'parametro_data_alteracao': apisource.get('parametro_data_alteracao', '').strip(),
+                'requisicoes_por_segundo': _valor_decimal(apisource.get('requisicoes_por_segundo', '0'), 0.0),
                 'url_situacao': apisource.get('url_situacao', 'https://humanus.crsistemas.net.br/api/MALHECIDADES/COLABORADOR/situacao/tudo').strip()
             }
         return None
@@ -99,10 +154,90 @@ def obter_campo_chave_funcionarios():
     except Exception:
         return 'cpf'
 
+def obter_config_target():
+    """
+    Obtém configurações da API de destino (APITARGET): url, integracao, token_base.
+    """
+    config = ler_config()
+    if not config or 'APITARGET' not in config:
+        print("❌ Seção [APITARGET] não encontrada no arquivo .config")
+        return None
+    
+    apitarget = config['APITARGET']
+    return {
+        'url': apitarget.get('url', '').strip(),
+        'integracao': apitarget.get('integracao', '').strip(),
+        'token_base': apitarget.get('token_base', '').strip(),
+        'pular_sem_alteracao': _valor_booleano(apitarget.get('pular_sem_alteracao', 'sim')),
+        'envio_delta': _valor_booleano(apitarget.get('envio_delta', 'nao')),
+        'salvar_csv': _valor_booleano(apitarget.get('salvar_csv', 'sim')),
+        'requisicoes_por_segundo': _valor_decimal(apitarget.get('requisicoes_por_segundo', '1'), 1.0)
+    }
+
+def obter_config_soap():
+    """
+    Obtém configurações do webservice SOAP de demissões (SOAP).
+    """
+    config = ler_config()
+    if not config or 'SOAP' not in config:
+        print("❌ Seção [SOAP] não encontrada no arquivo .config")
+        return None
+    
+    soap = config['SOAP']
+    return {
+        'url': soap.get('url', '').strip(),
+        'client_id': soap.get('client_id', '').strip(),
+        'usuario': soap.get('usuario', '').strip(),
+        'senha': soap.get('senha', '').strip(),
+        'tamanho_lote': max(1, _valor_inteiro(soap.get('tamanho_lote', '1'), 1)),
+        'requisicoes_por_segundo': _valor_decimal(soap.get('requisicoes_por_segundo', '1'), 1.0),
+        'workers': max(1, _valor_inteiro(soap.get('workers', '1'), 1))
+    }
+
+def obter_config_cache():
+    """
+    Obtém configurações do cache (CACHE): validade em minutos, modo incremental e
+    retenção do histórico de demissões enviadas (0 = sem limite).
+    """
+    config = ler_config() or {}
+    cache = config.get('CACHE', {})
+    return {
+        'validade_minutos': _valor_inteiro(cache.get('validade_minutos', '60'), 60),
+        'modo_incremental': _valor_booleano(cache.get('modo_incremental', 'nao')),
+        'refresh_completo_horas': _valor_inteiro(cache.get('refresh_completo_horas', '24'), 24),
+        'retencao_demissoes_dias': max(0, _valor_inteiro(cache.get('retencao_demissoes_dias', '0'), 0))
+    }
+
+def obter_config_http():
+    """
+    Obtém configurações do cliente HTTP compartilhado (HTTP): pool de conexões e timeout padrão.
+    """
+    config = ler_config() or {}
+    http = config.get('HTTP', {})
+    return {
+        'pool_hosts': _valor_inteiro(http.get('pool_hosts', '10'), 10),
+        'pool_conexoes': _valor_inteiro(http.get('pool_conexoes', '10'), 10),
+        'timeout': _valor_inteiro(http.get('timeout', '30'), 30)
+    }
+
+def obter_config_execucao():
+    """
+    Obtém configurações da execução do main.py (EXECUCAO): módulos em paralelo e,
+    no modo daemon (--daemon), intervalo entre ciclos e variação aleatória.
+    """
+    config = ler_config() or {}
+    execucao = config.get('EXECUCAO', {})
+    return {
+        'modulos_paralelos': max(1, _valor_inteiro(execucao.get('modulos_paralelos', '3'), 3)),
+        'intervalo_minutos': max(1, _valor_inteiro(execucao.get('intervalo_minutos', '30'), 30)),
+        'jitter_segundos': _valor_inteiro(execucao.get('jitter_segundos', '60'), 60)
+    }
+
 def obter_headers_api():
     """
     Obtém os headers necessários para chamadas à API Humanus.
-    Usa token fixo do .config ou gera token via credenciais (alias_name, user_name, password).
+    Usa token fixo do .config ou, com credenciais (alias_name, user_name, password),
+    o token gerenciado por auth_humanus (reutilizado até perto do exp do JWT).
     """
     config = obter_config_api_humanus()
     if not config:
@@ -110,18 +245,17 @@ def obter_headers_api():
     
     token = config.get('token')
     
-    # Se não tem token fixo, tenta gerar pelas credenciais
-    if not token:
-        alias = config.get('alias_name')
-        user = config.get('user_name')
-        pwd = config.get('password')
-        url_token = config.get('url_token')
-        if url_token and alias and user and pwd:
-            try:
-                from auth_humanus import gerar_token
-                token = gerar_token(url_token, alias, user, pwd, usar_cache=True)
-            except ImportError:
-                print("❌ Módulo auth_humanus não encontrado")
+    # Com credenciais, o token do .config só vale enquanto não estiver perto de expirar
+    alias = config.get('alias_name')
+    user = config.get('user_name')
+    pwd = config.get('password')
+    url_token = config.get('url_token')
+    if url_token and alias and user and pwd:
+        try:
+            from auth_humanus import obter_token_humanus
+            token = obter_token_humanus()
+        except ImportError:
+            print("❌ Módulo auth_humanus não encontrado")
     
     if not token:
         print("❌ Configure token ou credenciais (alias_name, user_name, password) em [APISOURCE]")
@@ -4,17 +4,16 @@
 import sys
 import os
 import json
-import requests
-import configparser
+from http_client import http_get
+from config_reader import ler_config
 
 # Mudar para o diretório do script
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
 def obter_headers():
     """Obtem headers da API sem prints com emojis"""
-    config = configparser.ConfigParser()
-    config.read(".config", encoding="utf-8")
-    if "APISOURCE" not in config:
+    config = ler_config()
+    if not config or "APISOURCE" not in config:
         return None
     token = config["APISOURCE"].get("token", "").strip('"')
     if not token:
@@ -38,7 +37,7 @@ def consultar_funcionarios_ativos():
     }
 
     print("Consultando funcionarios ativos na API eContador...")
-    response = requests.get(base_url, headers=headers, params=params, timeout=30)
+    response = http_get(base_url, headers=headers, params=params, timeout=30)
 
     if response.status_code != 200:
         print(f"Erro: Status {response.status_code}")
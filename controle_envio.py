@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Controle de envios para a API de destino (Hevi).
+Guarda no cache_db um hash normalizado do último CSV aceito por endpoint/arquivo e
+permite pular o POST quando o CSV gerado agora tem exatamente o mesmo conteúdo.
+No modo delta ([APITARGET] envio_delta = sim) também guarda o hash de cada linha
+enviada e monta um CSV só com as linhas novas ou alteradas.
+O CSV vem da memória (envio_hevi.obter_csv); o delta também é montado em memória e só
+vai para o disco como auditoria ([APITARGET] salvar_csv).
+"""
+
+import csv
+import hashlib
+import io
+import os
+from collections import Counter
+
+from config_reader import obter_config_target
+from envio_hevi import obter_csv, gravar_csv, salvar_csv_habilitado
+
+try:
+    from cache_db import (get_hash_envio, registrar_hash_envio,
+                          get_linhas_enviadas, registrar_linhas_enviadas)
+except ImportError:
+    get_hash_envio = lambda chave: None
+    registrar_hash_envio = lambda chave, hash_conteudo: None
+    get_linhas_enviadas = lambda chave: {}
+    registrar_linhas_enviadas = lambda chave, linhas: None
+
+# Colunas que identificam uma linha em cada endpoint (modo delta).
+# Funcionários: a coluna campo_chave diz qual coluna é a chave (cpf ou matricula).
+CHAVES_DELTA = {
+    'funcionario_cadastrar': 'campo_chave',
+    'configuracao_cargo': ('codigo_legado',),
+    'configuracao_depto': ('codigo_legado',),
+    'ponto_afastamento': ('matricula', 'dtinicio'),
+}
+
+
+def normalizar_conteudo_csv(conteudo):
+    """
+    Normaliza o CSV para comparação: remove BOM, unifica quebras de linha,
+    descarta linhas vazias e ordena as linhas de dados (cabeçalho fica primeiro).
+    Assim a mesma informação em outra ordem ou com outro encoding de fim de linha
+    gera o mesmo hash.
+    """
+    if isinstance(conteudo, bytes):
+        conteudo = conteudo.decode('utf-8-sig', errors='replace')
+    conteudo = conteudo.lstrip('\ufeff')
+    linhas = [linha.rstrip() for linha in conteudo.splitlines() if linha.strip()]
+    if not linhas:
+        return ''
+    return '\n'.join([linhas[0]] + sorted(linhas[1:]))
+
+
+def _hash_texto(texto):
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def calcular_hash_csv(conteudo):
+    """Retorna (hash sha256 do conteúdo normalizado, total de linhas de dados) do CSV em bytes"""
+    normalizado = normalizar_conteudo_csv(conteudo)
+    return _hash_texto(normalizado), normalizado.count('\n')
+
+
+def _chave_envio(endpoint, nome_arquivo_csv):
+    """Chave do controle: endpoint + nome do arquivo (afastamentos e férias usam o mesmo endpoint)"""
+    return f"{endpoint}:{os.path.basename(nome_arquivo_csv)}"
+
+
+def _chave_linha(linha, colunas):
+    """Valor da chave de uma linha do CSV (dict) conforme CHAVES_DELTA"""
+    if colunas == 'campo_chave':
+        campo = (linha.get('campo_chave') or '').strip()
+        return f"{campo}={(linha.get(campo) or '').strip()}"
+    return '|'.join((linha.get(coluna) or '').strip() for coluna in colunas)
+
+
+def _ler_linhas_csv(bruto):
+    """Lê o CSV em bytes (sep ';') e retorna (tem_bom, cabeçalho, linhas como listas)"""
+    tem_bom = bruto.startswith(b'\xef\xbb\xbf')
+    leitor = csv.reader(io.StringIO(bruto.decode('utf-8-sig')), delimiter=';')
+    registros = [r for r in leitor if r]
+    if not registros:
+        return tem_bom, [], []
+    return tem_bom, registros[0], registros[1:]
+
+
+def _montar_delta(endpoint, nome_arquivo_csv, conteudo, chave):
+    """
+    Compara cada linha do CSV com o hash gravado no último envio aceito.
+
+    Returns:
+        tuple: (nome do CSV a enviar, conteúdo a enviar, total de linhas no delta, hashes de todas as linhas)
+    """
+    tem_bom, cabecalho, registros = _ler_linhas_csv(conteudo)
+    enviadas = get_linhas_enviadas(chave)
+    colunas = CHAVES_DELTA[endpoint]
+
+    chaves_linhas = [_chave_linha(dict(zip(cabecalho, registro)), colunas) for registro in registros]
+    # Chave repetida (ex.: CPF vazio, mesma matrícula+dtinicio): as linhas se sobrescreveriam
+    # no estado; nelas a chave leva também o hash do conteúdo, para cada uma ser controlada
+    contagem = Counter(chaves_linhas)
+    repetidas = {chave_linha for chave_linha, total in contagem.items() if total > 1}
+    if repetidas:
+        print(f"⚠️ Delta {endpoint}: {sum(contagem[c] for c in repetidas)} linhas com chave "
+              f"repetida ({len(repetidas)} chaves) - controladas pelo conteúdo da linha")
+
+    hashes_linhas = {}
+    delta = []
+    for registro, chave_linha in zip(registros, chaves_linhas):
+        hash_linha = _hash_texto('\x1f'.join(registro))
+        if chave_linha in repetidas:
+            chave_linha = f"{chave_linha}#{hash_linha}"
+        hashes_linhas[chave_linha] = hash_linha
+        if enviadas.get(chave_linha) != hash_linha:
+            delta.append(registro)
+
+    if len(delta) == len(registros):
+        return nome_arquivo_csv, conteudo, len(delta), hashes_linhas  # Tudo novo: envia o CSV original
+
+    saida = io.StringIO()
+    escritor = csv.writer(saida, delimiter=';', lineterminator='\n')
+    escritor.writerow(cabecalho)
+    escritor.writerows(delta)
+    conteudo_delta = saida.getvalue().encode('utf-8-sig' if tem_bom else 'utf-8')
+
+    base, extensao = os.path.splitext(nome_arquivo_csv)
+    arquivo_delta = f"{base}_delta{extensao}"
+    if salvar_csv_habilitado():
+        gravar_csv(arquivo_delta, conteudo_delta)
+    return arquivo_delta, conteudo_delta, len(delta), hashes_linhas
+
+
+def preparar_envio(endpoint, nome_arquivo_csv, conteudo=None):
+    """
+    Decide o que enviar para a API de destino.
+
+    - CSV idêntico ao último envio aceito ([APITARGET] pular_sem_alteracao): nada a enviar
+    - Modo delta ([APITARGET] envio_delta): CSV só com linhas novas/alteradas
+    - Caso contrário: o CSV completo
+
+    Args:
+        conteudo: CSV em bytes; sem ele usa o CSV gerado em memória ou o arquivo (envio_hevi.obter_csv)
+
+    Returns:
+        dict com 'arquivo' (nome do CSV a enviar), 'conteudo' (bytes a enviar; None se o
+        CSV não existir) e o estado a gravar após o aceite, ou None quando não há nada a enviar
+    """
+    if conteudo is None:
+        conteudo = obter_csv(nome_arquivo_csv)
+    chave = _chave_envio(endpoint, nome_arquivo_csv)
+    envio = {'chave': chave, 'arquivo': nome_arquivo_csv, 'conteudo': conteudo, 'hash': None, 'linhas': None}
+    if conteudo is None:
+        return envio
+
+    try:
+        hash_conteudo, total_linhas = calcular_hash_csv(conteudo)
+    except Exception as e:
+        print(f"⚠️ Não foi possível calcular o hash de {nome_arquivo_csv}: {e}")
+        return envio
+    envio['hash'] = hash_conteudo
+
+    config_target = obter_config_target() or {}
+    if config_target.get('pular_sem_alteracao', True) and get_hash_envio(chave) == hash_conteudo:
+        print(f"⏭️ {nome_arquivo_csv} sem alterações desde o último envio aceito "
+              f"({total_linhas} linhas) - POST para {endpoint} ignorado")
+        return None
+
+    if not config_target.get('envio_delta') or endpoint not in CHAVES_DELTA:
+        return envio
+
+    try:
+        arquivo, conteudo_envio, total_delta, hashes_linhas = _montar_delta(endpoint, nome_arquivo_csv, conteudo, chave)
+    except Exception as e:
+        print(f"⚠️ Falha ao montar delta de {nome_arquivo_csv}, enviando completo: {e}")
+        return envio
+
+    envio['linhas'] = hashes_linhas
+    if total_delta == 0:
+        # Só remoções/reordenação: nada a importar, mas o estado atual passa a valer
+        print(f"⏭️ {nome_arquivo_csv}: nenhuma linha nova ou alterada - POST para {endpoint} ignorado")
+        registrar_envio_aceito(envio)
+        return None
+
+    envio['arquivo'] = arquivo
+    envio['conteudo'] = conteudo_envio
+    print(f"🔀 Envio delta: {total_delta} de {total_linhas} linhas novas/alteradas ({arquivo})")
+    return envio
+
+
+def registrar_envio_aceito(envio):
+    """Grava o hash do CSV (e das linhas, no modo delta) depois que a API de destino aceitou o envio"""
+    if not envio or not envio.get('hash'):
+        return
+    # Envio completo (sem delta) invalida o estado por linha anterior
+    registrar_linhas_enviadas(envio['chave'], envio['linhas'] or {})
+    registrar_hash_envio(envio['chave'], envio['hash'])
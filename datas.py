@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Conversão de datas ISO da API (2025-02-18T00:00:00) para DD/MM/AAAA.
+Compartilhada por api_humanus, colaborador, funcionarios, demissoes e
+relatorio_funcionarios_demitidos.
+
+Um export tem poucas datas distintas repetidas em milhares de situações, então as
+conversões ficam em cache (lru_cache limitado a TAMANHO_CACHE textos). O formato
+AAAA-MM-DD[THH:MM:SS] é lido fatiando a string; só o que foge dele passa por strptime.
+
+Benchmark: python datas.py
+"""
+
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+# Textos de data distintos mantidos em cache por função
+TAMANHO_CACHE = 4096
+
+
+def _formatar_br(data):
+    """date -> DD/MM/AAAA (igual a strftime('%d/%m/%Y'), inclusive para ano < 1000)"""
+    if data.year < 1000:
+        return data.strftime('%d/%m/%Y')  # strftime não completa o ano com zeros
+    return f"{data.day:02d}/{data.month:02d}/{data.year}"
+
+
+@lru_cache(maxsize=TAMANHO_CACHE)
+def _texto_para_data(texto):
+    """Parte AAAA-MM-DD do texto ISO como date; None se ausente ou inválida"""
+    data_str = texto.replace('Z', '').split('T')[0]
+    if len(data_str) < 10:
+        return None
+    data_str = data_str[:10]
+
+    # Caminho rápido: AAAA-MM-DD só com dígitos, sem strptime
+    ano, mes, dia = data_str[0:4], data_str[5:7], data_str[8:10]
+    if data_str[4] == '-' and data_str[7] == '-' and ano.isdigit() and mes.isdigit() and dia.isdigit():
+        try:
+            return date(int(ano), int(mes), int(dia))
+        except ValueError:
+            return None
+
+    try:
+        return datetime.strptime(data_str, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=TAMANHO_CACHE)
+def _texto_para_br(texto):
+    data = _texto_para_data(texto)
+    return _formatar_br(data) if data else ""
+
+
+def iso_para_br(data_iso):
+    """Converte data ISO (2025-02-18T00:00:00) para DD/MM/YYYY ("" se vazia ou inválida)"""
+    if not data_iso:
+        return ""
+    return _texto_para_br(str(data_iso))
+
+
+@lru_cache(maxsize=TAMANHO_CACHE)
+def _texto_para_datas_demissao(texto):
+    data = _texto_para_data(texto)
+    if data is None:
+        return None
+    try:
+        return (
+            _formatar_br(data),                       # Demissão
+            _formatar_br(data - timedelta(days=30)),  # Aviso: 30 dias antes
+            _formatar_br(data),                       # Último dia: mesmo dia da demissão
+            _formatar_br(data + timedelta(days=10)),  # Acerto: 10 dias após
+        )
+    except OverflowError:
+        return None  # Ex.: 0001-01-01 (data "vazia" da Humanus)
+
+
+def iso_para_datas_demissao(data_iso):
+    """
+    Datas do envelope de demissão a partir da data ISO da demissão.
+
+    Returns:
+        tuple: (demissao, aviso, ultimo_dia, acerto) em DD/MM/YYYY, ou None se inválida
+    """
+    if not data_iso:
+        return None
+    return _texto_para_datas_demissao(str(data_iso))
+
+
+def limpar_cache_datas():
+    """Esvazia os caches de conversão"""
+    _texto_para_data.cache_clear()
+    _texto_para_br.cache_clear()
+    _texto_para_datas_demissao.cache_clear()
+
+
+def _benchmark(total_situacoes=50000, datas_distintas=400):
+    """Compara a conversão antiga (strptime/strftime a cada chamada) com iso_para_br"""
+    import random
+    import time
+
+    def _antiga(data_iso):
+        if not data_iso:
+            return ""
+        try:
+            data_str = str(data_iso).replace('Z', '').split('T')[0]
+            if len(data_str) >= 10:
+                return datetime.strptime(data_str[:10], '%Y-%m-%d').strftime('%d/%m/%Y')
+        except Exception:
+            pass
+        return ""
+
+    inicio = date(2018, 1, 1)
+    distintas = [f"{inicio + timedelta(days=random.randrange(3000))}T00:00:00" for _ in range(datas_distintas)]
+    # Cada situação tem data de início e de fim
+    situacoes = [(random.choice(distintas), random.choice(distintas)) for _ in range(total_situacoes)]
+
+    def _medir(funcao):
+        t0 = time.perf_counter()
+        resultado = [(funcao(ini), funcao(fim)) for ini, fim in situacoes]
+        return time.perf_counter() - t0, resultado
+
+    tempo_antigo, res_antigo = _medir(_antiga)
+    limpar_cache_datas()
+    tempo_frio, res_novo = _medir(iso_para_br)
+    tempo_quente, _ = _medir(iso_para_br)
+    limpar_cache_datas()
+    texto_para_data_sem_cache = _texto_para_data.__wrapped__
+
+    def _fatiamento_sem_cache(data_iso):
+        data = texto_para_data_sem_cache(str(data_iso)) if data_iso else None
+        return _formatar_br(data) if data else ""
+
+    tempo_fatiamento, _ = _medir(_fatiamento_sem_cache)
+
+    print(f"📅 {total_situacoes} situações ({2 * total_situacoes} datas, {datas_distintas} distintas)")
+    print(f"   strptime/strftime:          {tempo_antigo * 1000:8.1f} ms")
+    print(f"   fatiamento (sem cache):     {tempo_fatiamento * 1000:8.1f} ms")
+    print(f"   iso_para_br (cache frio):   {tempo_frio * 1000:8.1f} ms  ({tempo_antigo / tempo_frio:.1f}x)")
+    print(f"   iso_para_br (cache quente): {tempo_quente * 1000:8.1f} ms  ({tempo_antigo / tempo_quente:.1f}x)")
+    print(f"   resultados idênticos: {'sim' if res_antigo == res_novo else 'NÃO'}")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -3,60 +3,45 @@ import json
 import pandas as pd
 from datetime import datetime, timedelta
 import time
-import configparser
 import xml.etree.ElementTree as ET
 import os
-from config_reader import obter_headers_api
-from api_humanus import buscar_colaboradores_paginado, formatar_data_iso_para_br
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config_reader import obter_headers_api, obter_config_soap
+from http_client import http_post, LimitadorTaxa
+from extracao_humanus import extrair_entidades
+from datas import iso_para_br, iso_para_datas_demissao
+from validacao_csv import validar_linhas_csv
 
 try:
-    from cache_db import get_demissoes_ja_enviadas, registrar_demissao_enviada
+    from cache_db import (get_demissoes_ja_enviadas_entre, expurgar_demissoes_antigas,
+                          obter_retencao_demissoes_dias, RegistroDemissoes)
 except ImportError:
-    get_demissoes_ja_enviadas = lambda: set()
-    registrar_demissao_enviada = lambda m, d, n='': None
+    get_demissoes_ja_enviadas_entre = lambda chaves: set()
+    expurgar_demissoes_antigas = lambda dias: 0
+    obter_retencao_demissoes_dias = lambda: 0
+    
+    class RegistroDemissoes:
+        """Sem cache_db: nada a registrar"""
+        gravadas = gravacoes = 0
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            return False
+        def adicionar(self, matricula, data_demissao, nome=''):
+            pass
+
+# Regras de validação do CSV de demissões (validacao_csv)
+REGRAS_VALIDACAO = {
+    'obrigatorios': ['matricula', 'DATA_DEMISSAO'],
+    'datas': ['DATA_DEMISSAO', 'data_aviso', 'data_ultimo_dia_trabalhado', 'data_acerto'],
+    'distintos': {'matricula': '👥 Funcionários únicos demitidos'},
+}
 
 def carregar_configuracoes_soap():
     """
     Função para carregar configurações SOAP do arquivo .config
     """
-    config = configparser.ConfigParser(interpolation=None)
-    config.read('.config')
-    
-    if not config.has_section('SOAP'):
-        print("❌ Seção [SOAP] não encontrada no arquivo .config")
-        return None
-    
-    return {
-        'url': config.get('SOAP', 'url'),
-        'client_id': config.get('SOAP', 'client_id'),
-        'usuario': config.get('SOAP', 'usuario'),
-        'senha': config.get('SOAP', 'senha')
-    }
-
-def _extrair_demissoes_situacao(colaboradores):
-    """
-    Extrai demissões de situacaoPessoa quando sitCodSituacao = "3"
-    """
-    demissoes_lista = []
-    for col in colaboradores:
-        situacoes = col.get('situacaoPessoa') or []
-        matricula = str(col.get('nroMatrExterno', '')).zfill(6)
-        nome = col.get('nomeExtenso', '')
-        
-        for sit in situacoes:
-            if str(sit.get('sitCodSituacao', '')) != '3':  # Apenas demissão
-                continue
-            
-            sit_data = sit.get('sitDataInicio', '')
-            demissoes_lista.append({
-                'matricula': matricula,
-                'data_demissao_iso': sit_data,
-                'data_demissao': formatar_data_iso_para_br(sit_data),
-                'obs': 'Demissao',
-                'nome': nome
-            })
-    
-    return demissoes_lista
+    return obter_config_soap()
 
 def buscar_funcionario_matricula(funcionario_id, headers):
     """
@@ -70,49 +55,28 @@ def formatar_data_brasileira(data_iso):
     """
     Converte data ISO para formato brasileiro DD/MM/AAAA
     """
-    if not data_iso:
-        return ""
-    
-    try:
-        # Remove timezone e converte
-        data_str = data_iso.replace('Z', '').split('T')[0]
-        data_obj = datetime.strptime(data_str, '%Y-%m-%d')
-        return data_obj.strftime('%d/%m/%Y')
-    except:
-        return ""
+    return iso_para_br(data_iso)
+
+def _datas_demissao_hoje():
+    """Datas estimadas a partir de hoje (sem data de demissão válida)"""
+    hoje = datetime.now()
+    data_demissao = hoje.strftime('%d/%m/%Y')
+    data_aviso = (hoje - timedelta(days=30)).strftime('%d/%m/%Y')
+    data_ultimo_dia = hoje.strftime('%d/%m/%Y')
+    data_acerto = (hoje + timedelta(days=10)).strftime('%d/%m/%Y')
+    return data_demissao, data_aviso, data_ultimo_dia, data_acerto
 
 def calcular_datas_demissao(data_demissao_iso):
     """
-    Calcula datas estimadas baseadas na data real de demissão da API
+    Calcula datas estimadas baseadas na data real de demissão da API:
+    aviso 30 dias antes, último dia no dia da demissão e acerto 10 dias após
+    (conversão em cache, ver datas.iso_para_datas_demissao)
     """
-    if not data_demissao_iso:
-        # Se não tem data, usar data atual como base
-        hoje = datetime.now()
-        data_demissao = hoje.strftime('%d/%m/%Y')
-        data_aviso = (hoje - timedelta(days=30)).strftime('%d/%m/%Y')
-        data_ultimo_dia = hoje.strftime('%d/%m/%Y')
-        data_acerto = (hoje + timedelta(days=10)).strftime('%d/%m/%Y')
-        return data_demissao, data_aviso, data_ultimo_dia, data_acerto
-    
-    try:
-        # Converter data ISO para datetime
-        data_obj = datetime.fromisoformat(data_demissao_iso.replace('Z', '+00:00'))
-        
-        # Usar a data real de demissão
-        data_demissao = data_obj.strftime('%d/%m/%Y')
-        data_aviso = (data_obj - timedelta(days=30)).strftime('%d/%m/%Y')  # 30 dias antes
-        data_ultimo_dia = data_obj.strftime('%d/%m/%Y')  # Mesmo dia da demissão
-        data_acerto = (data_obj + timedelta(days=10)).strftime('%d/%m/%Y')  # 10 dias após
-        
-        return data_demissao, data_aviso, data_ultimo_dia, data_acerto
-    except:
-        # Fallback se der erro na conversão
-        hoje = datetime.now()
-        data_demissao = hoje.strftime('%d/%m/%Y')
-        data_aviso = (hoje - timedelta(days=30)).strftime('%d/%m/%Y')
-        data_ultimo_dia = hoje.strftime('%d/%m/%Y')
-        data_acerto = (hoje + timedelta(days=10)).strftime('%d/%m/%Y')
-        return data_demissao, data_aviso, data_ultimo_dia, data_acerto
+    datas = iso_para_datas_demissao(data_demissao_iso)
+    if datas is None:
+        # Sem data ou data inválida: usar data atual como base
+        return _datas_demissao_hoje()
+    return datas
 
 def mapear_demissao_humanus_para_csv(demissao_dict):
     """
@@ -168,6 +132,18 @@ def filtrar_demissoes_recentes(funcionarios_demitidos, data_limite='2025-01-01')
 
 def construir_xml_demissao(matricula, data_demissao, soap_config):
     """Constrói o XML de demissão no formato SOAP para um único funcionário"""
+    return construir_xml_demissao_lote([(matricula, data_demissao)], soap_config)
+
+def construir_xml_demissao_lote(funcionarios, soap_config):
+    """
+    Constrói o XML de demissão com vários funcionários no mesmo urn:pack.
+    funcionarios: lista de (matricula, data_demissao)
+    """
+    blocos = "".join(f"""
+                <urn:funcionario>
+                    <urn:matricula>{matricula}</urn:matricula>
+                    <urn:dtdemissao>{data_demissao}</urn:dtdemissao>
+                </urn:funcionario>""" for matricula, data_demissao in funcionarios)
     soap_xml = f"""<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:urn="urn:ifPonto">
     <soapenv:Header/>
     <soapenv:Body>
@@ -175,11 +151,7 @@ def construir_xml_demissao(matricula, data_demissao, soap_config):
             <urn:pack>
                 <urn:clientId>{soap_config['client_id']}</urn:clientId>
                 <urn:user>{soap_config['usuario']}</urn:user>
-                <urn:pass>{soap_config['senha']}</urn:pass>
-                <urn:funcionario>
-                    <urn:matricula>{matricula}</urn:matricula>
-                    <urn:dtdemissao>{data_demissao}</urn:dtdemissao>
-                </urn:funcionario>
+                <urn:pass>{soap_config['senha']}</urn:pass>{blocos}
             </urn:pack>
         </urn:demissao>
     </soapenv:Body>
@@ -190,7 +162,7 @@ def enviar_demissao_soap(xml_data, soap_url):
     """Envia o XML para o webservice SOAP"""
     headers = {'Content-Type': 'text/xml; charset=utf-8'}
     try:
-        response = requests.post(
+        response = http_post(
             soap_url,
             data=xml_data,
             headers=headers,
@@ -216,9 +188,78 @@ def salvar_xml_demissao(xml_data, matricula, tipo="request"):
     print(f"📄 XML de demissão ({tipo}) salvo em: {filepath}")
     return filepath
 
-def analisar_resposta_soap(resposta_xml):
+def _avaliar_result_soap(result, namespaces):
+    """
+    Avalia um ns1:result do ResultArray.
+    Retorna (True/False, mensagem) ou (None, None) quando não há indicação clara.
+    """
+    # Procurar por descrição
+    descricao_elem = result.find('ns1:descricao', namespaces)
+    if descricao_elem is not None:
+        descricao = descricao_elem.text
+        
+        if descricao:
+            descricao_lower = descricao.lower()
+            
+            # Indicadores de sucesso
+            sucessos = ['sucesso', 'ok', 'processado', 'realizado', 'concluido', 'gravado', 'salvo', 'demitido']
+            if any(palavra in descricao_lower for palavra in sucessos):
+                return True, descricao
+            
+            # Indicadores de erro
+            erros = ['erro', 'falha', 'inválido', 'negado', 'não encontrado', 'já existe']
+            if any(palavra in descricao_lower for palavra in erros):
+                return False, descricao
+    
+    # Procurar por outros campos
+    for campo in ['ns1:status', 'ns1:codigo', 'ns1:retorno']:
+        elem = result.find(campo, namespaces)
+        if elem is not None:
+            valor = elem.text
+            
+            if valor and valor.lower() in ['ok', 'sucesso', '1', 'true', 'sim']:
+                return True, valor
+            elif valor and valor.lower() in ['erro', 'falha', '0', 'false', 'nao', 'não']:
+                return False, valor
+    
+    return None, None
+
+def _mapear_results_por_matricula(results, matriculas, namespaces):
     """
-    Analisa a resposta XML do SOAP para determinar se foi bem-sucedida
+    Associa cada ns1:result à matrícula enviada: pela tag ns1:matricula quando o
+    webservice a devolve, senão pela posição no envelope.
+    Retorna lista alinhada com matriculas: (sucesso, mensagem).
+    """
+    def _norm(matricula):
+        return str(matricula or '').strip().lstrip('0') or '0'
+    
+    resultados = [None] * len(matriculas)
+    for posicao, result in enumerate(results):
+        sucesso, mensagem = _avaliar_result_soap(result, namespaces)
+        if sucesso is None:
+            sucesso, mensagem = True, "Resposta processada sem erros aparentes"
+        
+        matricula_elem = result.find('ns1:matricula', namespaces)
+        if matricula_elem is not None and matricula_elem.text:
+            alvo = _norm(matricula_elem.text)
+            indice = next((i for i, m in enumerate(matriculas)
+                           if resultados[i] is None and _norm(m) == alvo), None)
+        else:
+            indice = posicao if posicao < len(matriculas) and resultados[posicao] is None else None
+        
+        if indice is not None:
+            resultados[indice] = (sucesso, mensagem)
+    
+    return [r if r is not None else (False, "Sem resultado para a matrícula no retorno SOAP")
+            for r in resultados]
+
+def analisar_resposta_soap(resposta_xml, matriculas=None):
+    """
+    Analisa a resposta XML do SOAP para determinar se foi bem-sucedida.
+    
+    Sem matriculas: retorna (sucesso, mensagem) do envelope.
+    Com matriculas (envelope em lote): retorna lista alinhada com matriculas,
+    um (sucesso, mensagem) por funcionário, a partir de cada ResultArray/result.
     """
     try:
         # Parse do XML
@@ -235,6 +276,8 @@ def analisar_resposta_soap(resposta_xml):
         if soap_fault is not None:
             fault_string = soap_fault.find('faultstring')
             fault_msg = fault_string.text if fault_string is not None else "Erro SOAP desconhecido"
+            if matriculas is not None:
+                return [(False, f"SOAP Fault: {fault_msg}")] * len(matriculas)
             return False, f"SOAP Fault: {fault_msg}"
         
         # Procurar por ResultArray e result
@@ -243,39 +286,18 @@ def analisar_resposta_soap(resposta_xml):
             results = result_array.findall('ns1:result', namespaces)
             
             if results:
+                if matriculas is not None:
+                    return _mapear_results_por_matricula(results, matriculas, namespaces)
+                
                 for result in results:
-                    # Procurar por descrição
-                    descricao_elem = result.find('ns1:descricao', namespaces)
-                    if descricao_elem is not None:
-                        descricao = descricao_elem.text
-                        
-                        if descricao:
-                            descricao_lower = descricao.lower()
-                            
-                            # Indicadores de sucesso
-                            sucessos = ['sucesso', 'ok', 'processado', 'realizado', 'concluido', 'gravado', 'salvo', 'demitido']
-                            if any(palavra in descricao_lower for palavra in sucessos):
-                                return True, descricao
-                            
-                            # Indicadores de erro
-                            erros = ['erro', 'falha', 'inválido', 'negado', 'não encontrado', 'já existe']
-                            if any(palavra in descricao_lower for palavra in erros):
-                                return False, descricao
-                    
-                    # Procurar por outros campos
-                    for campo in ['ns1:status', 'ns1:codigo', 'ns1:retorno']:
-                        elem = result.find(campo, namespaces)
-                        if elem is not None:
-                            valor = elem.text
-                            
-                            if valor and valor.lower() in ['ok', 'sucesso', '1', 'true', 'sim']:
-                                return True, valor
-                            elif valor and valor.lower() in ['erro', 'falha', '0', 'false', 'nao', 'não']:
-                                return False, valor
+                    sucesso, mensagem = _avaliar_result_soap(result, namespaces)
+                    if sucesso is not None:
+                        return sucesso, mensagem
                 
                 return True, "Resposta processada sem erros aparentes"
         
         # Procurar qualquer elemento que possa indicar resultado
+        resultado = (True, "Status indeterminado - XML válido sem SOAP Fault")
         for elem in root.iter():
             tag_name = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
             if elem.text and any(campo in tag_name.lower() for campo in ['result', 'response', 'return']):
@@ -283,17 +305,52 @@ def analisar_resposta_soap(resposta_xml):
                 if elem.text:
                     texto_lower = elem.text.lower()
                     if any(palavra in texto_lower for palavra in ['sucesso', 'ok', 'processado']):
-                        return True, elem.text
+                        resultado = (True, elem.text)
+                        break
                     elif any(palavra in texto_lower for palavra in ['erro', 'falha', 'inválido']):
-                        return False, elem.text
+                        resultado = (False, elem.text)
+                        break
         
-        return True, "Status indeterminado - XML válido sem SOAP Fault"
+        if matriculas is not None:
+            # Sem resultado por item: o status do envelope vale para o lote inteiro
+            return [resultado] * len(matriculas)
+        return resultado
             
     except ET.ParseError as e:
+        if matriculas is not None:
+            return [(False, f"Erro de parse XML: {e}")] * len(matriculas)
         return False, f"Erro de parse XML: {e}"
     except Exception as e:
+        if matriculas is not None:
+            return [(False, f"Erro na análise: {e}")] * len(matriculas)
         return False, f"Erro na análise: {e}"
 
+def _enviar_lote_soap(n_lote, lote, soap_config, limitador):
+    """
+    Monta, grava e envia um envelope (executado nas threads do dispatcher).
+    Retorna o lote com a resposta HTTP e, se status 200, o resultado por matrícula.
+    """
+    matriculas = [d.get('matricula') for d in lote]
+    identificador = matriculas[0] if soap_config['tamanho_lote'] == 1 else f"lote{n_lote:03d}"
+    
+    # Construir e salvar XML de requisição
+    xml_demissao = construir_xml_demissao_lote(
+        [(d.get('matricula'), d.get('DATA_DEMISSAO')) for d in lote], soap_config
+    )
+    salvar_xml_demissao(xml_demissao, identificador, "request")
+    
+    # Enviar via SOAP respeitando o limite de requisições por segundo
+    limitador.aguardar()
+    resposta = enviar_demissao_soap(xml_demissao, soap_config['url'])
+    
+    resultados = None
+    if resposta and resposta.status_code == 200:
+        salvar_xml_demissao(resposta.text, identificador, "response")
+        # Analisar a resposta XML (um resultado por matrícula do envelope)
+        resultados = analisar_resposta_soap(resposta.text, matriculas)
+    
+    return {'n_lote': n_lote, 'lote': lote, 'resposta': resposta, 'resultados': resultados}
+
 def enviar_demissoes_via_soap(demissoes_csv):
     """
     Envia as demissões via SOAP
@@ -312,6 +369,8 @@ def enviar_demissoes_via_soap(demissoes_csv):
     print(f"   URL: {soap_config['url']}")
     print(f"   Client ID: {soap_config['client_id']}")
     print(f"   Usuário: {soap_config['usuario']}")
+    print(f"   Funcionários por envelope: {soap_config['tamanho_lote']}")
+    print(f"   Workers: {soap_config['workers']} | Limite: {soap_config['requisicoes_por_segundo']:g} req/s")
     
     sucessos = 0
     erros = 0
@@ -319,6 +378,8 @@ def enviar_demissoes_via_soap(demissoes_csv):
     print(f"\n📤 Processando {len(demissoes_csv)} demissões via SOAP...")
     print("-" * 50)
     
+    # Separar demissões válidas (matrícula + data) antes de montar os lotes
+    validas = []
     for i, demissao in enumerate(demissoes_csv, 1):
         matricula = demissao.get('matricula')
         data_demissao = demissao.get('DATA_DEMISSAO')
@@ -327,55 +388,103 @@ def enviar_demissoes_via_soap(demissoes_csv):
             print(f"❌ Demissão {i}: Dados incompletos - Matrícula: {matricula}, Data: {data_demissao}")
             erros += 1
             continue
+        validas.append(demissao)
+    
+    tamanho_lote = soap_config['tamanho_lote']
+    lotes = [validas[i:i + tamanho_lote] for i in range(0, len(validas), tamanho_lote)]
+    
+    # Envelopes em paralelo, limitados por token bucket (sem pausas fixas)
+    limitador = LimitadorTaxa(soap_config['requisicoes_por_segundo'])
+    workers = min(soap_config['workers'], len(lotes)) or 1
+    
+    inicio = time.monotonic()
+    # O registro envolve o executor: só grava e fecha depois de todos os envelopes
+    # terminarem, para nenhuma demissão aceita pelo SOAP ficar fora do histórico
+    with RegistroDemissoes() as registro, ThreadPoolExecutor(max_workers=workers) as executor:
+        futuros = {
+            executor.submit(_enviar_lote_soap, n_lote, lote, soap_config, limitador): (n_lote, lote)
+            for n_lote, lote in enumerate(lotes, 1)
+        }
+        tratados = set()
         
-        print(f"\n📤 Processando demissão {i}/{len(demissoes_csv)}:")
-        print(f"   Matrícula: {matricula}")
-        print(f"   Data: {data_demissao}")
-        
-        # Construir XML de requisição
-        xml_demissao = construir_xml_demissao(matricula, data_demissao, soap_config)
-        
-        # Salvar XML da requisição
-        salvar_xml_demissao(xml_demissao, matricula, "request")
-        
-        # Enviar via SOAP
-        resposta = enviar_demissao_soap(xml_demissao, soap_config['url'])
-        
-        if resposta and resposta.status_code == 200:
-            print(f"✅ Requisição enviada com sucesso!")
-            print(f"📊 Status HTTP: {resposta.status_code}")
-            
-            # Salvar XML da resposta
-            salvar_xml_demissao(resposta.text, matricula, "response")
-            
-            # Analisar a resposta XML
-            sucesso, mensagem = analisar_resposta_soap(resposta.text)
-            
-            if sucesso:
-                sucessos += 1
-                registrar_demissao_enviada(matricula, data_demissao, demissao.get('nome', ''))
-                print(f"🎉 Demissão da matrícula {matricula} processada com sucesso!")
-                print(f"✅ Mensagem: {mensagem}")
-            else:
-                print(f"❌ Erro no processamento da matrícula {matricula}")
-                print(f"❌ Mensagem: {mensagem}")
-                erros += 1
+        try:
+            # Resultados tratados (e registrados no cache_db) na thread principal
+            for futuro in as_completed(futuros):
+                n_lote, lote = futuros[futuro]
+                matriculas = [d.get('matricula') for d in lote]
                 
-        else:
-            print(f"❌ Erro ao enviar demissão {i}")
-            if resposta:
-                print(f"Status HTTP: {resposta.status_code}")
-                print(f"Resposta: {resposta.text[:200]}...")
-            erros += 1
-        
-        print("-" * 30)
-        time.sleep(1)  # Pausa entre requisições
+                if tamanho_lote == 1:
+                    print(f"\n📤 Demissão {n_lote}/{len(lotes)}:")
+                    print(f"   Matrícula: {matriculas[0]}")
+                    print(f"   Data: {lote[0].get('DATA_DEMISSAO')}")
+                else:
+                    print(f"\n📤 Lote {n_lote}/{len(lotes)} ({len(lote)} demissões):")
+                    print(f"   Matrículas: {', '.join(str(m) for m in matriculas)}")
+                
+                try:
+                    envio = futuro.result()
+                except Exception as e:
+                    # Falha de um envelope não interrompe o tratamento dos demais
+                    print(f"❌ Erro ao enviar {'demissão' if tamanho_lote == 1 else 'lote'} {n_lote}: {e}")
+                    erros += len(lote)
+                    print("-" * 30)
+                    continue
+                resposta, resultados = envio['resposta'], envio['resultados']
+                
+                if resultados is not None:
+                    print(f"✅ Requisição enviada com sucesso!")
+                    print(f"📊 Status HTTP: {resposta.status_code}")
+                    
+                    for demissao, (sucesso, mensagem) in zip(lote, resultados):
+                        matricula = demissao.get('matricula')
+                        if sucesso:
+                            sucessos += 1
+                            registro.adicionar(matricula, demissao.get('DATA_DEMISSAO'), demissao.get('nome', ''))
+                            print(f"🎉 Demissão da matrícula {matricula} processada com sucesso!")
+                            print(f"✅ Mensagem: {mensagem}")
+                        else:
+                            print(f"❌ Erro no processamento da matrícula {matricula}")
+                            print(f"❌ Mensagem: {mensagem}")
+                            erros += 1
+                        
+                else:
+                    print(f"❌ Erro ao enviar {'demissão' if tamanho_lote == 1 else 'lote'} {n_lote}")
+                    if resposta:
+                        print(f"Status HTTP: {resposta.status_code}")
+                        print(f"Resposta: {resposta.text[:200]}...")
+                    erros += len(lote)
+                
+                print("-" * 30)
+                tratados.add(futuro)
+        finally:
+            # Interrompido no meio: cancela os envelopes que ainda não saíram e registra
+            # as aceitas dos que já foram enviados, inclusive o que estava sendo tratado
+            # (senão seriam reenviadas no próximo ciclo; registrar de novo é ignorado)
+            for futuro in futuros:
+                futuro.cancel()
+            for futuro, (n_lote, lote) in futuros.items():
+                if futuro in tratados or futuro.cancelled():
+                    continue
+                try:
+                    resultados = futuro.result()['resultados']
+                except Exception:
+                    continue
+                for demissao, (sucesso, _) in zip(lote, resultados or []):
+                    if sucesso:
+                        registro.adicionar(demissao.get('matricula'), demissao.get('DATA_DEMISSAO'),
+                                           demissao.get('nome', ''))
+    
+    duracao = time.monotonic() - inicio
     
     # Resumo final
     print(f"\n📊 RESUMO DO ENVIO SOAP:")
     print(f"✅ Sucessos: {sucessos}")
     print(f"❌ Erros: {erros}")
     print(f"📊 Total processadas: {len(demissoes_csv)}")
+    print(f"📝 Histórico: {registro.gravadas} demissão(ões) registrada(s) em {registro.gravacoes} gravação(ões)")
+    if lotes and duracao > 0:
+        print(f"⏱️ Tempo de envio: {duracao:.2f}s "
+              f"({len(lotes) / duracao:.2f} envelope(s)/s, {len(validas) / duracao:.2f} demissão(ões)/s)")
     
     return sucessos > 0
 
@@ -395,23 +504,33 @@ def gerar_csv_demissoes():
         print("❌ Falha ao carregar token (configure token ou credenciais em [APISOURCE])")
         return None
     
-    colaboradores = buscar_colaboradores_paginado()
-    demissoes_raw = _extrair_demissoes_situacao(colaboradores)
+    demissoes_raw = extrair_entidades()['demissoes']
     
     if not demissoes_raw:
         print("❌ Nenhuma demissão encontrada (sitCodSituacao=3)")
         return None
     
-    # Filtrar demissões já enviadas (histórico)
-    ja_enviadas = get_demissoes_ja_enviadas()
-    demissoes_novas = []
-    for d in demissoes_raw:
-        chave = (d.get('matricula', ''), d.get('data_demissao', ''))
-        if chave not in ja_enviadas:
-            demissoes_novas.append(d)
+    # Retenção: demissões anteriores à janela saem do histórico e não são reenviadas
+    retencao_dias = obter_retencao_demissoes_dias()
+    if retencao_dias > 0:
+        expurgadas = expurgar_demissoes_antigas(retencao_dias)
+        if expurgadas:
+            print(f"🗑️ Histórico de demissões: {expurgadas} registro(s) com mais de {retencao_dias} dias removido(s)")
+        limite_iso = (datetime.now() - timedelta(days=retencao_dias)).strftime('%Y-%m-%d')
+        dentro_janela = [d for d in demissoes_raw
+                         if not d.get('data_demissao_iso') or d['data_demissao_iso'][:10] >= limite_iso]
+        if len(dentro_janela) < len(demissoes_raw):
+            print(f"📋 Demissões anteriores à retenção ({retencao_dias} dias) ignoradas: "
+                  f"{len(demissoes_raw) - len(dentro_janela)}")
+        demissoes_raw = dentro_janela
+    
+    # Filtrar demissões já enviadas (histórico), consultando só as chaves desta execução
+    chaves = [(d.get('matricula', ''), d.get('data_demissao', '')) for d in demissoes_raw]
+    ja_enviadas = get_demissoes_ja_enviadas_entre(chaves)
+    demissoes_novas = [d for d, chave in zip(demissoes_raw, chaves) if chave not in ja_enviadas]
     
     if ja_enviadas:
-        print(f"📋 Demissões já enviadas (histórico): {len(ja_enviadas)}")
+        print(f"📋 Demissões já enviadas (histórico): {len(demissoes_raw) - len(demissoes_novas)}")
     print(f"📋 Demissões novas a processar: {len(demissoes_novas)}")
     
     if not demissoes_novas:
@@ -469,6 +588,9 @@ def gerar_csv_demissoes():
         print(f"\n👁️  PREVIEW DOS DADOS (primeiras 3 linhas):")
         print(df.head(3).to_string())
         
+        # Validar as linhas geradas (em memória, sem reler o arquivo)
+        validar_dados_demissoes_csv(df, nome_arquivo)
+        
         # Salvar relatório de erros se houver
         if erros:
             arquivo_erros = "erros_demissoes.json"
@@ -482,51 +604,11 @@ def gerar_csv_demissoes():
         print(f"❌ Erro ao gerar CSV: {e}")
         return None
 
-def validar_dados_demissoes_csv(nome_arquivo):
+def validar_dados_demissoes_csv(dados, nome_arquivo=None):
     """
-    Valida os dados do CSV de demissões gerado
+    Valida os dados do CSV de demissões gerado (regras em REGRAS_VALIDACAO, ver validacao_csv)
     """
-    if not nome_arquivo:
-        return
-    
-    try:
-        print(f"\n🔍 VALIDANDO DADOS DO CSV: {nome_arquivo}")
-        
-        # Ler o CSV gerado
-        df = pd.read_csv(nome_arquivo, sep=';', encoding='utf-8-sig')
-        
-        print(f"  📊 Total de registros: {len(df)}")
-        print(f"  📋 Total de colunas: {len(df.columns)}")
-        
-        # Verificar campos obrigatórios
-        campos_obrigatorios = ['matricula', 'DATA_DEMISSAO']
-        
-        for campo in campos_obrigatorios:
-            if campo in df.columns:
-                vazios = df[campo].isna().sum() + (df[campo] == '').sum()
-                if vazios > 0:
-                    print(f"  ⚠️  Campo '{campo}': {vazios} registros vazios")
-                else:
-                    print(f"  ✅ Campo '{campo}': todos preenchidos")
-            else:
-                print(f"  ❌ Campo obrigatório '{campo}' não encontrado")
-        
-        # Verificar consistência de datas
-        campos_data = ['DATA_DEMISSAO', 'data_aviso', 'data_ultimo_dia_trabalhado', 'data_acerto']
-        for campo in campos_data:
-            if campo in df.columns:
-                registros_com_data = (df[campo] != '').sum()
-                print(f"  📅 {campo}: {registros_com_data} registros com data")
-        
-        # Verificar funcionários únicos
-        if 'matricula' in df.columns:
-            funcionarios_unicos = df['matricula'].nunique()
-            print(f"  👥 Funcionários únicos demitidos: {funcionarios_unicos}")
-        
-        print(f"  ✅ Validação concluída")
-        
-    except Exception as e:
-        print(f"  ❌ Erro na validação: {e}")
+    return validar_linhas_csv(dados, REGRAS_VALIDACAO, nome_arquivo)
 
 def processar_integracao_completa():
     """
@@ -549,12 +631,8 @@ def processar_integracao_completa():
         print("✅ Todas as demissões já foram processadas anteriormente - nada a fazer.")
         return True
     
-    # Etapa 2: Validar dados do CSV
-    print("\n🔍 ETAPA 2: Validando dados...")
-    validar_dados_demissoes_csv("demissoes_api.csv")
-    
-    # Etapa 3: Enviar via SOAP
-    print("\n📤 ETAPA 3: Enviando demissões via SOAP...")
+    # Etapa 2: Enviar via SOAP (dados já validados em memória na geração)
+    print("\n📤 ETAPA 2: Enviando demissões via SOAP...")
     sucesso_soap = enviar_demissoes_via_soap(demissoes_csv)
     
     if sucesso_soap:
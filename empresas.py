@@ -3,74 +3,34 @@ import json
 import pandas as pd
 from datetime import datetime
 import time
-import hashlib
-import pytz
-import configparser
 from config_reader import obter_headers_api
+from http_client import http_get
+from auth_hevi import obter_token_target, data_atual_sao_paulo
+from envio_hevi import post_csv, registrar_csv_gerado, csv_do_dataframe
+from controle_envio import preparar_envio, registrar_envio_aceito
+from validacao_csv import validar_linhas_csv
 
-def carregar_configuracoes_target():
-    """
-    Carrega configurações da seção [APITARGET] do arquivo .config
-    """
-    try:
-        config = configparser.ConfigParser()
-        config.read('.config', encoding='utf-8')
-        
-        if 'APITARGET' not in config:
-            print("❌ Seção [APITARGET] não encontrada no arquivo .config")
-            return None
-        
-        return {
-            'url': config['APITARGET'].get('url', '').strip(),
-            'integracao': config['APITARGET'].get('integracao', '').strip(),
-            'token_base': config['APITARGET'].get('token_base', '').strip()
-        }
-    except Exception as e:
-        print(f"❌ Erro ao carregar configurações [APITARGET]: {e}")
-        return None
-
-def gerar_token_target():
-    """
-    Gera o token para a API de destino usando a data atual
-    """
-    config_target = carregar_configuracoes_target()
-    if not config_target:
-        return None, None
-    
-    # ==========================================
-    # IMPLEMENTAR EXATAMENTE COMO FUNCIONOU NO DEBUG_TOKEN.PY
-    # ==========================================
-    
-    # Configurar timezone para São Paulo
-    tz_sao_paulo = pytz.timezone('America/Sao_Paulo')
-    data_atual = datetime.now(tz_sao_paulo).strftime('%d/%m/%Y')
-    
-    # Gerar token final
-    token_concatenado = config_target['token_base'] + data_atual
-    token_final = hashlib.sha256(token_concatenado.encode('utf-8')).hexdigest()
-    
-    print(f"\n🔑 GERAÇÃO DO TOKEN (PADRÃO QUE FUNCIONOU):")
-    print(f"Data atual: {data_atual}")
-    print(f"Token concatenado: {token_concatenado}")
-    print(f"Token final: {token_final}")
-    print("=" * 50)
-    
-    return config_target, token_final
+# Regras de validação do CSV de empresas (validacao_csv)
+REGRAS_VALIDACAO = {
+    'obrigatorios': ['codigo_legado', 'nro', 'nome'],
+    'unicos': ['cnpj', 'codigo_legado'],
+}
 
 def enviar_csv_para_api_target(nome_arquivo_csv):
     """
     Envia o CSV de empresas para a API de destino via POST
     """
-    import os
-    
-    if not os.path.exists(nome_arquivo_csv):
+    envio = preparar_envio("configuracao_empresa", nome_arquivo_csv)
+    if envio is None:
+        return True
+    if envio['conteudo'] is None:
         print(f"❌ Arquivo {nome_arquivo_csv} não encontrado!")
         return False
     
-    print(f"✅ Arquivo {nome_arquivo_csv} encontrado")
+    print(f"✅ CSV {nome_arquivo_csv} pronto para envio ({len(envio['conteudo'])} bytes)")
     
     # Obter configurações e token
-    config_target, token_final = gerar_token_target()
+    config_target, token_final = obter_token_target()
     if not config_target or not token_final:
         print("❌ Falha ao gerar token para API de destino")
         return False
@@ -97,18 +57,7 @@ def enviar_csv_para_api_target(nome_arquivo_csv):
         print(f"📄 Endpoint: configuracao_empresa")
         print(f"🔑 Token: {token_final[:32]}...")  # Mostra parte do token
         
-        with open(nome_arquivo_csv, 'rb') as arquivo:
-            files = {
-                'arquivo': (nome_arquivo_csv, arquivo, 'text/csv')
-            }
-            
-            response = requests.post(
-                config_target['url'], 
-                data=data, 
-                files=files,
-                headers=headers,
-                timeout=30
-            )
+        response = post_csv(config_target['url'], data, nome_arquivo_csv, envio['conteudo'], headers, timeout=30)
         
         print(f"📊 Status da resposta: {response.status_code}")
         
@@ -125,7 +74,7 @@ def enviar_csv_para_api_target(nome_arquivo_csv):
                     if 'login' in str(resultado.get('info', '')).lower():
                         print(f"\n💡 SUGESTÕES PARA CORRIGIR ERRO DE LOGIN:")
                         print(f"1. ❌ Verificar se token_base está correto: '{config_target['token_base']}'")
-                        print(f"2. ❌ Verificar formato da data (atual: {datetime.now(pytz.timezone('America/Sao_Paulo')).strftime('%d/%m/%Y')})")
+                        print(f"2. ❌ Verificar formato da data (atual: {data_atual_sao_paulo()})")
                         print(f"3. ❌ Confirmar usuário correto (usando: '{usuario_correto}')")
                         print(f"4. ❌ Execute debug_token.py para mais detalhes")
                     
@@ -139,6 +88,7 @@ def enviar_csv_para_api_target(nome_arquivo_csv):
                     if cadastrados > 0:
                         print(f"🎉 {cadastrados} empresa(s) cadastrada(s) com sucesso!")
                     
+                    registrar_envio_aceito(envio)
                     return True
                 
             except json.JSONDecodeError:
@@ -185,9 +135,9 @@ def consultar_todas_empresas():
             print(f"  📄 Coletando página {pagina}... ", end="")
             
             if pagina == 1:
-                response = requests.get(url_atual, headers=headers, params=params)
+                response = http_get(url_atual, headers=headers, params=params)
             else:
-                response = requests.get(url_atual, headers=headers)
+                response = http_get(url_atual, headers=headers)
             
             if response.status_code == 200:
                 data = response.json()
@@ -219,7 +169,7 @@ def consultar_empresa_detalhada(empresa_id, headers):
     """
     try:
         url_empresa = f"https://dp.pack.alterdata.com.br/api/v1/empresas/{empresa_id}"
-        response = requests.get(url_empresa, headers=headers)
+        response = http_get(url_empresa, headers=headers)
         
         if response.status_code == 200:
             empresa_data = response.json()
@@ -322,7 +272,7 @@ def gerar_csv_empresas():
     nome_arquivo = "empresas_api.csv"
     
     try:
-        df.to_csv(nome_arquivo, index=False, encoding='utf-8-sig', sep=';')
+        registrar_csv_gerado(nome_arquivo, csv_do_dataframe(df))
         print(f"✅ CSV gerado com sucesso: {nome_arquivo}")
         
         # Estatísticas
@@ -351,6 +301,8 @@ def gerar_csv_empresas():
             status = "✅" if percentual > 0 else "⭕"
             print(f"  {status} {coluna:<20}: {valores_nao_vazios:3d}/{len(df)} ({percentual:5.1f}%)")
         
+        validar_dados_empresas_csv(df, nome_arquivo)
+        
         return nome_arquivo
         
     except Exception as e:
@@ -373,12 +325,8 @@ def processar_integracao_completa():
         print("❌ Falha na geração do CSV. Processo interrompido.")
         return False
     
-    # Etapa 2: Validar dados
-    print("\n🔍 ETAPA 2: Validando dados do CSV...")
-    validar_dados_empresas_csv(arquivo_csv)
-    
-    # Etapa 3: Enviar para API de destino
-    print("\n📤 ETAPA 3: Enviando CSV para API de destino...")
+    # Etapa 2: Enviar para API de destino
+    print("\n📤 ETAPA 2: Enviando CSV para API de destino...")
     sucesso_envio = enviar_csv_para_api_target(arquivo_csv)
     
     if sucesso_envio:
@@ -393,56 +341,11 @@ def processar_integracao_completa():
         print(f"❌ Falha no envio para sistema de destino")
         return False
 
-def validar_dados_empresas_csv(nome_arquivo):
+def validar_dados_empresas_csv(dados, nome_arquivo=None):
     """
-    Valida os dados do CSV de empresas gerado
+    Valida os dados do CSV de empresas gerado (regras em REGRAS_VALIDACAO, ver validacao_csv)
     """
-    if not nome_arquivo:
-        return
-    
-    try:
-        print(f"\n🔍 VALIDANDO DADOS DO CSV: {nome_arquivo}")
-        
-        # Ler o CSV gerado
-        df = pd.read_csv(nome_arquivo, sep=';', encoding='utf-8-sig')
-        
-        print(f"  📊 Total de registros: {len(df)}")
-        print(f"  📋 Total de colunas: {len(df.columns)}")
-        
-        # Verificar campos obrigatórios
-        campos_obrigatorios = ['codigo_legado', 'nro', 'nome']
-        
-        for campo in campos_obrigatorios:
-            if campo in df.columns:
-                vazios = df[campo].isna().sum() + (df[campo] == '').sum()
-                if vazios > 0:
-                    print(f"  ⚠️  Campo '{campo}': {vazios} registros vazios")
-                else:
-                    print(f"  ✅ Campo '{campo}': todos preenchidos")
-            else:
-                print(f"  ❌ Campo obrigatório '{campo}' não encontrado")
-        
-        # Verificar duplicatas por CNPJ
-        if 'cnpj' in df.columns:
-            cnpjs_validos = df[df['cnpj'] != '']['cnpj']
-            cnpjs_duplicados = cnpjs_validos.duplicated().sum()
-            if cnpjs_duplicados > 0:
-                print(f"  ⚠️  CNPJs duplicados encontrados: {cnpjs_duplicados}")
-            else:
-                print(f"  ✅ Nenhum CNPJ duplicado encontrado")
-        
-        # Verificar duplicatas por código legado
-        if 'codigo_legado' in df.columns:
-            codigos_duplicados = df['codigo_legado'].duplicated().sum()
-            if codigos_duplicados > 0:
-                print(f"  ⚠️  Códigos legados duplicados: {codigos_duplicados}")
-            else:
-                print(f"  ✅ Nenhum código legado duplicado")
-        
-        print(f"  ✅ Validação concluída")
-        
-    except Exception as e:
-        print(f"  ❌ Erro na validação: {e}")
+    return validar_linhas_csv(dados, REGRAS_VALIDACAO, nome_arquivo)
 
 def explorar_estrutura_empresas():
     """
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+CSVs gerados para a API de destino (Hevi) mantidos em memória.
+Cada módulo registra o CSV que acabou de gerar (registrar_csv_gerado) e o envio pega o
+conteúdo daqui, sem reabrir o arquivo. O arquivo em disco passa a ser só auditoria
+([APITARGET] salvar_csv); sem o CSV em memória (ex.: comando "enviar" com um arquivo
+existente), o envio lê o arquivo do disco como antes.
+"""
+
+import os
+import threading
+
+from config_reader import obter_config_target
+from http_client import http_post
+
+_csvs_gerados = {}  # nome do arquivo -> bytes do último CSV gerado
+_csvs_lock = threading.Lock()
+
+
+def salvar_csv_habilitado():
+    """[APITARGET] salvar_csv: grava os CSVs enviados em disco para auditoria"""
+    return (obter_config_target() or {}).get('salvar_csv', True)
+
+
+def csv_do_dataframe(df):
+    """CSV do DataFrame (sep ';', UTF-8 com BOM) em bytes - o mesmo conteúdo de df.to_csv(arquivo)"""
+    return df.to_csv(index=False, sep=';').encode('utf-8-sig')
+
+
+def gravar_csv(nome_arquivo, conteudo):
+    """Grava o CSV em disco (bytes)"""
+    with open(nome_arquivo, 'wb') as f:
+        f.write(conteudo)
+
+
+def registrar_csv_gerado(nome_arquivo, conteudo):
+    """
+    Guarda o CSV gerado em memória para o envio e, com [APITARGET] salvar_csv, grava
+    a cópia de auditoria em disco.
+
+    Args:
+        nome_arquivo: nome do CSV (também usado no multipart e no controle de envio)
+        conteudo: bytes ou str (str é gravado em UTF-8)
+    """
+    if isinstance(conteudo, str):
+        conteudo = conteudo.encode('utf-8')
+    with _csvs_lock:
+        _csvs_gerados[nome_arquivo] = conteudo
+    if salvar_csv_habilitado():
+        gravar_csv(nome_arquivo, conteudo)
+    return conteudo
+
+
+def obter_csv(nome_arquivo):
+    """Conteúdo do CSV: o gerado em memória ou, sem ele, o arquivo em disco; None se não houver"""
+    with _csvs_lock:
+        conteudo = _csvs_gerados.get(nome_arquivo)
+    if conteudo is not None:
+        return conteudo
+    if os.path.exists(nome_arquivo):
+        with open(nome_arquivo, 'rb') as f:
+            return f.read()
+    return None
+
+
+def tamanho_csv_em_memoria(nome_arquivo):
+    """Tamanho em bytes do CSV gerado em memória; None se não houver"""
+    with _csvs_lock:
+        conteudo = _csvs_gerados.get(nome_arquivo)
+    return None if conteudo is None else len(conteudo)
+
+
+def post_csv(url, campos, nome_arquivo, conteudo, headers, timeout=30):
+    """
+    POST multipart do CSV para a API de destino (campo 'arquivo').
+
+    Args:
+        campos: campos do formulário (pag, cmd, separador)
+        conteudo: bytes/str (buffer em memória) ou objeto arquivo
+    """
+    files = {'arquivo': (nome_arquivo, conteudo, 'text/csv')}
+    return http_post(url, data=campos, files=files, headers=headers, timeout=timeout)
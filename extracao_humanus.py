@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Extração única das entidades da API Humanus.
+Percorre os colaboradores (registros colaborador.Colaborador, com as situações) uma única vez e monta, de uma vez,
+os dados de cargos, departamentos, funcionários ativos, afastamentos, férias e demissões.
+O resultado fica memorizado enquanto o snapshot de colaboradores em cache não mudar
+nem vencer ([CACHE] validade_minutos), então os seis módulos da integração
+compartilham a mesma passada.
+"""
+
+import threading
+from datetime import datetime
+
+from api_humanus import buscar_registros_colaboradores, buscar_situacoes
+
+# Resultado da última extração, versão do snapshot que a originou e quando foi feita
+_entidades = None
+_versao_snapshot = None
+_extraido_em = None
+_extracao_lock = threading.Lock()
+
+
+def _versao_cache_colaboradores():
+    """Versão do snapshot em memória (cache_db); None se não houver cache"""
+    try:
+        from cache_db import get_versao_cache_memoria
+        return get_versao_cache_memoria()
+    except ImportError:
+        return None
+
+
+def _extracao_expirada():
+    """True se a extração memorizada passou de [CACHE] validade_minutos, como o cache de onde veio"""
+    try:
+        from cache_db import cache_expirado
+        return cache_expirado(_extraido_em)
+    except ImportError:
+        return True
+
+
+def _cache_colaboradores_valido():
+    """
+    True se o snapshot em memória ainda está na validade do cache. No modo daemon o
+    snapshot atravessa ciclos: vencido, a próxima busca vai ao disco ou à API.
+    """
+    try:
+        from cache_db import cache_memoria_valido
+        return cache_memoria_valido()
+    except ImportError:
+        return False
+
+
+def _extrair(colaboradores):
+    """
+    Passada única sobre os colaboradores (registros colaborador.Colaborador).
+
+    Returns:
+        dict: cargos, departamentos, funcionarios_ativos, afastamentos, ferias, demissoes
+    """
+    cargos = {}
+    departamentos = {}
+    funcionarios_ativos = []
+    afastamentos = []
+    ferias = []
+    demissoes = []
+    mapa_situacoes = None  # Só consulta /situacao/tudo se houver afastamento
+
+    for col in colaboradores:
+        # Cargo: codigo_legado = pffCodCargo, nome = pffDescricaoCargo
+        codigo = col.cod_cargo
+        if codigo and codigo not in cargos:
+            cargos[codigo] = {'codigo': codigo, 'nome': col.nome_cargo or codigo}
+
+        # Departamento: codigo_legado = lotCodlotacao, nome = lotDenominacao
+        codigo = col.cod_lotacao
+        if codigo and codigo not in departamentos:
+            departamentos[codigo] = {
+                'codigo': codigo,
+                'nome': col.nome_lotacao or codigo,
+                'empresa_id': '1'  # id-empresa = "1" conforme especificação
+            }
+
+        # Situações: férias (2), demissão (3) e demais afastamentos (exceto 1, 2, 3)
+        matricula = col.matricula
+        demitido = False
+        for sit in col.situacoes:
+            cod = sit.codigo
+
+            if cod == '3':
+                demitido = True
+                demissoes.append({
+                    'matricula': matricula,
+                    'data_demissao_iso': sit.inicio_iso,
+                    'data_demissao': sit.inicio,
+                    'obs': 'Demissao',
+                    'nome': col.nome or ''
+                })
+                continue
+
+            if cod == '2':
+                ferias.append({
+                    'id-afastamento': '2',
+                    'dtinicio': sit.inicio,
+                    'dtfim': sit.fim,
+                    'obs': 'Ferias',
+                    'campo_chave': 'matricula',
+                    'matricula': matricula
+                })
+                continue
+
+            cod = cod.strip()
+            cod_normalizado = cod.lstrip('0') or '0'  # "01"->"1", "02"->"2", "03"->"3"
+            if cod_normalizado in ('1', '2', '3'):
+                continue  # Ativo, férias e demissão têm arquivos exclusivos
+
+            if mapa_situacoes is None:
+                mapa_situacoes = buscar_situacoes()
+            afastamentos.append({
+                'id-afastamento': cod,
+                'dtinicio': sit.inicio,
+                'dtfim': sit.fim,
+                'obs': mapa_situacoes.get(cod, f'Afastamento {cod}'),
+                'campo_chave': 'matricula',
+                'matricula': matricula
+            })
+
+        if not demitido:
+            funcionarios_ativos.append(col)
+
+    return {
+        'cargos': cargos,
+        'departamentos': departamentos,
+        'funcionarios_ativos': funcionarios_ativos,
+        'afastamentos': afastamentos,
+        'ferias': ferias,
+        'demissoes': demissoes,
+    }
+
+
+def extrair_entidades(force_api=False):
+    """
+    Retorna as seis entidades extraídas dos colaboradores da API Humanus.
+    Reaproveita a última extração enquanto o snapshot em cache for o mesmo e estiver na validade.
+
+    Args:
+        force_api: ignora cache e memória, buscando o export completo da API
+    """
+    with _extracao_lock:
+        return _extrair_entidades(force_api)
+
+
+def _extrair_entidades(force_api):
+    """Corpo de extrair_entidades (executado sob _extracao_lock: módulos em paralelo esperam a mesma passada)"""
+    global _entidades, _versao_snapshot, _extraido_em
+
+    if not force_api and _entidades is not None:
+        versao = _versao_cache_colaboradores()
+        if (versao is not None and versao == _versao_snapshot and not _extracao_expirada()
+                and _cache_colaboradores_valido()):
+            return _entidades
+
+    colaboradores = buscar_registros_colaboradores(force_api=force_api)
+    entidades = _extrair(colaboradores)
+    print(f"🧩 Extração única: {len(colaboradores)} colaboradores -> "
+          f"{len(entidades['cargos'])} cargos, {len(entidades['departamentos'])} departamentos, "
+          f"{len(entidades['funcionarios_ativos'])} ativos, {len(entidades['afastamentos'])} afastamentos, "
+          f"{len(entidades['ferias'])} férias, {len(entidades['demissoes'])} demissões")
+
+    _entidades = entidades
+    _versao_snapshot = _versao_cache_colaboradores()
+    _extraido_em = datetime.now()
+    return entidades
+
+
+def limpar_extracao():
+    """Descarta a extração memorizada (a próxima chamada refaz a passada)"""
+    global _entidades, _versao_snapshot, _extraido_em
+    _entidades = None
+    _versao_snapshot = None
+    _extraido_em = None
@@ -1,67 +1,34 @@
 import requests
 import json
-import pandas as pd
 from datetime import datetime, timedelta
 import time
-import hashlib
 import base64
 import os
-import pytz
-import configparser
 import csv
 import io
 from config_reader import obter_headers_api
-from api_humanus import buscar_colaboradores_paginado, formatar_data_iso_para_br
+from http_client import http_get
+from auth_hevi import obter_token_target
+from envio_hevi import post_csv, registrar_csv_gerado
+from controle_envio import preparar_envio, registrar_envio_aceito
+from extracao_humanus import extrair_entidades
+from validacao_csv import validar_linhas_csv
 
-def carregar_configuracoes():
-    """
-    Função para carregar configurações do arquivo .config
-    (Adaptada do integracao_folha_ponto.py)
-    """
-    config = configparser.ConfigParser(interpolation=None)
-    config.read('.config')
-    
-    # Verificar se existe seção APITARGET
-    if not config.has_section('APITARGET'):
-        print("❌ Seção [APITARGET] não encontrada no arquivo .config")
-        return None
-    
-    return {
-        'apitarget': {
-            'url': config.get('APITARGET', 'url'),
-            'integracao': config.get('APITARGET', 'integracao'),
-            'token_base': config.get('APITARGET', 'token_base')
-        }
-    }
+# Regras de validação do CSV de férias (validacao_csv)
+REGRAS_VALIDACAO = {
+    'obrigatorios': ['matricula', 'obs', 'dtinicio', 'dtfim', 'id-afastamento'],
+    'datas': ['dtinicio', 'dtfim'],
+    'valores': {'id-afastamento': '📋 Códigos de afastamento encontrados'},
+}
 
 def gerar_token_target():
-    """
-    Gera o token para a API de destino usando a data atual
-    (Adaptada do integracao_folha_ponto.py)
-    """
-    config = carregar_configuracoes()
-    if not config:
+    """Gera o token para a API de destino usando a data atual (token do dia, ver auth_hevi)"""
+    config_target, token_final = obter_token_target()
+    if not config_target:
         print("❌ Erro ao carregar configurações")
         return None, None, None
     
-    # Usar configurações da APITARGET
-    url = config['apitarget']['url']
-    integracao = config['apitarget']['integracao']
-    token_base = config['apitarget']['token_base']
-    
-    # Configurar timezone para São Paulo
-    tz_sao_paulo = pytz.timezone('America/Sao_Paulo')
-    data_atual = datetime.now(tz_sao_paulo).strftime('%d/%m/%Y')
-    
-    # Gerar token final
-    token_concatenado = token_base + data_atual
-    token_final = hashlib.sha256(token_concatenado.encode('utf-8')).hexdigest()
-    
-    print(f"🔑 Data atual: {data_atual}")
-    print(f"🔗 Token base: {token_base}")
-    print(f"🔐 Token final gerado: {token_final[:32]}...")
-    
-    return url, integracao, token_final
+    return config_target['url'], config_target['integracao'], token_final
 
 def converter_para_csv(dados, nome_arquivo="dados.csv"):
     """
@@ -97,8 +64,7 @@ def converter_para_csv(dados, nome_arquivo="dados.csv"):
         csv_content = output.getvalue()
         output.close()
         
-        with open(nome_arquivo, 'w', encoding='utf-8', newline='') as f:
-            f.write(csv_content)
+        registrar_csv_gerado(nome_arquivo, csv_content)
         
         print(f"✅ CSV gerado com sucesso: {nome_arquivo}")
         print(f"📊 Total de registros: {len(dados)}")
@@ -115,11 +81,14 @@ def importar_via_post_generico(nome_arquivo_csv, endpoint, nome_modulo):
     Função para importar CSV via POST
     (Adaptada do integracao_folha_ponto.py)
     """
-    if not os.path.exists(nome_arquivo_csv):
+    envio = preparar_envio(endpoint, nome_arquivo_csv)
+    if envio is None:
+        return {'success': True, 'ok': 0, 'sem_alteracao': True}
+    if envio['conteudo'] is None:
         print(f"❌ Arquivo {nome_arquivo_csv} NÃO encontrado!")
         return None
     
-    print(f"✅ Arquivo {nome_arquivo_csv} encontrado")
+    print(f"✅ CSV {nome_arquivo_csv} pronto para envio ({len(envio['conteudo'])} bytes)")
     
     # Gerar token e configurações (mesma lógica do integracao_folha_ponto.py)
     resultado_token = gerar_token_target()
@@ -146,18 +115,7 @@ def importar_via_post_generico(nome_arquivo_csv, endpoint, nome_modulo):
         print(f"👤 User: {integracao}")
         print(f"🔐 Token: {token_final[:32]}...")
         
-        with open(nome_arquivo_csv, 'rb') as arquivo:
-            files = {
-                'arquivo': (nome_arquivo_csv, arquivo, 'text/csv')
-            }
-            
-            response = requests.post(
-                url, 
-                data=data, 
-                files=files,
-                headers=headers,
-                timeout=30
-            )
+        response = post_csv(url, data, nome_arquivo_csv, envio['conteudo'], headers, timeout=30)
         
         print(f"📊 Status: {response.status_code}")
         
@@ -177,6 +135,7 @@ def importar_via_post_generico(nome_arquivo_csv, endpoint, nome_modulo):
                     if cadastrados > 0:
                         print(f"🎉 {cadastrados} {nome_modulo} cadastrado(s)!")
                     
+                    registrar_envio_aceito(envio)
                     return resultado
                     
             except json.JSONDecodeError:
@@ -237,7 +196,7 @@ def buscar_detalhes_funcionario_completo(funcionario_id, headers):
             "include": "naturalidade,estado,foto,estadocivil,departamento,sexo,formadepagamento,nacionalidade,pais,tipoDeConta,tipoDeChavePix"
         }
         
-        response = requests.get(url, headers=headers, params=params)
+        response = http_get(url, headers=headers, params=params)
         if response.status_code == 200:
             data = response.json()
             funcionarios = data.get('data', [])
@@ -265,30 +224,6 @@ def extrair_datas_de_retorno_admissao(funcionario_detalhado):
     
     return datas_disponiveis
 
-def _extrair_ferias_situacao(colaboradores):
-    """
-    Extrai férias de situacaoPessoa quando sitCodSituacao = "2"
-    """
-    ferias_lista = []
-    for col in colaboradores:
-        situacoes = col.get('situacaoPessoa') or []
-        matricula = str(col.get('nroMatrExterno', '')).zfill(6)
-        
-        for sit in situacoes:
-            if str(sit.get('sitCodSituacao', '')) != '2':  # Apenas férias
-                continue
-            
-            ferias_lista.append({
-                'id-afastamento': '2',
-                'dtinicio': formatar_data_iso_para_br(sit.get('sitDataInicio', '')),
-                'dtfim': formatar_data_iso_para_br(sit.get('sitDataFim', '')),
-                'obs': 'Ferias',
-                'campo_chave': 'matricula',
-                'matricula': matricula
-            })
-    
-    return ferias_lista
-
 def estimar_datas_ferias(funcionario_api, afastamento_desc):
     """
     Estima datas de férias (sempre 30 dias)
@@ -376,58 +311,22 @@ def gerar_csv_ferias():
         return None
     
     print("\n1. Consultando férias na API Humanus...")
-    colaboradores = buscar_colaboradores_paginado()
-    ferias_csv = _extrair_ferias_situacao(colaboradores)
+    ferias_csv = extrair_entidades()['ferias']
     
     if not ferias_csv:
         print("❌ Nenhuma férias encontrada (sitCodSituacao=2)")
         return None
     
     print(f"\n📊 {len(ferias_csv)} registros de férias processados!")
+    
+    validar_dados_ferias_csv(ferias_csv, 'ferias_api.csv')
     return ferias_csv
 
-def validar_dados_ferias_csv(nome_arquivo):
+def validar_dados_ferias_csv(dados, nome_arquivo=None):
     """
-    Valida os dados do CSV de férias gerado
+    Valida os dados do CSV de férias gerado (regras em REGRAS_VALIDACAO, ver validacao_csv)
     """
-    if not nome_arquivo:
-        return
-    
-    try:
-        print(f"\n🔍 VALIDANDO DADOS DO CSV: {nome_arquivo}")
-        
-        # Ler o CSV gerado
-        df = pd.read_csv(nome_arquivo, sep=';', encoding='utf-8-sig')
-        
-        print(f"  📊 Total de registros: {len(df)}")
-        print(f"  📋 Total de colunas: {len(df.columns)}")
-        
-        # Verificar campos obrigatórios
-        campos_obrigatorios = ['matricula', 'obs', 'dtinicio', 'dtfim', 'id-afastamento']
-        
-        for campo in campos_obrigatorios:
-            if campo in df.columns:
-                vazios = df[campo].isna().sum() + (df[campo] == '').sum()
-                if vazios > 0:
-                    print(f"  ⚠️  Campo '{campo}': {vazios} registros vazios")
-                else:
-                    print(f"  ✅ Campo '{campo}': todos preenchidos")
-            else:
-                print(f"  ❌ Campo obrigatório '{campo}' não encontrado")
-        
-        # Verificar se todos os registros são código 1011 (férias)
-        if 'id-afastamento' in df.columns:
-            codigos_unicos = df['id-afastamento'].unique()
-            print(f"  📋 Códigos de afastamento encontrados: {codigos_unicos}")
-            if len(codigos_unicos) == 1 and codigos_unicos[0] == '1011':
-                print(f"  ✅ Todos os registros são FÉRIAS (1011)")
-            else:
-                print(f"  ⚠️  Encontrados códigos diferentes de 1011!")
-        
-        print(f"  ✅ Validação concluída")
-        
-    except Exception as e:
-        print(f"  ❌ Erro na validação: {e}")
+    return validar_linhas_csv(dados, REGRAS_VALIDACAO, nome_arquivo)
 
 def gerar_relatorio_ferias():
     """
@@ -502,9 +401,6 @@ def processar_integracao_completa():
     )
     
     if sucesso:
-        # Validar dados gerados
-        validar_dados_ferias_csv('ferias_api.csv')
-        
         print(f"\n🎉 INTEGRAÇÃO DE FÉRIAS FINALIZADA COM SUCESSO!")
         print(f"✅ Férias coletadas da API Alterdata")
         print(f"✅ CSV gerado: ferias_api.csv")
@@ -537,7 +433,6 @@ if __name__ == "__main__":
             if dados:
                 csv_content = converter_para_csv(dados, 'ferias_api.csv')
                 if csv_content:
-                    validar_dados_ferias_csv('ferias_api.csv')
                     print(f"\n🎉 CSV GERADO!")
                     print(f"📁 Arquivo: ferias_api.csv")
                     
@@ -1,94 +1,36 @@
 import requests
 import json
 import pandas as pd
-from datetime import datetime
-import time
-import hashlib
-import pytz
-import configparser
 from config_reader import obter_headers_api, obter_campo_chave_funcionarios
-from api_humanus import buscar_colaboradores_paginado, formatar_data_iso_para_br
+from auth_hevi import obter_token_target
+from envio_hevi import post_csv, registrar_csv_gerado, csv_do_dataframe
+from controle_envio import preparar_envio, registrar_envio_aceito
+from extracao_humanus import extrair_entidades
+from datas import iso_para_br
+from validacao_csv import validar_linhas_csv
 
-def carregar_configuracoes_target():
-    """
-    Carrega configurações da seção [APITARGET] do arquivo .config
-    """
-    try:
-        config = configparser.ConfigParser()
-        config.read('.config', encoding='utf-8')
-        
-        if 'APITARGET' not in config:
-            print("❌ Seção [APITARGET] não encontrada no arquivo .config")
-            return None
-        
-        return {
-            'url': config['APITARGET'].get('url', '').strip(),
-            'integracao': config['APITARGET'].get('integracao', '').strip(),
-            'token_base': config['APITARGET'].get('token_base', '').strip()
-        }
-    except Exception as e:
-        print(f"❌ Erro ao carregar configurações [APITARGET]: {e}")
-        return None
-
-def gerar_token_target():
-    """
-    Gera o token para a API de destino usando a data atual
-    """
-    config_target = carregar_configuracoes_target()
-    if not config_target:
-        return None, None
-    
-    # Configurar timezone para São Paulo
-    tz_sao_paulo = pytz.timezone('America/Sao_Paulo')
-    data_atual = datetime.now(tz_sao_paulo).strftime('%d/%m/%Y')
-    
-    # Gerar token final
-    token_concatenado = config_target['token_base'] + data_atual
-    token_final = hashlib.sha256(token_concatenado.encode('utf-8')).hexdigest()
-    
-    print(f"🔑 Data atual: {data_atual}")
-    print(f"🔗 Token base: {config_target['token_base']}")
-    print(f"🔐 Token final gerado: {token_final[:32]}...")
-    
-    return config_target, token_final
-
-def formatar_cpf_11_digitos(cpf):
-    """
-    Formata CPF para garantir 11 dígitos com zeros à esquerda
-    """
-    if not cpf:
-        return ""
-    
-    # Converter para string e remover caracteres não numéricos
-    cpf_str = str(cpf).replace('.', '').replace('-', '').replace('/', '').strip()
-    
-    # Se não for numérico ou estiver vazio, retornar vazio
-    if not cpf_str.isdigit():
-        return ""
-    
-    # Completar com zeros à esquerda para 11 dígitos
-    cpf_formatado = cpf_str.zfill(11)
-    
-    # Validar se tem exatamente 11 dígitos
-    if len(cpf_formatado) == 11:
-        return cpf_formatado
-    
-    return ""
+# Regras de validação do CSV de funcionários (validacao_csv)
+REGRAS_VALIDACAO = {
+    'obrigatorios': ['nome', 'cpf', 'matricula'],
+    'cpf': ['cpf'],
+    'datas': ['dtadmissao', 'dtnascimento'],
+}
 
 def enviar_csv_para_api_target(nome_arquivo_csv):
     """
     Envia o CSV de funcionários para a API da Hevi
     """
-    import os
-    
-    if not os.path.exists(nome_arquivo_csv):
+    envio = preparar_envio("funcionario_cadastrar", nome_arquivo_csv)
+    if envio is None:
+        return True
+    if envio['conteudo'] is None:
         print(f"❌ Arquivo {nome_arquivo_csv} não encontrado!")
         return False
     
-    print(f"✅ Arquivo {nome_arquivo_csv} encontrado")
+    print(f"✅ CSV {nome_arquivo_csv} pronto para envio ({len(envio['conteudo'])} bytes)")
     
     # Obter configurações e token
-    config_target, token_final = gerar_token_target()
+    config_target, token_final = obter_token_target()
     if not config_target or not token_final:
         print("❌ Falha ao gerar token para API de destino")
         return False
@@ -113,18 +55,7 @@ def enviar_csv_para_api_target(nome_arquivo_csv):
         print(f"📄 Endpoint: funcionario_cadastrar")
         print(f"🔑 Token: {token_final[:32]}...")
         
-        with open(nome_arquivo_csv, 'rb') as arquivo:
-            files = {
-                'arquivo': (nome_arquivo_csv, arquivo, 'text/csv')
-            }
-            
-            response = requests.post(
-                config_target['url'], 
-                data=data, 
-                files=files,
-                headers=headers,
-                timeout=30
-            )
+        response = post_csv(config_target['url'], data, nome_arquivo_csv, envio['conteudo'], headers, timeout=30)
         
         print(f"📊 Status da resposta: {response.status_code}")
         
@@ -145,6 +76,7 @@ def enviar_csv_para_api_target(nome_arquivo_csv):
                     if cadastrados > 0:
                         print(f"🎉 {cadastrados} funcionário(s) cadastrado(s) com sucesso!")
                     
+                    registrar_envio_aceito(envio)
                     return True
                 
             except json.JSONDecodeError:
@@ -161,23 +93,14 @@ def enviar_csv_para_api_target(nome_arquivo_csv):
         print(f"❌ ERRO na requisição para API da Hevi: {e}")
         return False
 
-def _eh_funcionario_demitido(col):
-    """Verifica se o colaborador tem situacaoPessoa com sitCodSituacao '3' (demitido)"""
-    situacoes = col.get('situacaoPessoa') or []
-    for sit in situacoes:
-        if str(sit.get('sitCodSituacao', '')) == '3':
-            return True
-    return False
-
 def consultar_funcionarios_ativos_api_humanus(force_api=False):
     """
     Coleta funcionários da API Humanus, excluindo os demitidos (sitCodSituacao=3)
     """
     print("🔍 INICIANDO COLETA DE FUNCIONÁRIOS ATIVOS - API Humanus...")
     
-    colaboradores = buscar_colaboradores_paginado(force_api=force_api)
-    # Filtrar demitidos
-    funcionarios_ativos = [c for c in colaboradores if not _eh_funcionario_demitido(c)]
+    # Demitidos já ficam de fora na extração única
+    funcionarios_ativos = extrair_entidades(force_api=force_api)['funcionarios_ativos']
     
     print(f"\n✅ Funcionários ativos (excluindo demitidos): {len(funcionarios_ativos)}")
     return funcionarios_ativos
@@ -186,117 +109,51 @@ def formatar_data_brasileira(data_iso):
     """
     Converte data ISO para formato brasileiro DD/MM/AAAA
     """
-    if not data_iso:
-        return ""
-    
-    try:
-        data_str = data_iso.replace('Z', '').split('T')[0]
-        data_obj = datetime.strptime(data_str, '%Y-%m-%d')
-        return data_obj.strftime('%d/%m/%Y')
-    except Exception as e:
-        return ""
-
-def _valor_campo_pessoa_api(col, nome_campo):
-    """
-    pesEmail, pesTelCelular e demais pes* costumam vir na raiz do colaborador
-    ou dentro de um objeto aninhado (ex.: pessoa com pesNomeExtenso, pesEmail).
-    Varre a raiz e dicts filhos diretos até encontrar o campo.
-    """
-    if not col or not nome_campo:
-        return ""
-    
-    def _normalizar(val):
-        if val is None:
-            return ""
-        s = str(val).strip()
-        return s
-    
-    v = col.get(nome_campo)
-    if v is not None and _normalizar(v):
-        return _normalizar(v)
-    
-    # Objetos comuns onde a Humanus agrupa cadastro da pessoa
-    for chave in (
-        'pessoa', 'Pessoa', 'pessoaCadastro', 'cadastroPessoa',
-        'dadosPessoa', 'pessoaBasica', 'PessoaBasica'
-    ):
-        obj = col.get(chave)
-        if isinstance(obj, dict):
-            v = obj.get(nome_campo)
-            if v is not None and _normalizar(v):
-                return _normalizar(v)
-    
-    # Qualquer filho dict no primeiro nível que tenha o campo (API varia o nome do wrapper)
-    for valor in col.values():
-        if isinstance(valor, dict) and nome_campo in valor:
-            v = valor.get(nome_campo)
-            if v is not None and _normalizar(v):
-                return _normalizar(v)
-    
-    return ""
+    return iso_para_br(data_iso)
 
-def mapear_colaborador_para_csv(col):
+def mapear_colaborador_para_csv(col, campo_chave=None):
     """
-    Mapeia um colaborador da API Humanus para o formato CSV.
+    Mapeia um colaborador (registro colaborador.Colaborador) para o formato CSV.
     Campos conforme Consultas.txt
     """
-    pfi = col.get('pessoaFisica') or {}
-    pff = col.get('pessoaFisFunc') or {}
-    pfu = col.get('pessoaFunc') or {}
-    lotacao = pfu.get('lotacao') or {}
-    
-    cpf = formatar_cpf_11_digitos(pfi.get('pfiCpfnumeroDigito', ''))
-    matricula = str(col.get('nroMatrExterno', '')).zfill(6)
-    
     # estado_civil: S=Solteiro, C=Casado
-    ec = pfi.get('pfiEstadoCivil', '')
+    ec = col.estado_civil
     estado_civil = 'Solteiro' if ec == 'S' else ('Casado' if ec == 'C' else '')
     
-    # pes* - raiz, pessoa aninhada ou outro dict (ver _valor_campo_pessoa_api)
-    pes_email = _valor_campo_pessoa_api(col, 'pesEmail')
-    if not pes_email:
-        pes_email = (pfi.get('pfiMobilityEmailHome') or '').strip()
-    pes_tel_celular = _valor_campo_pessoa_api(col, 'pesTelCelular')
-    pes_end_rua = _valor_campo_pessoa_api(col, 'pesEndRua')
-    pes_end_bairro = _valor_campo_pessoa_api(col, 'pesEndBairro')
-    pes_end_cidade = _valor_campo_pessoa_api(col, 'pesEndCidade')
-    pes_end_estado = _valor_campo_pessoa_api(col, 'pesEndEstado')
-    pes_end_cep = _valor_campo_pessoa_api(col, 'pesEndCep')
-    
-    campo_chave = obter_campo_chave_funcionarios()
+    if campo_chave is None:
+        campo_chave = obter_campo_chave_funcionarios()
     
-    nome_colab = col.get('nomeExtenso') or _valor_campo_pessoa_api(col, 'pesNomeExtenso')
+    cpf = col.cpf
     funcionario_csv = {
         'campo_chave': campo_chave,
-        'nome': nome_colab or '',
+        'nome': col.nome or '',
         'cpf': cpf,
         'cracha': cpf,
-        'matricula': matricula,
-        'pis': pfi.get('pfiPisnumeroDigito', '') or cpf,
-        'dtadmissao': formatar_data_iso_para_br(pfu.get('pfuDtInicioContrato', '')),
-        'email': pes_email,
-        'celular': pes_tel_celular,
-        'endereco': pes_end_rua,
-        'bairro': pes_end_bairro,
-        'cidade': pes_end_cidade,
-        'uf': pes_end_estado,
-        'cep': pes_end_cep,
+        'matricula': col.matricula,
+        'pis': col.pis,
+        'dtadmissao': col.data_admissao,
+        'email': col.email,
+        'celular': col.celular,
+        'endereco': col.endereco,
+        'bairro': col.bairro,
+        'cidade': col.cidade,
+        'uf': col.uf,
+        'cep': col.cep,
         'login': cpf,
         'senha': 'Ponto123',
-        'cod_empresa': col.get('codEmpresa', ''),
-        'codigo_legado_empresa': col.get('codEmpresa', ''),
-        'salario': str(pff.get('pffValorSalario', '')),
-        'dtnascimento': formatar_data_iso_para_br(pfi.get('pfiDataNascim', '')),
-        'nome_mae': pfi.get('pfiNomeMae', ''),
-        'nome_pai': pfi.get('pfiNomePai', ''),
+        'cod_empresa': col.cod_empresa,
+        'codigo_legado_empresa': col.cod_empresa,
+        'salario': col.salario,
+        'dtnascimento': col.data_nascimento,
+        'nome_mae': col.nome_mae,
+        'nome_pai': col.nome_pai,
         'estado_civil': estado_civil,
-        'codigo_unidade': lotacao.get('lotCodlotacao', ''),
-        'codigo_cargo': pff.get('pffCodCargo', ''),
-        'nome_cargo': pff.get('pffDescricaoCargo', ''),
+        'codigo_unidade': col.cod_lotacao,
+        'codigo_cargo': col.cod_cargo,
+        'nome_cargo': col.nome_cargo,
         'timezone': 'America/Sao_Paulo',
     }
     
-    # Garantir campo_chave como primeira coluna - reordenar
     return funcionario_csv
 
 def gerar_csv_funcionarios(force_api=False):
@@ -326,7 +183,7 @@ def gerar_csv_funcionarios(force_api=False):
     
     for i, col in enumerate(colaboradores, 1):
         try:
-            func_csv = mapear_colaborador_para_csv(col)
+            func_csv = mapear_colaborador_para_csv(col, campo_chave)
             # Garantir campo_chave como primeira coluna
             func_ordenado = {'campo_chave': campo_chave}
             func_ordenado.update({k: v for k, v in func_csv.items() if k != 'campo_chave'})
@@ -335,8 +192,8 @@ def gerar_csv_funcionarios(force_api=False):
             if i % 50 == 0:
                 print(f"  ✅ Processados {i}/{len(colaboradores)} funcionários...")
         except Exception as e:
-            erros.append({'matricula': col.get('nroMatrExterno', 'N/A'), 'erro': str(e)})
-            print(f"  ❌ Erro ao processar funcionário {col.get('nroMatrExterno', 'N/A')}: {e}")
+            erros.append({'matricula': col.matricula, 'erro': str(e)})
+            print(f"  ❌ Erro ao processar funcionário {col.matricula}: {e}")
     
     if not funcionarios_csv:
         print("❌ Nenhum funcionário foi convertido com sucesso")
@@ -348,7 +205,7 @@ def gerar_csv_funcionarios(force_api=False):
     nome_arquivo = "funcionarios_api.csv"
     
     try:
-        df.to_csv(nome_arquivo, index=False, encoding='utf-8-sig', sep=';')
+        registrar_csv_gerado(nome_arquivo, csv_do_dataframe(df))
         print(f"✅ CSV gerado com sucesso: {nome_arquivo}")
         
         print(f"\n📈 ESTATÍSTICAS:")
@@ -359,41 +216,19 @@ def gerar_csv_funcionarios(force_api=False):
         print(f"\n👁️ PREVIEW DOS DADOS (primeiras 3 linhas):")
         print(df.head(3).to_string())
         
+        validar_dados_csv(df, nome_arquivo)
+        
         return nome_arquivo
         
     except Exception as e:
         print(f"❌ Erro ao gerar CSV: {e}")
         return None
 
-def validar_dados_csv(nome_arquivo):
+def validar_dados_csv(dados, nome_arquivo=None):
     """
-    Valida os dados do CSV gerado
+    Valida os dados do CSV gerado (regras em REGRAS_VALIDACAO, ver validacao_csv)
     """
-    if not nome_arquivo:
-        return
-    
-    try:
-        print(f"\n🔍 VALIDANDO DADOS DO CSV: {nome_arquivo}")
-        
-        df = pd.read_csv(nome_arquivo, sep=';', encoding='utf-8-sig')
-        
-        print(f"  📊 Total de registros: {len(df)}")
-        print(f"  📋 Total de colunas: {len(df.columns)}")
-        
-        campos_obrigatorios = ['nome', 'cpf', 'matricula']
-        
-        for campo in campos_obrigatorios:
-            if campo in df.columns:
-                vazios = df[campo].isna().sum() + (df[campo] == '').sum()
-                if vazios > 0:
-                    print(f"  ⚠️ Campo '{campo}': {vazios} registros vazios")
-                else:
-                    print(f"  ✅ Campo '{campo}': todos preenchidos")
-        
-        print(f"  ✅ Validação concluída")
-        
-    except Exception as e:
-        print(f"  ❌ Erro na validação: {e}")
+    return validar_linhas_csv(dados, REGRAS_VALIDACAO, nome_arquivo)
 
 def processar_integracao_completa():
     """
@@ -410,10 +245,7 @@ def processar_integracao_completa():
         print("❌ Falha na geração do CSV. Processo interrompido.")
         return False
     
-    print("\n🔍 ETAPA 2: Validando dados do CSV...")
-    validar_dados_csv(arquivo_csv)
-    
-    print("\n📤 ETAPA 3: Enviando CSV para API da Hevi...")
+    print("\n📤 ETAPA 2: Enviando CSV para API da Hevi...")
     sucesso_envio = enviar_csv_para_api_target(arquivo_csv)
     
     if sucesso_envio:
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Cliente HTTP compartilhado da integração.
+Mantém uma sessão requests por host (keep-alive + pool de conexões), então chamadas
+seguidas para a mesma API (páginas do export, envios SOAP, uploads) reaproveitam a
+conexão TCP/TLS em vez de abrir uma nova a cada requisição.
+Configuração opcional na seção [HTTP] do .config (pool_conexoes, pool_hosts, timeout).
+Também aplica limites de requisições por segundo por host (definir_limite_host).
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config_reader import obter_config_http
+
+# Sessões por host: (esquema, host:porta) -> requests.Session
+_sessoes = {}
+_sessoes_lock = threading.Lock()
+
+# Limite de requisições por host (ver definir_limite_host): (esquema, host:porta) -> LimitadorTaxa
+_limitadores = {}
+
+
+def _chave_host(url):
+    """Chave da sessão: esquema + host (com porta) da URL"""
+    partes = urlsplit(url)
+    return (partes.scheme.lower(), partes.netloc.lower())
+
+
+def _criar_sessao():
+    """Cria uma sessão com adapter de pool dimensionado pela config [HTTP]"""
+    config_http = obter_config_http()
+    adapter = HTTPAdapter(
+        pool_connections=config_http['pool_hosts'],
+        pool_maxsize=config_http['pool_conexoes']
+    )
+    sessao = requests.Session()
+    sessao.mount('https://', adapter)
+    sessao.mount('http://', adapter)
+    return sessao
+
+
+def obter_sessao(url):
+    """Retorna a sessão (keep-alive) do host da URL, criando na primeira chamada"""
+    chave = _chave_host(url)
+    sessao = _sessoes.get(chave)
+    if sessao is None:
+        with _sessoes_lock:
+            sessao = _sessoes.get(chave)
+            if sessao is None:
+                sessao = _criar_sessao()
+                _sessoes[chave] = sessao
+    return sessao
+
+
+def http_request(metodo, url, timeout=None, **kwargs):
+    """
+    Faz a requisição pela sessão do host. Mesma assinatura de requests.request;
+    sem timeout explícito usa [HTTP] timeout. Exceções são as do requests.
+    """
+    if timeout is None:
+        timeout = obter_config_http()['timeout']
+    limitador = _limitadores.get(_chave_host(url))
+    if limitador is not None:
+        limitador.aguardar()
+    return obter_sessao(url).request(metodo, url, timeout=timeout, **kwargs)
+
+
+def http_get(url, **kwargs):
+    """GET pela sessão compartilhada (equivalente a requests.get)"""
+    return http_request('GET', url, **kwargs)
+
+
+def http_post(url, **kwargs):
+    """POST pela sessão compartilhada (equivalente a requests.post)"""
+    return http_request('POST', url, **kwargs)
+
+
+class LimitadorTaxa:
+    """
+    Token bucket compartilhado entre threads: libera no máximo `por_segundo`
+    requisições por segundo (rajada de até `capacidade`). por_segundo <= 0 = sem limite.
+    """
+
+    def __init__(self, por_segundo, capacidade=1):
+        self.por_segundo = float(por_segundo)
+        self.capacidade = max(1.0, float(capacidade))
+        self._tokens = self.capacidade
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        """Bloqueia até haver um token disponível para a próxima requisição"""
+        if self.por_segundo <= 0:
+            return
+        with self._lock:
+            agora = time.monotonic()
+            self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.por_segundo)
+            self._ultimo = agora
+            # Reserva o token (saldo pode ficar negativo) e calcula a espera fora do lock
+            self._tokens -= 1
+            espera = -self._tokens / self.por_segundo if self._tokens < 0 else 0
+        if espera > 0:
+            time.sleep(espera)
+
+
+def definir_limite_host(url, por_segundo):
+    """
+    Limita as requisições ao host da URL a `por_segundo` por segundo, somando todas as
+    threads (ex.: módulos rodando em paralelo no main.py). por_segundo <= 0 remove o limite.
+    """
+    chave = _chave_host(url)
+    if por_segundo and por_segundo > 0:
+        _limitadores[chave] = LimitadorTaxa(por_segundo)
+    else:
+        _limitadores.pop(chave, None)
+
+
+def fechar_sessoes():
+    """Fecha todas as sessões abertas (libera as conexões do pool)"""
+    with _sessoes_lock:
+        for sessao in _sessoes.values():
+            sessao.close()
+        _sessoes.clear()
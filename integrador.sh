@@ -10,5 +10,5 @@ if [ -d "venv" ]; then
     source venv/bin/activate
 fi
 
-# Executar integração
-python3 main.py
+# Executar integração (argumentos repassados, ex.: ./integrador.sh --daemon)
+exec python3 main.py "$@"
@@ -4,7 +4,8 @@
 SISTEMA DE INTEGRAÇÃO COMPLETA
 eContador API → CSV → Sistema Hevi
 
-Executa todos os módulos de integração na sequência correta:
+Executa todos os módulos de integração respeitando as dependências
+(módulos independentes rodam em paralelo, ver DEPENDENCIAS_MODULOS):
 1. Empresas
 2. Departamentos  
 3. Cargos
@@ -27,8 +28,12 @@ if sys.platform == 'win32':
     except Exception:
         pass
 import time
+import random
+import signal
+import threading
 from datetime import datetime
 import json
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # Importar todos os módulos de integração
 try:
@@ -38,7 +43,8 @@ try:
     import afastamentos
     import ferias
     import demissoes
-    from config_reader import ler_config
+    from config_reader import ler_config, obter_config_execucao
+    from envio_hevi import tamanho_csv_em_memoria
 except ImportError as e:
     print(f"❌ ERRO: Não foi possível importar um dos módulos necessários: {e}")
     print("📝 Certifique-se de que todos os arquivos estão no mesmo diretório:")
@@ -140,6 +146,7 @@ def executar_modulo(nome_modulo, modulo, descricao):
     print(f"{'='*80}")
     
     inicio = time.time()
+    inicio_iso = datetime.now().isoformat()
     
     try:
         # Executar o módulo
@@ -152,6 +159,8 @@ def executar_modulo(nome_modulo, modulo, descricao):
             'modulo': nome_modulo,
             'descricao': descricao,
             'sucesso': sucesso,
+            'inicio': inicio_iso,
+            'fim': datetime.now().isoformat(),
             'duracao_segundos': round(duracao, 2),
             'timestamp': datetime.now().isoformat()
         }
@@ -178,34 +187,116 @@ def executar_modulo(nome_modulo, modulo, descricao):
             'descricao': descricao,
             'sucesso': False,
             'erro': str(e),
+            'inicio': inicio_iso,
+            'fim': datetime.now().isoformat(),
             'duracao_segundos': round(duracao, 2),
             'timestamp': datetime.now().isoformat()
         }
         
         return resultado
 
-def pausar_entre_modulos(segundos=3):
-    """Pausa entre módulos para não sobrecarregar as APIs"""
-    print(f"\n⏸️  Aguardando {segundos} segundos antes do próximo módulo...")
-    for i in range(segundos, 0, -1):
-        print(f"   ⏳ {i}...", end='\r')
-        time.sleep(1)
-    print("   ✅ Continuando...                    ")
+# Dependências entre módulos: na Hevi, funcionários precisam de cargos e departamentos
+# já cadastrados; afastamentos, férias e demissões precisam dos funcionários.
+DEPENDENCIAS_MODULOS = {
+    'cargos': [],
+    'departamentos': [],
+    'funcionarios': ['cargos', 'departamentos'],
+    'afastamentos': ['funcionarios'],
+    'ferias': ['funcionarios'],
+    'demissoes': ['funcionarios'],
+}
 
-def gerar_relatorio_final(resultados):
-    """Gera relatório final da execução"""
+def configurar_limites_por_destino():
+    """
+    Aplica o limite de requisições por segundo de cada API (origem e destino),
+    compartilhado entre os módulos em paralelo. Substitui as pausas fixas entre módulos.
+    """
+    from config_reader import obter_config_api_humanus, obter_config_target
+    from http_client import definir_limite_host
+    
+    config_humanus = obter_config_api_humanus()
+    if config_humanus:
+        definir_limite_host(config_humanus['url_base'], config_humanus['requisicoes_por_segundo'])
+        print(f"🚦 API Humanus: {config_humanus['requisicoes_por_segundo'] or 'sem limite'} req/s")
+    
+    config_target = obter_config_target()
+    if config_target and config_target['url']:
+        definir_limite_host(config_target['url'], config_target['requisicoes_por_segundo'])
+        print(f"🚦 API de destino: {config_target['requisicoes_por_segundo'] or 'sem limite'} req/s")
+
+def executar_modulos_com_dependencias(sequencia_modulos, max_paralelos):
+    """
+    Executa os módulos respeitando DEPENDENCIAS_MODULOS: cada módulo começa assim que
+    todas as suas dependências terminam, e módulos independentes rodam ao mesmo tempo
+    (até max_paralelos). Como antes, a falha de uma dependência não impede o módulo
+    seguinte; fica registrada em 'dependencias_com_falha'.
+    Retorna os resultados na ordem de sequencia_modulos.
+    """
+    modulos = {nome: (modulo, descricao) for nome, modulo, descricao in sequencia_modulos}
+    dependencias = {
+        nome: [d for d in DEPENDENCIAS_MODULOS.get(nome, []) if d in modulos]
+        for nome in modulos
+    }
+    pendentes = [nome for nome, _, _ in sequencia_modulos]
+    em_execucao = {}
+    resultados = {}
+    
+    with ThreadPoolExecutor(max_workers=max_paralelos) as executor:
+        while pendentes or em_execucao:
+            # Disparar todos os módulos cujas dependências já terminaram
+            for nome in list(pendentes):
+                if all(dep in resultados for dep in dependencias[nome]):
+                    pendentes.remove(nome)
+                    modulo, descricao = modulos[nome]
+                    print(f"\n📍 Iniciando {nome} (dependências: {', '.join(dependencias[nome]) or 'nenhuma'})")
+                    em_execucao[executor.submit(executar_modulo, nome, modulo, descricao)] = nome
+            
+            if not em_execucao:
+                break  # Dependência circular: o restante não tem como iniciar
+            
+            concluidos, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                nome = em_execucao.pop(futuro)
+                resultado = futuro.result()
+                resultado['dependencias'] = dependencias[nome]
+                falhas = [dep for dep in dependencias[nome] if not resultados[dep]['sucesso']]
+                if falhas:
+                    resultado['dependencias_com_falha'] = falhas
+                resultados[nome] = resultado
+                print(f"\n📍 PROGRESSO: {len(resultados)}/{len(modulos)} módulos concluídos")
+    
+    for nome in pendentes:
+        modulo, descricao = modulos[nome]
+        resultados[nome] = {
+            'modulo': nome,
+            'descricao': descricao,
+            'sucesso': False,
+            'erro': f"Dependências não resolvidas: {', '.join(dependencias[nome])}",
+            'duracao_segundos': 0,
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    return [resultados[nome] for nome, _, _ in sequencia_modulos]
+
+def gerar_relatorio_final(resultados, tempo_total_geral=None):
+    """
+    Gera relatório final da execução.
+    tempo_total_geral: tempo real da execução (com módulos em paralelo é menor que a soma)
+    """
     print(f"\n{'='*80}")
     print("📊 RELATÓRIO FINAL DA INTEGRAÇÃO COMPLETA")
     print(f"{'='*80}")
     
     sucessos = sum(1 for r in resultados if r['sucesso'])
     falhas = len(resultados) - sucessos
-    tempo_total = sum(r['duracao_segundos'] for r in resultados)
+    tempo_soma_modulos = sum(r['duracao_segundos'] for r in resultados)
+    tempo_total = tempo_total_geral if tempo_total_geral is not None else tempo_soma_modulos
     
     print(f"\n📈 RESUMO GERAL:")
     print(f"   ✅ Módulos executados com sucesso: {sucessos}/{len(resultados)}")
     print(f"   ❌ Módulos com falha: {falhas}/{len(resultados)}")
     print(f"   ⏱️  Tempo total de execução: {tempo_total:.1f} segundos ({tempo_total/60:.1f} minutos)")
+    print(f"   ⏱️  Soma dos tempos dos módulos: {tempo_soma_modulos:.1f} segundos")
     print(f"   📅 Data/hora da execução: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
     
     print(f"\n📋 DETALHES POR MÓDULO:")
@@ -213,7 +304,10 @@ def gerar_relatorio_final(resultados):
         status = "✅ SUCESSO" if resultado['sucesso'] else "❌ FALHA"
         duracao = resultado['duracao_segundos']
         
-        print(f"   {status} {resultado['modulo']:<15} - {resultado['descricao']:<30} ({duracao:5.1f}s)")
+        periodo = ""
+        if resultado.get('inicio') and resultado.get('fim'):
+            periodo = f" [{resultado['inicio'][11:19]} → {resultado['fim'][11:19]}]"
+        print(f"   {status} {resultado['modulo']:<15} - {resultado['descricao']:<30} ({duracao:5.1f}s){periodo}")
         
         if not resultado['sucesso'] and 'erro' in resultado:
             print(f"      💥 Erro: {resultado['erro']}")
@@ -224,12 +318,28 @@ def gerar_relatorio_final(resultados):
             'data_hora': datetime.now().isoformat(),
             'sucessos': sucessos,
             'falhas': falhas,
-            'tempo_total_segundos': tempo_total,
-            'tempo_total_minutos': round(tempo_total / 60, 2)
+            'tempo_total_segundos': round(tempo_total, 2),
+            'tempo_total_minutos': round(tempo_total / 60, 2),
+            'tempo_soma_modulos_segundos': round(tempo_soma_modulos, 2)
         },
         'modulos': resultados
     }
     
+    # Onde os campos pes* foram encontrados (mudanças de layout da Humanus aparecem aqui)
+    try:
+        from colaborador import estatisticas_resolvedor_pessoa
+        relatorio_detalhado['campos_pessoa'] = estatisticas_resolvedor_pessoa()
+    except ImportError:
+        pass
+    
+    # Custo das operações do cache SQLite no ciclo
+    try:
+        from cache_db import estatisticas_cache_db, resumo_cache_db
+        relatorio_detalhado['cache_db'] = estatisticas_cache_db()
+        print(f"\n{resumo_cache_db()}")
+    except ImportError:
+        pass
+    
     nome_arquivo_relatorio = f"relatorio_integracao_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
     
     try:
@@ -255,7 +365,12 @@ def gerar_relatorio_final(resultados):
             tamanho = os.path.getsize(arquivo)
             print(f"   ✅ {arquivo:<25} ({tamanho:,} bytes)")
         else:
-            print(f"   ❌ {arquivo:<25} (não encontrado)")
+            # [APITARGET] salvar_csv = nao: o CSV enviado ficou só em memória
+            tamanho = tamanho_csv_em_memoria(arquivo)
+            if tamanho is not None:
+                print(f"   🧠 {arquivo:<25} ({tamanho:,} bytes, só em memória)")
+            else:
+                print(f"   ❌ {arquivo:<25} (não encontrado)")
     
     if sucessos == len(resultados):
         print(f"\n🎉 INTEGRAÇÃO COMPLETA FINALIZADA COM 100% DE SUCESSO!")
@@ -272,15 +387,19 @@ def gerar_relatorio_final(resultados):
         print(f"   Verifique as configurações e dependências.")
         return False
 
-def main():
-    """Função principal do sistema"""
+def main(interativo=True):
+    """
+    Função principal do sistema (um ciclo completo da integração).
+    interativo=False (modo daemon): nunca aguarda Enter no terminal.
+    """
     try:
         # Atualizar token no .config (se houver credenciais) - em toda execução
         try:
             from atualizar_token_config import atualizar_token_se_credenciais
             if not atualizar_token_se_credenciais():
                 print("❌ Falha ao atualizar token. Verifique as credenciais em [APISOURCE].")
-                input("\n❌ Pressione Enter para sair...")
+                if interativo:
+                    input("\n❌ Pressione Enter para sair...")
                 return False
         except ImportError:
             pass  # Script standalone não disponível, continua com token do .config
@@ -290,10 +409,11 @@ def main():
         
         # Verificar pré-requisitos
         if not verificar_prerequisitos():
-            input("\n❌ Pressione Enter para sair...")
+            if interativo:
+                input("\n❌ Pressione Enter para sair...")
             return False
         
-        # Configurar sequência de execução (cargos, departamentos, funcionarios, afastamentos, ferias, demissão)
+        # Módulos da integração (ordem do relatório; a execução segue DEPENDENCIAS_MODULOS)
         sequencia_modulos = [
             ('cargos', cargos, 'Cadastro de Cargos'),
             ('departamentos', departamentos, 'Cadastro de Departamentos'),
@@ -303,28 +423,30 @@ def main():
             ('demissoes', demissoes, 'Processamento de Demissões')
         ]
         
+        max_paralelos = obter_config_execucao()['modulos_paralelos']
+        
         print(f"\n🚀 INICIANDO INTEGRAÇÃO COMPLETA...")
-        print(f"📊 Total de módulos a executar: {len(sequencia_modulos)}")
+        print(f"📊 Total de módulos a executar: {len(sequencia_modulos)} (até {max_paralelos} em paralelo)")
+        
+        # Limites por API no lugar das pausas fixas entre módulos
+        configurar_limites_por_destino()
+        
+        try:
+            from cache_db import reiniciar_estatisticas_cache_db
+            reiniciar_estatisticas_cache_db()
+        except ImportError:
+            pass
         
-        resultados = []
         inicio_geral = time.time()
         
-        # Executar cada módulo na sequência
-        for i, (nome_modulo, modulo, descricao) in enumerate(sequencia_modulos, 1):
-            print(f"\n📍 PROGRESSO: {i}/{len(sequencia_modulos)} módulos")
-            
-            resultado = executar_modulo(nome_modulo, modulo, descricao)
-            resultados.append(resultado)
-            
-            # Pausa entre módulos (exceto no último)
-            if i < len(sequencia_modulos):
-                pausar_entre_modulos(3)
+        # Executar os módulos pelo grafo de dependências
+        resultados = executar_modulos_com_dependencias(sequencia_modulos, max_paralelos)
         
         fim_geral = time.time()
         tempo_total_geral = fim_geral - inicio_geral
         
         # Gerar relatório final
-        sucesso_geral = gerar_relatorio_final(resultados)
+        sucesso_geral = gerar_relatorio_final(resultados, tempo_total_geral)
         
         print(f"\n⏱️  TEMPO TOTAL DA EXECUÇÃO COMPLETA: {tempo_total_geral:.1f} segundos ({tempo_total_geral/60:.1f} minutos)")
         
@@ -339,22 +461,72 @@ def main():
     except KeyboardInterrupt:
         print(f"\n\n⏹️  INTEGRAÇÃO INTERROMPIDA PELO USUÁRIO!")
         print(f"   A execução foi cancelada manualmente.")
-        input(f"\n📋 Pressione Enter para sair...")
+        if interativo:
+            input(f"\n📋 Pressione Enter para sair...")
         return False
         
     except Exception as e:
         print(f"\n💥 ERRO CRÍTICO NA EXECUÇÃO PRINCIPAL:")
         print(f"   Erro: {str(e)}")
         print(f"   Tipo: {type(e).__name__}")
-        input(f"\n❌ Pressione Enter para sair...")
+        if interativo:
+            input(f"\n❌ Pressione Enter para sair...")
         return False
 
+def executar_daemon():
+    """
+    Modo daemon (python main.py --daemon): executa a integração em ciclos dentro do
+    mesmo processo, no lugar do cron de 30 em 30 minutos. Config lida, cache de
+    colaboradores em memória, sessões HTTP e token continuam carregados entre os ciclos.
+    Intervalo e variação aleatória em [EXECUCAO]; SIGTERM/SIGINT encerram ao fim do ciclo atual.
+    """
+    parar = threading.Event()
+    
+    def _sinal_parada(signum, frame):
+        print(f"\n⏹️  Sinal {signal.Signals(signum).name} recebido - encerrando ao fim do ciclo atual...")
+        parar.set()
+    
+    signal.signal(signal.SIGTERM, _sinal_parada)
+    signal.signal(signal.SIGINT, _sinal_parada)
+    
+    ciclo = 0
+    try:
+        while not parar.is_set():
+            ciclo += 1
+            inicio_ciclo = time.time()
+            print(f"\n🔁 CICLO {ciclo} - {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+            
+            sucesso = main(interativo=False)
+            if parar.is_set():
+                break
+            
+            # Intervalo contado do início do ciclo; .config relido se tiver mudado
+            config_execucao = obter_config_execucao()
+            jitter = config_execucao['jitter_segundos']
+            espera = config_execucao['intervalo_minutos'] * 60 + random.uniform(-jitter, jitter)
+            espera = max(0, espera - (time.time() - inicio_ciclo))
+            status = "concluído" if sucesso else "concluído com falhas"
+            print(f"\n💤 Ciclo {ciclo} {status} - próximo em {espera / 60:.1f} minutos")
+            parar.wait(espera)
+    finally:
+        from http_client import fechar_sessoes
+        fechar_sessoes()
+        try:
+            from cache_db import fechar_conexoes
+            fechar_conexoes()
+        except ImportError:
+            pass
+        print(f"👋 Daemon encerrado após {ciclo} ciclo(s)")
+    
+    return True
+
 if __name__ == "__main__":
     # Configurar encoding para Windows
     if sys.platform.startswith('win'):
         os.system('chcp 65001 > nul')
     
-    # Argumentos: --limpar-cache (limpa cache e sai), --force-api (força nova consulta à API)
+    # Argumentos: --limpar-cache (limpa cache e sai), --force-api (força nova consulta à API),
+    # --daemon (executa em ciclos no mesmo processo, ver [EXECUCAO] intervalo_minutos)
     args = sys.argv[1:]
     if '--limpar-cache' in args:
         try:
@@ -378,7 +550,15 @@ if __name__ == "__main__":
             print(f"⚠️ Erro ao forçar API: {e}")
     
     # Executar sistema
-    sucesso = main()
+    if '--daemon' in args:
+        sucesso = executar_daemon()
+    else:
+        sucesso = main()
+        try:
+            from cache_db import fechar_conexoes
+            fechar_conexoes()  # Checkpoint do WAL no banco ao fechar a última conexão
+        except ImportError:
+            pass
     
     # Código de saída
     sys.exit(0 if sucesso else 1)
\ No newline at end of file
@@ -10,8 +10,9 @@ import sys
 import json
 import time
 import pandas as pd
-import requests
-import configparser
+from http_client import http_get
+from config_reader import ler_config
+from datas import iso_para_br
 from datetime import datetime
 
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
@@ -19,9 +20,8 @@ os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
 def obter_headers():
     """Obtem headers da API sem prints com emojis"""
-    config = configparser.ConfigParser()
-    config.read(".config", encoding="utf-8")
-    if "APISOURCE" not in config:
+    config = ler_config()
+    if not config or "APISOURCE" not in config:
         return None
     token = config["APISOURCE"].get("token", "").strip('"')
     if not token:
@@ -33,14 +33,10 @@ def obter_headers():
 
 
 def formatar_data_br(data_iso):
-    """Converte data ISO para DD/MM/AAAA"""
+    """Converte data ISO para DD/MM/AAAA (texto original se não for data)"""
     if not data_iso:
         return ""
-    try:
-        data_str = str(data_iso).replace("Z", "").split("T")[0]
-        return datetime.strptime(data_str, "%Y-%m-%d").strftime("%d/%m/%Y")
-    except:
-        return str(data_iso)
+    return iso_para_br(data_iso) or str(data_iso)
 
 
 def consultar_funcionarios_por_status(status, page_limit=100):
@@ -68,9 +64,9 @@ def consultar_funcionarios_por_status(status, page_limit=100):
         try:
             print(f"  Pagina {pagina} ({status})... ", end="")
             if pagina == 1:
-                response = requests.get(base_url, headers=headers, params=params, timeout=30)
+                response = http_get(base_url, headers=headers, params=params, timeout=30)
             else:
-                response = requests.get(url_atual, headers=headers, timeout=30)
+                response = http_get(url_atual, headers=headers, timeout=30)
 
             if response.status_code == 200:
                 data = response.json()
@@ -126,7 +122,7 @@ def gerar_relatorio_demitidos():
     meta_ativo = None
     if ativos:
         # Fazer uma chamada para pegar o meta
-        resp = requests.get(
+        resp = http_get(
             "https://dp.pack.alterdata.com.br/api/v1/funcionarios",
             headers=headers,
             params={"filter[status]": "ativo", "page[limit]": "1"},
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Fixtures compartilhadas dos testes.
+Os módulos da integração ficam na raiz do repositório e leem o .config da pasta de
+execução: cada teste roda numa pasta temporária, com o cache SQLite dentro dela.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache_db
+import config_reader
+
+
+@pytest.fixture(autouse=True)
+def pasta_execucao(tmp_path, monkeypatch):
+    """Pasta de execução temporária, sem .config, cache de config e banco próprios"""
+    monkeypatch.chdir(tmp_path)
+    config_reader.limpar_cache_config()
+    cache_db.fechar_conexoes()
+    monkeypatch.setattr(cache_db, 'DB_PATH', str(tmp_path / 'integracao_cache.db'))
+    monkeypatch.setattr(cache_db, '_schema_pronto', False)
+    cache_db.limpar_cache_memoria()
+    yield tmp_path
+    cache_db.fechar_conexoes()
+    config_reader.limpar_cache_config()
+
+
+@pytest.fixture
+def escrever_config(pasta_execucao):
+    """Grava um .config na pasta de execução a partir de {secao: {chave: valor}}"""
+    def escrever(secoes):
+        linhas = []
+        for secao, valores in secoes.items():
+            linhas.append(f'[{secao}]')
+            linhas.extend(f'{chave} = {valor}' for chave, valor in valores.items())
+            linhas.append('')
+        (pasta_execucao / '.config').write_text('\n'.join(linhas), encoding='utf-8')
+        config_reader.limpar_cache_config()
+    return escrever
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""Paginação do export da API Humanus e extração única, com o endpoint simulado"""
+
+import copy
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+import api_humanus
+import cache_db
+import extracao_humanus
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       'consulta_colaboradores.txt')
+
+
+def _fixture():
+    with open(FIXTURE, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def _colaboradores(total):
+    """Cópias do colaborador da fixture com matrícula 1..total (empresa 004 nas pares)"""
+    base = _fixture()[0]
+    colaboradores = []
+    for i in range(1, total + 1):
+        col = copy.deepcopy(base)
+        col['nroMatrExterno'] = i
+        col['codEmpresa'] = '004' if i % 2 == 0 else '001'
+        colaboradores.append(col)
+    return colaboradores
+
+
+class _Resposta:
+    """Resposta em streaming: o corpo sai em blocos pequenos para exercitar o parser incremental"""
+
+    def __init__(self, status_code, corpo=b'', tamanho_bloco=97):
+        self.status_code = status_code
+        self.corpo = corpo
+        self.tamanho_bloco = tamanho_bloco
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.corpo), self.tamanho_bloco):
+            yield self.corpo[i:i + self.tamanho_bloco]
+
+    def close(self):
+        pass
+
+
+class _Export:
+    """Endpoint /colaborador/v2/exportar simulado: 404 depois da última página"""
+
+    def __init__(self, colaboradores, erro_na_pagina=None, atraso=None, envelope=False):
+        self.colaboradores = colaboradores
+        self.envelope = envelope
+        self.erro_na_pagina = erro_na_pagina
+        self.atraso = atraso or {}
+        self.paginas = []
+        self._lock = threading.Lock()
+
+    def __call__(self, url, headers, **kwargs):
+        query = parse_qs(urlparse(url).query)
+        pagina = int(query['NumeroPagina'][0])
+        tamanho = int(query['TamanhoPagina'][0])
+        with self._lock:
+            self.paginas.append(pagina)
+        # time.sleep é desligado no teste (pausa entre páginas do modo sequencial)
+        threading.Event().wait(self.atraso.get(pagina, 0))
+        if pagina == self.erro_na_pagina:
+            return _Resposta(500)
+        itens = self.colaboradores[(pagina - 1) * tamanho:pagina * tamanho]
+        if not itens:
+            return _Resposta(404)
+        corpo = {'data': itens} if self.envelope else itens
+        return _Resposta(200, b'\xef\xbb\xbf' + json.dumps(corpo, indent=2).encode('utf-8'))
+
+
+@pytest.fixture
+def humanus(escrever_config, monkeypatch):
+    """Config [APISOURCE] com token fixo e páginas de 2 colaboradores; retorna o instalador do stub"""
+    monkeypatch.setattr(api_humanus.time, 'sleep', lambda segundos: None)
+
+    def instalar(export, workers=1, empresas=''):
+        escrever_config({
+            'APISOURCE': {'token': 'abc', 'url_base': 'http://humanus.local/exportar',
+                          'tamanho_pagina': 2, 'workers_paginas': workers},
+            'EMPRESAS': {'empresas_permitidas': empresas},
+        })
+        monkeypatch.setattr(api_humanus, 'http_get_humanus', export)
+        return export
+    return instalar
+
+
+def _matriculas(colaboradores):
+    return [col['nroMatrExterno'] for col in colaboradores]
+
+
+def test_fixture_e_json_valido():
+    colaboradores = _fixture()
+    assert len(colaboradores) == 1
+    assert colaboradores[0]['pessoaFisica']['pfiCpfnumeroDigito'] == '10004194950'
+
+
+def test_paginacao_para_na_pagina_menor_que_o_tamanho(humanus):
+    export = humanus(_Export(_colaboradores(5)))
+
+    colaboradores, sucesso = api_humanus._exportar_colaboradores()
+
+    assert sucesso is True
+    assert _matriculas(colaboradores) == [1, 2, 3, 4, 5]
+    assert export.paginas == [1, 2, 3]
+
+
+def test_paginacao_termina_no_404(humanus):
+    export = humanus(_Export(_colaboradores(4)))
+
+    colaboradores, sucesso = api_humanus._exportar_colaboradores()
+
+    assert sucesso is True
+    assert _matriculas(colaboradores) == [1, 2, 3, 4]
+    assert export.paginas == [1, 2, 3]
+
+
+def test_pagina_em_objeto_com_lista(humanus):
+    humanus(_Export(_colaboradores(3), envelope=True))
+
+    colaboradores, sucesso = api_humanus._exportar_colaboradores()
+
+    assert sucesso is True
+    assert _matriculas(colaboradores) == [1, 2, 3]
+
+
+def test_parser_le_o_objeto_do_topo_uma_vez_so(monkeypatch):
+    # Corpo {"data": [...]} em 200 blocos: uma decodificação só, no fim
+    corpo = json.dumps({'data': _colaboradores(3)})
+    partes = [corpo[i:i + len(corpo) // 200 + 1] for i in range(0, len(corpo), len(corpo) // 200 + 1)]
+    decodificacoes = []
+    raw_decode = json.JSONDecoder.raw_decode
+    monkeypatch.setattr(json.JSONDecoder, 'raw_decode',
+                        lambda self, s, idx=0: decodificacoes.append(idx) or raw_decode(self, s, idx))
+
+    colaboradores = list(api_humanus._iterar_colaboradores_json(partes))
+
+    assert _matriculas(colaboradores) == [1, 2, 3]
+    assert len(decodificacoes) == 1
+
+
+def test_erro_http_interrompe_e_sinaliza_falha(humanus):
+    humanus(_Export(_colaboradores(6), erro_na_pagina=2))
+
+    colaboradores, sucesso = api_humanus._exportar_colaboradores()
+
+    assert sucesso is False
+    assert _matriculas(colaboradores) == [1, 2]
+
+
+def test_paginas_concorrentes_preservam_a_ordem(humanus):
+    # A página 1 responde por último; o resultado continua na ordem das páginas
+    export = humanus(_Export(_colaboradores(9), atraso={1: 0.1}), workers=3)
+
+    colaboradores, sucesso = api_humanus._exportar_colaboradores()
+
+    assert sucesso is True
+    assert _matriculas(colaboradores) == list(range(1, 10))
+    assert set(range(1, 6)) <= set(export.paginas)
+    assert max(export.paginas) <= 5 + 3
+
+
+def test_projecao_descarta_historicos_na_leitura(humanus):
+    humanus(_Export(_colaboradores(1)))
+
+    colaboradores, _ = api_humanus._exportar_colaboradores(projecao=api_humanus.projetar_colaborador)
+
+    col = colaboradores[0]
+    assert 'histCodGfip' not in col and 'histLotacao' not in col
+    assert set(col['pessoaFisFunc']) == {'pffCodCargo', 'pffDescricaoCargo', 'pffValorSalario'}
+    assert col['pessoaFunc']['lotacao'] == {'lotCodlotacao': '001', 'lotDenominacao': 'GERAL'}
+    assert [s['sitCodSituacao'] for s in col['situacaoPessoa']] == ['10', '3', '1']
+
+
+def test_busca_filtra_empresas_permitidas(humanus):
+    humanus(_Export(_colaboradores(5)), empresas='4')
+
+    colaboradores = api_humanus.buscar_colaboradores_paginado(force_api=True)
+
+    assert _matriculas(colaboradores) == [2, 4]
+
+
+def test_extracao_unica_da_fixture(humanus, pasta_execucao):
+    humanus(_Export(_fixture()))
+    situacoes = [{'cadCodDetAssunto': '10', 'cadDenominacao': 'Licença', 'cadReserva': '10'}]
+    (pasta_execucao / 'consulta_situacao.txt').write_text(json.dumps(situacoes), encoding='utf-8')
+    extracao_humanus.limpar_extracao()
+
+    try:
+        entidades = extracao_humanus.extrair_entidades(force_api=True)
+    finally:
+        extracao_humanus.limpar_extracao()
+
+    assert entidades['cargos'] == {'002': {'codigo': '002', 'nome': 'ATENDENTE CONVENIENCIA'}}
+    assert entidades['departamentos'] == {'001': {'codigo': '001', 'nome': 'GERAL', 'empresa_id': '1'}}
+    assert entidades['funcionarios_ativos'] == []
+    assert entidades['demissoes'] == [{
+        'matricula': '000167', 'data_demissao_iso': '2025-05-09T00:00:00', 'data_demissao': '09/05/2025',
+        'obs': 'Demissao', 'nome': 'ALEJANDRA CAMILA MODESTO LIMA NOGUEIRA',
+    }]
+    assert entidades['afastamentos'] == [{
+        'id-afastamento': '10', 'dtinicio': '18/02/2025', 'dtfim': '18/02/2025', 'obs': 'Licença',
+        'campo_chave': 'matricula', 'matricula': '000167',
+    }]
+    assert entidades['ferias'] == []
+
+
+def test_extracao_memorizada_vence_com_a_validade_do_cache(humanus, escrever_config, monkeypatch):
+    humanus(_Export(_colaboradores(2)))
+    escrever_config({
+        'APISOURCE': {'token': 'abc', 'url_base': 'http://humanus.local/exportar', 'tamanho_pagina': 2},
+        'CACHE': {'validade_minutos': 1},
+    })
+    passadas = []
+    buscar = extracao_humanus.buscar_registros_colaboradores
+    monkeypatch.setattr(extracao_humanus, 'buscar_registros_colaboradores',
+                        lambda force_api=False: passadas.append(force_api) or buscar(force_api))
+    monkeypatch.setattr(extracao_humanus, 'buscar_situacoes', lambda: {})
+    extracao_humanus.limpar_extracao()
+
+    try:
+        primeira = extracao_humanus.extrair_entidades()
+        assert extracao_humanus.extrair_entidades() is primeira
+        assert len(passadas) == 1
+
+        # Snapshot em memória renovado (delta sem alterações), mas a extração é de 5 min atrás
+        monkeypatch.setattr(extracao_humanus, '_extraido_em', datetime.now() - timedelta(minutes=5))
+        cache_db.renovar_cache_memoria()
+
+        assert extracao_humanus.extrair_entidades() is not primeira
+        assert len(passadas) == 2
+    finally:
+        extracao_humanus.limpar_extracao()
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""Token da API Humanus: reuso até a margem do exp e renovação única depois de um 401"""
+
+import base64
+import json
+import threading
+import time
+
+import pytest
+
+import auth_humanus
+
+
+def _jwt(exp):
+    """JWT sem assinatura válida (auth_humanus só lê o exp)"""
+    def parte(dados):
+        return base64.urlsafe_b64encode(json.dumps(dados).encode()).rstrip(b'=').decode()
+    return f"{parte({'alg': 'HS256'})}.{parte({'nbf': int(time.time()), 'exp': int(exp)})}.assinatura"
+
+
+class _Resposta:
+    def __init__(self, status_code, text=''):
+        self.status_code = status_code
+        self.text = text
+
+    def close(self):
+        pass
+
+
+class _Autenticacao:
+    """Endpoint /Token simulado: cada POST gera um token novo com a validade configurada"""
+
+    def __init__(self, validade_segundos=3600, atraso=0):
+        self.validade_segundos = validade_segundos
+        self.atraso = atraso
+        self.emitidos = []
+        self._lock = threading.Lock()
+
+    def __call__(self, url, json=None, headers=None, timeout=None):
+        time.sleep(self.atraso)
+        with self._lock:
+            token = _jwt(time.time() + self.validade_segundos + len(self.emitidos))
+            self.emitidos.append(token)
+        return _Resposta(200, f'{{"token": "{token}"}}')
+
+
+@pytest.fixture
+def credenciais(escrever_config, monkeypatch):
+    """[APISOURCE] com credenciais e margem de 60 s; retorna o instalador do endpoint /Token"""
+    monkeypatch.setattr(auth_humanus, '_token_atual', None)
+    escrever_config({'APISOURCE': {
+        'url_token': 'http://humanus.local/Token', 'alias_name': 'ALIAS', 'user_name': 'API',
+        'password': 'segredo', 'margem_renovacao_token': 60,
+    }})
+
+    def instalar(autenticacao):
+        monkeypatch.setattr(auth_humanus, 'http_post', autenticacao)
+        return autenticacao
+    return instalar
+
+
+def test_token_reutilizado_enquanto_fora_da_margem(credenciais):
+    autenticacao = credenciais(_Autenticacao(validade_segundos=3600))
+
+    primeiro = auth_humanus.obter_token_humanus()
+    segundo = auth_humanus.obter_token_humanus()
+
+    assert primeiro == segundo == autenticacao.emitidos[0]
+    assert len(autenticacao.emitidos) == 1
+
+
+def test_token_renovado_dentro_da_margem(credenciais):
+    # Vale 30 s: já está dentro da margem de 60 s na próxima chamada
+    autenticacao = credenciais(_Autenticacao(validade_segundos=30))
+
+    primeiro = auth_humanus.obter_token_humanus()
+    segundo = auth_humanus.obter_token_humanus()
+
+    assert primeiro != segundo
+    assert len(autenticacao.emitidos) == 2
+
+
+def test_token_do_disco_reutilizado_em_nova_execucao(credenciais, monkeypatch):
+    autenticacao = credenciais(_Autenticacao())
+    token = auth_humanus.obter_token_humanus()
+
+    # Nova execução: sem token em memória, o .token_humanus ainda vale
+    monkeypatch.setattr(auth_humanus, '_token_atual', None)
+
+    assert auth_humanus.obter_token_humanus() == token
+    assert len(autenticacao.emitidos) == 1
+
+
+def test_401_renova_o_token_uma_vez_para_todas_as_threads(credenciais, monkeypatch):
+    autenticacao = credenciais(_Autenticacao(atraso=0.05))
+    revogado = auth_humanus.obter_token_humanus()
+    chamadas = []
+
+    def http_get(url, headers=None, **kwargs):
+        token = headers['Authorization'].replace('Bearer ', '', 1)
+        chamadas.append(token)
+        return _Resposta(401 if token == revogado else 200)
+
+    monkeypatch.setattr(auth_humanus, 'http_get', http_get)
+
+    cabecalhos = [{'Authorization': f'Bearer {revogado}'} for _ in range(6)]
+    barreira = threading.Barrier(len(cabecalhos))
+    respostas = []
+
+    def buscar(headers):
+        barreira.wait()
+        respostas.append(auth_humanus.http_get_humanus('http://humanus.local/exportar', headers))
+
+    threads = [threading.Thread(target=buscar, args=(h,)) for h in cabecalhos]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    novo = autenticacao.emitidos[1]
+    assert len(autenticacao.emitidos) == 2
+    assert [r.status_code for r in respostas] == [200] * 6
+    assert all(h['Authorization'] == f'Bearer {novo}' for h in cabecalhos)
+    assert chamadas.count(revogado) == 6 and chamadas.count(novo) == 6
+
+
+def test_401_com_token_fixo_nao_repete_a_requisicao(escrever_config, monkeypatch):
+    # Sem credenciais não há como renovar: devolve o próprio 401
+    escrever_config({'APISOURCE': {'token': 'fixo'}})
+    chamadas = []
+
+    def http_get(url, headers=None, **kwargs):
+        chamadas.append(url)
+        return _Resposta(401)
+
+    monkeypatch.setattr(auth_humanus, 'http_get', http_get)
+
+    resposta = auth_humanus.http_get_humanus('http://humanus.local/exportar', {'Authorization': 'Bearer fixo'})
+
+    assert resposta.status_code == 401
+    assert len(chamadas) == 1
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Cache de colaboradores em SQLite: mescla do delta do modo incremental"""
+
+import cache_db
+
+SENTINELA = '0001-01-01T00:00:00'
+
+
+def _colaborador(matricula, data_alteracao=SENTINELA, **extra):
+    col = {'codEmpresa': '004', 'nroMatrExterno': matricula, 'nomeExtenso': f'Pessoa {matricula}',
+           'dataUltimaAlteracao': data_alteracao}
+    col.update(extra)
+    return col
+
+
+def _cache():
+    return {c['nroMatrExterno']: c for c in cache_db.get_colaboradores_cache(ignorar_validade=True)}
+
+
+def test_mescla_detecta_alteracao_com_data_sentinela():
+    cache_db.set_colaboradores_cache([_colaborador('1'), _colaborador('2')])
+
+    alterado = _colaborador('1', nomeExtenso='Nome Novo')
+    alterados = cache_db.mesclar_colaboradores_cache([alterado, _colaborador('2')])
+
+    assert alterados == [alterado]
+    assert _cache()['1']['nomeExtenso'] == 'Nome Novo'
+
+
+def test_mescla_ignora_delta_mais_antigo_que_a_linha():
+    cache_db.set_colaboradores_cache([_colaborador('1', '2026-03-01T10:00:00')])
+
+    antigo = _colaborador('1', '2026-02-01T10:00:00', nomeExtenso='Versão antiga')
+    assert cache_db.mesclar_colaboradores_cache([antigo]) == []
+    assert _cache()['1']['nomeExtenso'] == 'Pessoa 1'
+
+    novo = _colaborador('1', '2026-03-01T10:00:00', nomeExtenso='Mesma data, conteúdo novo')
+    assert cache_db.mesclar_colaboradores_cache([novo]) == [novo]
+
+
+def test_mescla_acrescenta_novos_no_fim_da_ordem():
+    cache_db.set_colaboradores_cache([_colaborador('1'), _colaborador('2')])
+
+    cache_db.mesclar_colaboradores_cache([_colaborador('3'), _colaborador('1', nomeExtenso='X')])
+
+    ordem = [c['nroMatrExterno'] for c in cache_db.get_colaboradores_cache(ignorar_validade=True)]
+    assert ordem == ['1', '2', '3']
+
+
+def test_migracao_remove_tabela_antiga_uma_vez_so(pasta_execucao, monkeypatch):
+    banco = cache_db.sqlite3.connect(cache_db.DB_PATH)
+    banco.execute("CREATE TABLE cache_colaboradores (id INTEGER PRIMARY KEY, dados TEXT)")
+    banco.commit()
+    banco.close()
+
+    cache_db.get_estado_sincronizacao()
+    banco = cache_db.sqlite3.connect(cache_db.DB_PATH)
+    tabelas = {r[0] for r in banco.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert 'cache_colaboradores' not in tabelas
+    assert banco.execute("PRAGMA user_version").fetchone()[0] == cache_db.VERSAO_SCHEMA
+
+    # Banco já migrado: um novo processo não roda a migração de novo
+    banco.execute("CREATE TABLE cache_colaboradores (id INTEGER PRIMARY KEY)")
+    banco.commit()
+    banco.close()
+    cache_db.fechar_conexoes()
+    monkeypatch.setattr(cache_db, '_schema_pronto', False)
+    cache_db.get_estado_sincronizacao()
+    banco = cache_db.sqlite3.connect(cache_db.DB_PATH)
+    assert banco.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE name = 'cache_colaboradores'").fetchone()[0] == 1
+    banco.close()
+
+
+def test_chave_repetida_ou_vazia_nao_sobrescreve_colaborador(capsys):
+    export = [
+        _colaborador('1', nomeExtenso='Primeiro'),
+        _colaborador('1', nomeExtenso='Mesma chave'),
+        _colaborador('', nomeExtenso='Sem matrícula'),
+        _colaborador('', nomeExtenso='Outro sem matrícula'),
+    ]
+
+    cache_db.set_colaboradores_cache(export)
+
+    assert cache_db.get_colaboradores_cache(ignorar_validade=True) == export
+    assert '3 colaboradores com codEmpresa/nroMatrExterno vazio ou repetido' in capsys.readouterr().out
+
+    # Mesmo export de novo: nada a regravar
+    cache_db.set_colaboradores_cache(export)
+    assert '(0 gravados, 0 removidos)' in capsys.readouterr().out
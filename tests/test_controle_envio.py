@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Modo delta do controle de envios: linhas novas/alteradas por chave"""
+
+import cache_db
+import controle_envio
+
+ENDPOINT = 'funcionario_cadastrar'
+ARQUIVO = 'funcionarios_api.csv'
+CHAVE = controle_envio._chave_envio(ENDPOINT, ARQUIVO)
+
+
+def _csv(linhas):
+    texto = 'campo_chave;nome;cpf\n' + ''.join(f'cpf;{nome};{cpf}\n' for nome, cpf in linhas)
+    return texto.encode('utf-8-sig')
+
+
+def _enviar(linhas):
+    """Monta o delta e grava o estado como se a API tivesse aceitado o envio"""
+    _, conteudo, total, hashes = controle_envio._montar_delta(ENDPOINT, ARQUIVO, _csv(linhas), CHAVE)
+    cache_db.registrar_linhas_enviadas(CHAVE, hashes)
+    return conteudo.decode('utf-8-sig'), total, hashes
+
+
+def test_chaves_repetidas_nao_se_sobrescrevem():
+    linhas = [('Ana', ''), ('Bruno', ''), ('Carla', '12345678901')]
+
+    _, total, hashes = _enviar(linhas)
+    assert total == 3
+    assert len(hashes) == 3  # as duas linhas de CPF vazio têm estado próprio
+
+    # Nada mudou: nenhuma linha de CPF vazio volta a ser enviada
+    _, total, _ = _enviar(linhas)
+    assert total == 0
+
+
+def test_linha_alterada_com_chave_repetida_entra_no_delta():
+    _enviar([('Ana', ''), ('Bruno', ''), ('Carla', '12345678901')])
+
+    conteudo, total, _ = _enviar([('Ana', ''), ('Bruno Souza', ''), ('Carla', '12345678901')])
+
+    assert total == 1
+    assert conteudo.splitlines()[1:] == ['cpf;Bruno Souza;']
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Envio SOAP concorrente das demissões e registro no histórico (cache_db)"""
+
+import threading
+import time
+
+import pytest
+
+import cache_db
+import demissoes
+
+
+class _Resposta:
+    status_code = 200
+    text = '<ok/>'
+
+
+class _RespostaQuebrada:
+    """Resposta cujo tratamento na thread principal falha"""
+    text = ''
+
+    @property
+    def status_code(self):
+        raise RuntimeError('falha no tratamento')
+
+
+def _demissoes(total):
+    return [{'matricula': f'{i:06d}', 'DATA_DEMISSAO': '10/01/2026', 'nome': f'Nome {i}'}
+            for i in range(1, total + 1)]
+
+
+@pytest.fixture
+def soap(monkeypatch):
+    """Config SOAP fixa: 2 demissões por envelope, 3 envelopes em paralelo, sem limite de taxa"""
+    monkeypatch.setattr(demissoes, 'carregar_configuracoes_soap', lambda: {
+        'url': 'http://soap.local', 'client_id': 'c', 'usuario': 'u',
+        'tamanho_lote': 2, 'workers': 3, 'requisicoes_por_segundo': 0,
+    })
+
+
+def _registradas():
+    return {(d['matricula'], d['data_demissao']) for d in cache_db.get_historico_demissoes()}
+
+
+def test_lote_com_erro_nao_impede_registro_dos_aceitos(soap, monkeypatch):
+    # Lote 2 falha na thread; no lote 3 a segunda matrícula é recusada pelo SOAP
+    def enviar_lote(n_lote, lote, soap_config, limitador):
+        time.sleep(0.01 * n_lote)
+        if n_lote == 2:
+            raise ConnectionError('envelope perdido')
+        resultados = [(True, 'ok')] * len(lote)
+        if n_lote == 3:
+            resultados[1] = (False, 'recusada')
+        return {'n_lote': n_lote, 'lote': lote, 'resposta': _Resposta(), 'resultados': resultados}
+
+    monkeypatch.setattr(demissoes, '_enviar_lote_soap', enviar_lote)
+
+    assert demissoes.enviar_demissoes_via_soap(_demissoes(8)) is True
+
+    aceitas = {(f'{i:06d}', '10/01/2026') for i in (1, 2, 5, 7, 8)}
+    assert _registradas() == aceitas
+
+
+def test_falha_na_thread_principal_registra_envelopes_em_andamento(soap, monkeypatch):
+    # Lote 1 volta logo e quebra o tratamento; os demais ainda estão em voo nesse momento
+    liberar = threading.Event()
+
+    def enviar_lote(n_lote, lote, soap_config, limitador):
+        if n_lote == 1:
+            resposta = _RespostaQuebrada()
+        else:
+            liberar.wait(2)
+            resposta = _Resposta()
+        return {'n_lote': n_lote, 'lote': lote, 'resposta': resposta,
+                'resultados': [(True, 'ok')] * len(lote)}
+
+    monkeypatch.setattr(demissoes, '_enviar_lote_soap', enviar_lote)
+    threading.Timer(0.2, liberar.set).start()
+
+    with pytest.raises(RuntimeError):
+        demissoes.enviar_demissoes_via_soap(_demissoes(6))
+
+    # Os três envelopes foram aceitos pelo SOAP: todas as matrículas no histórico,
+    # inclusive as do lote cujo tratamento falhou
+    aceitas = {(f'{i:06d}', '10/01/2026') for i in range(1, 7)}
+    assert _registradas() == aceitas
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""Cliente HTTP compartilhado: limite de requisições por segundo por host"""
+
+import threading
+import time
+
+import pytest
+
+import http_client
+
+
+class _Sessao:
+    """Sessão simulada: registra o instante de cada requisição"""
+
+    def __init__(self):
+        self.instantes = []
+        self._lock = threading.Lock()
+
+    def request(self, metodo, url, timeout=None, **kwargs):
+        with self._lock:
+            self.instantes.append(time.monotonic())
+
+
+@pytest.fixture
+def sessao(monkeypatch):
+    """Todas as requisições numa sessão simulada, sem limites de outros testes"""
+    sessao = _Sessao()
+    monkeypatch.setattr(http_client, '_limitadores', {})
+    monkeypatch.setattr(http_client, 'obter_sessao', lambda url: sessao)
+    return sessao
+
+
+def _duracao(instantes):
+    return max(instantes) - min(instantes)
+
+
+def test_limitador_espaça_as_requisicoes():
+    limitador = http_client.LimitadorTaxa(20)
+    inicio = time.monotonic()
+    for _ in range(5):
+        limitador.aguardar()
+
+    # A primeira sai na hora; as outras quatro, a cada 1/20 s
+    assert time.monotonic() - inicio >= 0.19
+
+
+def test_limitador_sem_limite_nao_espera():
+    limitador = http_client.LimitadorTaxa(0)
+    inicio = time.monotonic()
+    for _ in range(100):
+        limitador.aguardar()
+    assert time.monotonic() - inicio < 0.05
+
+
+def test_limite_vale_so_para_o_host_configurado(sessao):
+    http_client.definir_limite_host('http://hevi.local/api/upload', 20)
+
+    for _ in range(5):
+        http_client.http_get('http://humanus.local/exportar', timeout=1)
+    livre = list(sessao.instantes)
+    sessao.instantes.clear()
+    for _ in range(5):
+        http_client.http_post('http://hevi.local/api/outro', timeout=1)
+
+    assert _duracao(livre) < 0.05
+    assert _duracao(sessao.instantes) >= 0.19
+
+
+def test_limite_soma_as_threads(sessao):
+    # 4 requisições por segundo para o host, 3 threads com 2 requisições cada
+    http_client.definir_limite_host('https://soap.local/ws', 4)
+
+    def enviar():
+        for _ in range(2):
+            http_client.http_post('https://soap.local/ws', timeout=1)
+
+    threads = [threading.Thread(target=enviar) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(sessao.instantes) == 6
+    assert _duracao(sessao.instantes) >= 1.2
+
+
+def test_limite_zero_remove_o_limitador(sessao):
+    http_client.definir_limite_host('http://hevi.local', 1)
+    http_client.definir_limite_host('http://hevi.local', 0)
+
+    for _ in range(5):
+        http_client.http_get('http://hevi.local/x', timeout=1)
+
+    assert http_client._limitadores == {}
+    assert _duracao(sessao.instantes) < 0.05
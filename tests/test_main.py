@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""Modo daemon: ciclos no mesmo processo renovam os colaboradores quando o cache vence"""
+
+import copy
+import json
+import os
+import signal
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+import api_humanus
+import cache_db
+import extracao_humanus
+import main
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       'consulta_colaboradores.txt')
+
+
+def _ativos(total):
+    """Colaboradores ativos (sem situação) a partir da fixture, matrícula e CPF 1..total"""
+    with open(FIXTURE, encoding='utf-8') as arquivo:
+        base = json.load(arquivo)[0]
+    colaboradores = []
+    for i in range(1, total + 1):
+        col = copy.deepcopy(base)
+        col['nroMatrExterno'] = i
+        col['pessoaFisica']['pfiCpfnumeroDigito'] = f'{i:011d}'
+        col['situacaoPessoa'] = []
+        colaboradores.append(col)
+    return colaboradores
+
+
+class _Resposta:
+    def __init__(self, status_code, corpo=b''):
+        self.status_code = status_code
+        self.corpo = corpo
+
+    def iter_content(self, chunk_size=1):
+        yield self.corpo
+
+    def json(self):
+        return json.loads(self.corpo)
+
+    def close(self):
+        pass
+
+
+class _Export:
+    """Export da Humanus simulado; `colaboradores` pode ser trocado entre ciclos"""
+
+    def __init__(self, colaboradores):
+        self.colaboradores = colaboradores
+        self.exports = 0
+
+    def __call__(self, url, headers, **kwargs):
+        query = parse_qs(urlparse(url).query)
+        if 'NumeroPagina' not in query:
+            return _Resposta(404)  # /situacao/tudo
+        pagina = int(query['NumeroPagina'][0])
+        if pagina == 1:
+            self.exports += 1
+        itens = self.colaboradores if pagina == 1 else []
+        if not itens:
+            return _Resposta(404)
+        return _Resposta(200, json.dumps(itens).encode('utf-8'))
+
+
+def _vencer_cache():
+    """Simula a passagem do tempo além de [CACHE] validade_minutos (memória e disco)"""
+    vencido = datetime.now() - timedelta(minutes=5)
+    cache_db._cache_timestamp = vencido
+    conn = cache_db._get_conn()
+    try:
+        conn.execute("UPDATE cache_colaboradores_meta SET atualizado_em = ?", (vencido.isoformat(),))
+        conn.commit()
+    finally:
+        cache_db._liberar_conn(conn)
+
+
+@pytest.fixture
+def daemon(escrever_config, monkeypatch):
+    """Config completa com destinos inacessíveis e intervalo zero entre os ciclos"""
+    escrever_config({
+        'APISOURCE': {'token': 'abc', 'url_base': 'http://humanus.local/exportar', 'tamanho_pagina': 50},
+        'APITARGET': {'url': 'http://127.0.0.1:9/api', 'integracao': 'x', 'token_base': 'y',
+                      'requisicoes_por_segundo': 0},
+        'SOAP': {'url': 'http://127.0.0.1:9/soap', 'requisicoes_por_segundo': 0},
+        'CACHE': {'validade_minutos': 1},
+    })
+    monkeypatch.setattr(main, 'obter_config_execucao', lambda: {
+        'modulos_paralelos': 3, 'intervalo_minutos': 0, 'jitter_segundos': 0})
+    sinais = {}
+    monkeypatch.setattr(signal, 'signal', lambda sinal, tratador: sinais.setdefault(sinal, tratador))
+    monkeypatch.setattr(main.random, 'uniform', lambda a, b: 0)
+    extracao_humanus.limpar_extracao()
+    yield sinais
+    extracao_humanus.limpar_extracao()
+
+
+def test_ciclo_com_cache_vencido_busca_a_api_de_novo(daemon, monkeypatch):
+    export = _Export(_ativos(1))
+    monkeypatch.setattr(api_humanus, 'http_get_humanus', export)
+
+    ciclo_real = main.main
+    ativos_por_ciclo = []
+
+    def ciclo(interativo=True):
+        sucesso = ciclo_real(interativo=interativo)
+        ativos_por_ciclo.append(len(extracao_humanus.extrair_entidades()['funcionarios_ativos']))
+        if len(ativos_por_ciclo) == 1:
+            # Entre os ciclos: o cache vence e o export passa a ter 3 colaboradores
+            _vencer_cache()
+            export.colaboradores = _ativos(3)
+        else:
+            daemon[signal.SIGTERM](signal.SIGTERM, None)
+        return sucesso
+
+    monkeypatch.setattr(main, 'main', ciclo)
+
+    main.executar_daemon()
+
+    assert export.exports == 2
+    assert ativos_por_ciclo == [1, 3]
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Validação dos CSVs de integração sobre as linhas em memória.
+Cada módulo valida o DataFrame (ou a lista de dicts) que acabou de gerar, com o seu
+conjunto de regras (REGRAS_VALIDACAO do módulo), sem reabrir o arquivo com pd.read_csv.
+
+Regras (todas opcionais):
+    obrigatorios:  campos que não podem ficar vazios
+    unicos:        campos sem valores repetidos (vazios não contam)
+    cpf:           campos com CPF de 11 dígitos
+    datas:         campos com data DD/MM/AAAA (vazios não contam)
+    preenchimento: {campo: rótulo} - quantos registros têm o campo preenchido
+    distintos:     {campo: rótulo} - quantos valores diferentes o campo tem
+    valores:       {campo: rótulo} - lista os valores diferentes do campo
+"""
+
+import pandas as pd
+
+# DD/MM/AAAA
+_PADRAO_DATA = r'\d{2}/\d{2}/\d{4}'
+
+
+def _vazios(serie):
+    """Máscara dos valores vazios (None/NaN ou texto em branco)"""
+    return serie.isna() | (serie.astype(str).str.strip() == '')
+
+
+def validar_linhas_csv(dados, regras, nome_arquivo=None):
+    """
+    Valida as linhas de um CSV de integração ainda em memória e imprime as contagens.
+
+    Args:
+        dados: DataFrame ou lista de dicts (uma linha do CSV por dict)
+        regras: dict com as regras do módulo (ver docstring do módulo)
+        nome_arquivo: nome do CSV, só para o log
+
+    Returns:
+        dict: contagens por regra (vazios, duplicados, cpf_invalidos, datas_invalidas)
+    """
+    resultado = {'registros': 0, 'vazios': {}, 'duplicados': {}, 'cpf_invalidos': {}, 'datas_invalidas': {}}
+
+    try:
+        df = dados if isinstance(dados, pd.DataFrame) else pd.DataFrame(list(dados or []))
+        print(f"\n🔍 VALIDANDO DADOS DO CSV{f': {nome_arquivo}' if nome_arquivo else ''} (em memória)")
+
+        resultado['registros'] = len(df)
+        print(f"  📊 Total de registros: {len(df)}")
+        print(f"  📋 Total de colunas: {len(df.columns)}")
+
+        for campo in regras.get('obrigatorios', ()):
+            if campo not in df.columns:
+                print(f"  ❌ Campo obrigatório '{campo}' não encontrado")
+                continue
+            vazios = int(_vazios(df[campo]).sum())
+            resultado['vazios'][campo] = vazios
+            if vazios > 0:
+                print(f"  ⚠️  Campo '{campo}': {vazios} registros vazios")
+            else:
+                print(f"  ✅ Campo '{campo}': todos preenchidos")
+
+        for campo in regras.get('unicos', ()):
+            if campo in df.columns:
+                serie = df[campo][~_vazios(df[campo])]
+                duplicados = int(serie.astype(str).duplicated().sum())
+                resultado['duplicados'][campo] = duplicados
+                if duplicados > 0:
+                    print(f"  ⚠️  Campo '{campo}': {duplicados} valores duplicados")
+                else:
+                    print(f"  ✅ Campo '{campo}': nenhum valor duplicado")
+
+        for campo in regras.get('cpf', ()):
+            if campo in df.columns:
+                serie = df[campo][~_vazios(df[campo])].astype(str)
+                invalidos = int((~serie.str.fullmatch(r'\d{11}')).sum())
+                resultado['cpf_invalidos'][campo] = invalidos
+                if invalidos > 0:
+                    print(f"  ⚠️  Campo '{campo}': {invalidos} CPFs sem 11 dígitos")
+                else:
+                    print(f"  ✅ Campo '{campo}': CPFs com 11 dígitos")
+
+        for campo in regras.get('datas', ()):
+            if campo in df.columns:
+                serie = df[campo][~_vazios(df[campo])].astype(str)
+                invalidas = int((~serie.str.fullmatch(_PADRAO_DATA)).sum())
+                resultado['datas_invalidas'][campo] = invalidas
+                if invalidas > 0:
+                    print(f"  ⚠️  Campo '{campo}': {invalidas} datas fora do formato DD/MM/AAAA")
+                else:
+                    print(f"  📅 Campo '{campo}': {len(serie)} registros com data DD/MM/AAAA")
+
+        preenchimento = regras.get('preenchimento', {})
+        distintos = regras.get('distintos', {})
+        valores = regras.get('valores', {})
+        if preenchimento or distintos or valores:
+            print(f"\n📊 ESTATÍSTICAS DE PREENCHIMENTO:")
+        for campo, rotulo in preenchimento.items():
+            if campo in df.columns:
+                print(f"  {rotulo}: {int((~_vazios(df[campo])).sum())}")
+        for campo, rotulo in distintos.items():
+            if campo in df.columns:
+                print(f"  {rotulo}: {df[campo][~_vazios(df[campo])].nunique()}")
+        for campo, rotulo in valores.items():
+            if campo in df.columns:
+                print(f"  {rotulo}: {list(df[campo].dropna().unique())}")
+
+        print(f"  ✅ Validação concluída")
+
+    except Exception as e:
+        print(f"  ❌ Erro na validação: {e}")
+
+    return resultado